@@ -0,0 +1,372 @@
+"""
+    Headless HTTP API of the legal assistant (asyncio, aiohttp).
+    Serves the query handlers and petition generation to other tools without Streamlit reruns.
+    The handlers block (downloads, embeddings, Gemini calls), so they run in a thread pool:
+    at most API_MAX_CONCURRENCY requests run at the same time, up to API_MAX_QUEUED more wait
+    for a slot, and the rest are answered 503 with Retry-After.
+
+    Usage: python app/api_server.py [--host 127.0.0.1] [--port 8000]
+
+    GET  /health                    running and queued requests, Gemini scheduler state
+    GET  /metrics                   pipeline metrics in the Prometheus format (METRICS=1)
+    POST /query/general             {"query": "...", "stream": false}
+    POST /query/internet            {"query": "...", "stream": false}
+    POST /documents?name=a.pdf      the PDF as the request body; starts its ingestion
+    GET  /documents/{document_id}   ingestion status
+    POST /query/pdf                 {"query": "...", "document": "<file name from /documents>", "stream": false}
+    POST /petition                  {"full_name": "...", "court_name": "...", ..., "stream": false}
+    Uploads and PDF queries take an optional "matter" (query parameter / field); without one they
+    belong to the session in the X-Session-Id header and expire with it (see utils/lifecycle.py).
+
+    Answers are returned as {"answer": ..., "progress": [...]}. With "stream": true the response is
+    NDJSON: {"event": "progress", "level": ..., "message": ...} and {"event": "text", "text": ...} lines,
+    then {"event": "done", ...} or {"event": "error", "message": ...}.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from aiohttp import web
+import utils.config  # noqa: F401  (loads .env before the other modules read their settings)
+from utils.query_handler import handle_general_query, handle_pdf_query, handle_internet_query
+from utils.petition_handler import (
+    generate_petition, missing_petition_fields, PetitionValidationError, PETITION_FIELDS
+)
+from utils.progress import CallbackProgress
+from utils.ingestion_jobs import submit_ingestion, get_ingestion_jobs
+from utils.lifecycle import (
+    UPLOAD_DIR, LIFECYCLE_INTERVAL, register_document, session_namespace, matter_namespace, start_lifecycle_worker
+)
+from utils.vektor_store import PDF_COLLECTION
+from utils.gemini_scheduler import get_scheduler
+from utils.resources import WARMUP, start_warm_up
+from utils import metrics
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "16"))
+API_MAX_QUEUED = int(os.getenv("API_MAX_QUEUED", "64"))
+# Seconds a request without streaming may take, waiting for its slot included
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "300"))
+API_MAX_UPLOAD_MB = float(os.getenv("API_MAX_UPLOAD_MB", "100"))
+
+def json_error(status: int, message: str, **extra) -> web.Response:
+    return web.json_response({"error": message, **extra}, status=status)
+
+class RequestLimiter:
+    """
+        Lets at most max_concurrency requests run and at most max_queued wait for a slot.
+    """
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, max_queued: int = API_MAX_QUEUED):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.running = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self):
+        """
+            Waits for a slot; raises 503 at once if the queue is full.
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            metrics.count("api_rejected")
+            raise web.HTTPServiceUnavailable(
+                text=json.dumps({"error": "Too many requests, please retry."}),
+                content_type="application/json", headers={"Retry-After": "1"}
+            )
+        self.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        metrics.observe("api_queue_wait", time.perf_counter() - queued_at)
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    def run_in_slot(self, loop, executor, function):
+        """
+            Runs function in the executor on an acquired slot and returns its future.
+            The slot is released when the function returns, not when the request gives up on it:
+            a thread that keeps running after a timeout or a disconnect still counts.
+        """
+        try:
+            future = loop.run_in_executor(executor, function)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+class LegalAssistantAPI:
+    """
+        The HTTP endpoints; every handler call runs in the thread pool within the request limits.
+    """
+
+    def __init__(self, max_concurrency: int = API_MAX_CONCURRENCY, max_queued: int = API_MAX_QUEUED,
+                 request_timeout: float = API_REQUEST_TIMEOUT):
+        self.limiter = RequestLimiter(max_concurrency, max_queued)
+        self.request_timeout = request_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="api")
+
+    def routes(self):
+        return [
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+            web.post("/query/general", self.query_general),
+            web.post("/query/internet", self.query_internet),
+            web.post("/query/pdf", self.query_pdf),
+            web.post("/documents", self.upload_document),
+            web.get("/documents/{document_id}", self.document_status),
+            web.post("/petition", self.petition),
+        ]
+
+    async def health(self, request):
+        return web.json_response({
+            "status": "ok",
+            "running": self.limiter.running,
+            "queued": self.limiter.queued,
+            "max_concurrency": self.limiter.max_concurrency,
+            "max_queued": self.limiter.max_queued,
+            "gemini": get_scheduler().stats()
+        })
+
+    async def metrics(self, request):
+        return web.Response(text=metrics.export_prometheus(), content_type="text/plain")
+
+    async def query_general(self, request):
+        body = await self._json_body(request)
+        query = self._query_text(body)
+        return await self._answer(request, "general", body.get("stream", False),
+                                  lambda stream, progress: handle_general_query(query, stream, progress=progress))
+
+    async def query_internet(self, request):
+        body = await self._json_body(request)
+        query = self._query_text(body)
+        return await self._answer(request, "internet", body.get("stream", False),
+                                  lambda stream, progress: handle_internet_query(query, stream, progress=progress))
+
+    async def query_pdf(self, request):
+        body = await self._json_body(request)
+        query = self._query_text(body)
+        document = str(body.get("document") or "")
+        if not document or os.path.basename(document) != document:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "'document' must be a file name returned by "
+                                                               "/documents."}), content_type="application/json")
+        pdf_path = os.path.join(UPLOAD_DIR, document)
+        namespace = self._namespace(request, body.get("matter"))
+        return await self._answer(
+            request, "pdf", body.get("stream", False),
+            lambda stream, progress: handle_pdf_query(query, pdf_path, stream, namespace=namespace, progress=progress)
+        )
+
+    async def petition(self, request):
+        body = await self._json_body(request)
+        details = {field: str(body.get(field) or "") for field in PETITION_FIELDS}
+        missing = missing_petition_fields(details)
+        if missing:
+            return json_error(400, f"Required fields are missing: {', '.join(missing)}", missing=missing)
+        return await self._answer(request, "petition", body.get("stream", False),
+                                  lambda stream, progress: generate_petition(details, stream))
+
+    async def upload_document(self, request):
+        """
+            Saves the PDF in the request body and starts its ingestion.
+        """
+        name = os.path.basename(request.query.get("name", "")) or "document.pdf"
+        content = await request.read()
+        if not content.startswith(b"%PDF"):
+            return json_error(400, "The request body must be a PDF file.")
+        namespace = self._namespace(request, request.query.get("matter"))
+
+        def save():
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            file_name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{name}"
+            pdf_path = os.path.join(UPLOAD_DIR, file_name)
+            with open(pdf_path, "wb") as f:
+                f.write(content)
+            job = submit_ingestion(pdf_path)
+            register_document(PDF_COLLECTION, job.content_hash, namespace, path=pdf_path)
+            return file_name, job
+
+        file_name, job = await asyncio.get_running_loop().run_in_executor(self.executor, save)
+        return web.json_response({"document": file_name, "document_id": job.content_hash,
+                                  "namespace": namespace, "status": job.status}, status=202)
+
+    async def document_status(self, request):
+        job = get_ingestion_jobs().get(request.match_info["document_id"])
+        if job is None:
+            return json_error(404, "Unknown document.")
+        return web.json_response({
+            "document": job.document,
+            "document_id": job.content_hash,
+            "status": job.status,
+            "progress": round(job.progress(), 3),
+            "pages_parsed": job.pages_parsed,
+            "page_count": job.page_count,
+            "chunks_embedded": job.chunks_embedded,
+            "error": job.error
+        })
+
+    @staticmethod
+    async def _json_body(request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text=json.dumps({"error": "The request body must be a JSON object."}),
+                                     content_type="application/json")
+        return body
+
+    @staticmethod
+    def _query_text(body: dict) -> str:
+        query = str(body.get("query") or "").strip()
+        if not query:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "'query' is required."}),
+                                     content_type="application/json")
+        return query
+
+    @staticmethod
+    def _namespace(request, matter) -> str:
+        matter = str(matter or "").strip()
+        if matter:
+            return matter_namespace(matter)
+        return session_namespace(request.headers.get("X-Session-Id") or "api")
+
+    async def _answer(self, request, mode: str, stream: bool, call):
+        """
+            Runs call(stream, progress) within the limits and returns the answer as JSON or as an NDJSON stream.
+        """
+        if stream:
+            return await self._stream_answer(request, mode, call)
+
+        def run():
+            progress = CallbackProgress()
+            with metrics.trace(mode):
+                answer = call(False, progress)
+            return answer, progress
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.request_timeout):
+                await self.limiter.acquire()
+                future = self.limiter.run_in_slot(loop, self.executor, run)
+                # The thread cannot be interrupted; on a timeout it finishes on its own and frees the slot
+                answer, progress = await asyncio.shield(future)
+        except TimeoutError:
+            return json_error(504, "The request timed out.")
+        except PetitionValidationError as e:
+            return json_error(400, str(e))
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            print(f"⚠️ API {mode} request failed: {e}")
+            return json_error(500, f"The request failed: {e}")
+
+        if answer is None:
+            return json_error(422, " ".join(progress.errors) or "No answer could be generated.",
+                              progress=progress.events)
+        return web.json_response({"answer": answer, "progress": progress.events,
+                                  "seconds": round(time.perf_counter() - started, 3)})
+
+    async def _stream_answer(self, request, mode: str, call):
+        """
+            Streams the progress messages and the answer pieces as NDJSON while the handler runs in a thread.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        cancelled = threading.Event()
+        started = time.perf_counter()
+
+        def put(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        def produce():
+            progress = CallbackProgress(lambda level, message: put(
+                {"event": "progress", "level": level, "message": message}
+            ))
+            try:
+                with metrics.trace(mode):
+                    pieces = call(True, progress)
+                    if pieces is None:
+                        put({"event": "error", "message": " ".join(progress.errors) or "No answer could be generated."})
+                        return
+                    first_token_seconds = None
+                    for piece in pieces:
+                        if cancelled.is_set():
+                            # The client is gone, stops the generation
+                            getattr(pieces, "close", lambda: None)()
+                            return
+                        if first_token_seconds is None:
+                            first_token_seconds = round(time.perf_counter() - started, 3)
+                        put({"event": "text", "text": piece})
+                put({"event": "done", "first_token_seconds": first_token_seconds,
+                     "seconds": round(time.perf_counter() - started, 3)})
+            except Exception as e:
+                print(f"⚠️ API {mode} request failed: {e}")
+                put({"event": "error", "message": f"The request failed: {e}"})
+            finally:
+                put(None)
+
+        await self.limiter.acquire()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+        try:
+            await response.prepare(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        self.limiter.run_in_slot(loop, self.executor, produce)
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+        except (ConnectionResetError, asyncio.CancelledError):
+            cancelled.set()
+            raise
+        await response.write_eof()
+        return response
+
+    async def close(self, app):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def create_app(max_concurrency: int = API_MAX_CONCURRENCY, max_queued: int = API_MAX_QUEUED,
+               request_timeout: float = API_REQUEST_TIMEOUT) -> web.Application:
+    """
+        Creates the aiohttp application with the API routes.
+    """
+    api = LegalAssistantAPI(max_concurrency, max_queued, request_timeout)
+    app = web.Application(client_max_size=int(API_MAX_UPLOAD_MB * 1024 * 1024))
+    app.add_routes(api.routes())
+    app.on_cleanup.append(api.close)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY)
+    parser.add_argument("--max-queued", type=int, default=API_MAX_QUEUED)
+    args = parser.parse_args()
+
+    # Same background work as the Streamlit entry point (main.py)
+    if WARMUP:
+        start_warm_up()
+    if LIFECYCLE_INTERVAL:
+        start_lifecycle_worker(LIFECYCLE_INTERVAL)
+
+    web.run_app(create_app(args.max_concurrency, args.max_queued), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+    Bulk ingestion of a document corpus into the vector store.
+    Walks directories of PDFs (statutes, memos...) and text/HTML court decisions, parses them
+    in a process pool, embeds and uploads the chunks of many documents together, and records
+    every finished file in a checkpoint, so an interrupted run continues where it stopped.
+
+    Usage: python app/bulk_ingest.py DIRECTORY [DIRECTORY ...] [--workers 4] [--batch-size 512]
+                                     [--checkpoint .cache/bulk_ingest_checkpoint.jsonl] [--restart]
+    PDFs go to the PDF collection (one document per file content, as uploads do), text and HTML
+    files to the decision collection as "decision:<path under the directory, without extension>".
+    Files with the same content are ingested once. Both are registered in the "corpus" namespace
+    of the lifecycle registry, which never expires and is not evicted.
+    With VECTOR_BACKEND=local the index must not be open in another process (e.g. the app).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import utils.config  # noqa: F401  (loads .env before the other modules read their settings)
+from utils.pdf_handler import iter_pdf_chunks, process_decisions_text, CHUNK_SIZE, CHUNK_OVERLAP
+from utils.vektor_store import initialize_vector_store, add_to_vector_store, PDF_COLLECTION, DECISION_COLLECTION
+from utils.ingestion_manifest import file_content_hash, ingestion_params, record_ingestion
+from utils.html_text import html_to_text
+from utils.lifecycle import register_document, CORPUS_NAMESPACE
+from utils.file_lock import FileLockedError
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "bulk_ingest_checkpoint.jsonl")
+
+PDF_EXTENSIONS = {".pdf"}
+TEXT_EXTENSIONS = {".txt", ".html", ".htm"}
+
+# Chunks embedded and uploaded together
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "512"))
+
+def iter_files(paths):
+    """
+        Yields (file path, name) of the supported files under the given files and directories in
+        a stable order. The name is the path under the given directory (or the file name of a given
+        file) without the extension, with "/" separators.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path, os.path.splitext(os.path.basename(path))[0]
+            continue
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in PDF_EXTENSIONS | TEXT_EXTENSIONS:
+                    file_path = os.path.join(root, name)
+                    relative = os.path.splitext(os.path.relpath(file_path, path))[0]
+                    yield file_path, relative.replace(os.sep, "/")
+
+def file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+def load_checkpoint(path: str) -> dict:
+    """
+        Returns {file path: record} of the files finished in previous runs.
+    """
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off by an interrupted run
+                    continue
+                done[record["path"]] = record
+    except OSError:
+        pass
+    return done
+
+def parse_file(path: str, name: str):
+    """
+        Reads and chunks one file (runs in a worker process); decisions get `name` as their ID.
+        Returns (path, kind, content hash, chunks, error).
+    """
+    try:
+        content_hash = file_content_hash(path)
+        if os.path.splitext(path)[1].lower() in PDF_EXTENSIONS:
+            # The worker is already one of a pool, the PDF is read in this process
+            chunks = list(iter_pdf_chunks(path, CHUNK_SIZE, CHUNK_OVERLAP, workers=1))
+            for chunk in chunks:
+                chunk.metadata["doc_id"] = content_hash
+            return path, "pdf", content_hash, chunks, None
+
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        if path.lower().endswith((".html", ".htm")):
+            text = html_to_text(text)
+        chunks = process_decisions_text(text, source_name=os.path.basename(path), decision_id=name)
+        return path, "decision", content_hash, chunks, None
+    except Exception as e:
+        return path, None, None, [], str(e)
+
+def iter_parsed(files, workers: int):
+    """
+        Parses the files in a process pool, keeping only a few results ahead of the consumer.
+    """
+    if workers <= 1:
+        for path, name in files:
+            yield parse_file(path, name)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path, name in files:
+            pending.append(executor.submit(parse_file, path, name))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+class BulkIngester:
+    """
+        Collects parsed documents into large batches, uploads them and writes the checkpoint.
+    """
+
+    def __init__(self, checkpoint_path: str, batch_size: int = BULK_BATCH_SIZE):
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.stores = {name: initialize_vector_store(name) for name in (PDF_COLLECTION, DECISION_COLLECTION)}
+        self.params = ingestion_params(CHUNK_SIZE, CHUNK_OVERLAP, self.stores[PDF_COLLECTION][1].model_name)
+        self.batch = []  # (path, kind, content hash, chunks)
+        self.batch_chunks = 0
+        # Contents ingested in this run; a second file with the same content is skipped
+        self.content_hashes = set()
+        self.duplicate_records = []
+        self.documents = 0
+        self.chunks = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.duplicates = 0
+
+    def add(self, path: str, kind: str, content_hash: str, chunks: list) -> bool:
+        """
+            Adds a parsed file to the batch; returns False if its content was already ingested.
+        """
+        if content_hash in self.content_hashes:
+            # Recorded with the next batch, after the file with this content is uploaded
+            self.duplicate_records.append({"path": path, **file_signature(path), "content_hash": content_hash,
+                                           "kind": "duplicate", "chunks": 0})
+            self.duplicates += 1
+            return False
+        self.content_hashes.add(content_hash)
+        self.batch.append((path, kind, content_hash, chunks))
+        self.batch_chunks += len(chunks)
+        if self.batch_chunks >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self.batch:
+            self._write_checkpoint(self.duplicate_records)
+            self.duplicate_records = []
+            return
+        # Corpus documents never expire; they are registered before upload so no sweep deletes them
+        for _, kind, content_hash, chunks in self.batch:
+            collection_name = PDF_COLLECTION if kind == "pdf" else DECISION_COLLECTION
+            register_document(collection_name, chunks[0].metadata["doc_id"], CORPUS_NAMESPACE, chunks=len(chunks))
+        for collection_name, kind in ((PDF_COLLECTION, "pdf"), (DECISION_COLLECTION, "decision")):
+            chunks = [chunk for _, entry_kind, _, entry_chunks in self.batch if entry_kind == kind
+                      for chunk in entry_chunks]
+            if chunks:
+                client, embeddings = self.stores[collection_name]
+                self.uploaded += add_to_vector_store(client, embeddings, chunks, collection_name)
+
+        records = []
+        for path, kind, content_hash, chunks in self.batch:
+            if kind == "pdf":
+                record_ingestion(PDF_COLLECTION, content_hash, self.params, os.path.basename(path), len(chunks))
+            records.append({"path": path, **file_signature(path), "content_hash": content_hash,
+                            "kind": kind, "chunks": len(chunks)})
+        self._write_checkpoint(records + self.duplicate_records)
+        self.duplicate_records = []
+
+        self.documents += len(self.batch)
+        self.chunks += self.batch_chunks
+        self.batch = []
+        self.batch_chunks = 0
+
+    def _write_checkpoint(self, records):
+        if not records:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="directories or files to ingest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="chunks per upload")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of previous runs")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+
+    files, skipped, names = [], 0, {}
+    for path, name in iter_files(args.paths):
+        record = done.get(path)
+        if record is not None and record.get("size") == os.path.getsize(path) \
+                and record.get("mtime") == int(os.path.getmtime(path)):
+            skipped += 1
+            continue
+        if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS:
+            # Decisions are identified by their name; a second file would replace the first one's chunks
+            other = names.setdefault(name, path)
+            if other != path:
+                print(f"⚠️ {path} skipped: decision:{name} is already {other}", file=sys.stderr)
+                skipped += 1
+                continue
+        files.append((path, name))
+    print(f"{len(files)} files to ingest, {skipped} skipped", file=sys.stderr)
+
+    try:
+        ingester = BulkIngester(args.checkpoint, args.batch_size)
+    except FileLockedError as e:
+        sys.exit(f"⚠️ {e}")
+    started = time.perf_counter()
+    try:
+        for path, kind, content_hash, chunks, error in iter_parsed(files, args.workers):
+            if error is not None or not chunks:
+                print(f"⚠️ {path} skipped: {error or 'no text'}", file=sys.stderr)
+                ingester.failed += 1
+                continue
+            if not ingester.add(path, kind, content_hash, chunks):
+                print(f"{path} skipped: same content as an ingested file", file=sys.stderr)
+            processed = ingester.documents + len(ingester.batch)
+            if processed % 100 == 0:
+                print(f"{processed}/{len(files)} files parsed", file=sys.stderr)
+        ingester.flush()
+    except KeyboardInterrupt:
+        print("Interrupted, the finished files are in the checkpoint.", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "documents": ingester.documents,
+        "chunks": ingester.chunks,
+        "uploaded_chunks": ingester.uploaded,
+        "skipped_documents": skipped,
+        "duplicate_documents": ingester.duplicates,
+        "failed_documents": ingester.failed,
+        "seconds": round(elapsed, 2),
+        "documents_per_second": round(ingester.documents / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(ingester.chunks / elapsed, 2) if elapsed else None
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,28 @@
 """
     Main page design and presentation of options
+    The pages are imported when they are opened, so the home page renders without loading
+    the model, PDF and vector store libraries.
 """
 import streamlit as st
-from research_page import show_research_page
-from petition_page import show_petition_page
+import utils.config  # noqa: F401  (loads .env before the other modules read their settings)
+from utils.resources import WARMUP, start_warm_up
+from utils.metrics import METRICS_ENABLED, METRICS_PORT, start_metrics_server
+from utils.lifecycle import LIFECYCLE_INTERVAL, start_lifecycle_worker
 
 st.set_page_config(page_title="⚖️ Legal Assistant", layout="wide")
 
+# Opens the model and vector store connections in the background (once per process)
+if WARMUP:
+    start_warm_up()
+
+# Prometheus endpoint with the pipeline metrics (METRICS=1 and METRICS_PORT=<port>, on METRICS_HOST)
+if METRICS_ENABLED and METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
+# Expires unused uploads and vectors and enforces the storage quotas (LIFECYCLE_INTERVAL=0 turns it off)
+if LIFECYCLE_INTERVAL:
+    start_lifecycle_worker(LIFECYCLE_INTERVAL)
+
 # Set page state to 'home' if not already defined
 if "page" not in st.session_state:
     st.session_state.page = "home"
@@ -48,7 +64,9 @@ if st.session_state.page == "home":
         st.button("Start Preparing Petition", on_click=go_to_petition)
 
 elif st.session_state.page == "research":
+    from research_page import show_research_page
     show_research_page(go_home)
 
 elif st.session_state.page == "petition":
+    from petition_page import show_petition_page
     show_petition_page(go_home)
@@ -1,8 +1,11 @@
 """
     Petition interface and information collection using Streamlit
 """
+import time
 import streamlit as st
-from utils.gemini_handler import generate_answer
+from utils.gemini_handler import TimedStream
+from utils.petition_handler import generate_petition, missing_petition_fields, CASE_TYPES
+from utils import metrics
 
 def show_petition_page(go_home_callback):
     """
@@ -13,41 +16,30 @@ def show_petition_page(go_home_callback):
     full_name = st.text_input("Full Name *")
     address = st.text_area("Address")
     court_name = st.text_input("Court Name * (e.g. Istanbul Anatolian 5th Family Court)")
-    case_type = st.selectbox("Case Type *", ["Select", "Divorce", "Execution", "Labor Case", "Consumer", "Other"])
+    case_type = st.selectbox("Case Type *", ["Select"] + CASE_TYPES)
     opponent_name = st.text_input("Defendant/Plaintiff Name *")
     petition_details = st.text_area("Case Summary / Justification *")
 
-    # List of fields to check for required information
-    required_fields = {
-        "Full Name": full_name,
-        "Court Name": court_name,
-        "Case Type": case_type if case_type != "Select" else "",
-        "Opposing Party": opponent_name,
-        "Case Summary": petition_details
+    details = {
+        "full_name": full_name,
+        "address": address,
+        "court_name": court_name,
+        "case_type": case_type if case_type != "Select" else "",
+        "opponent_name": opponent_name,
+        "petition_details": petition_details
     }
 
     if st.button("📄 Generate Petition"):
-        missing_fields = [label for label, value in required_fields.items() if not value.strip()]
+        missing_fields = missing_petition_fields(details)
         if missing_fields:
             st.error(f"Please fill in the following required fields: {', '.join(missing_fields)}")
             return
 
-        prompt = f"""
-            You are a legal assistant. Using the information below, prepare an official and proper petition.
-            The text should be written in clear and understandable Turkish. Include introduction, 
-            case explanation and conclusion (request) sections.
-
-            Information:
-            - Full Name: {full_name}
-            - Address: {address}
-            - Court: {court_name}
-            - Case Type: {case_type}
-            - Opposing Party: {opponent_name}
-            - Case Summary / Justification: {petition_details}
-
-            Use an official and valid petition structure. End with "I respectfully submit this petition."
-            """
-        response = generate_answer(prompt)
-        st.write(response.candidates[0].content.parts[0].text)
+        with metrics.trace("petition"):
+            timed_stream = TimedStream(generate_petition(details, stream=True), time.perf_counter())
+            st.write_stream(timed_stream)
+        if timed_stream.first_token_seconds is not None:
+            st.caption(f"⏱️ First token: {timed_stream.first_token_seconds:.2f}s · "
+                       f"Total: {timed_stream.total_seconds:.2f}s")
 
     st.button("🔙 Return to Home", on_click=go_home_callback)
@@ -3,9 +3,30 @@
     Interface design with Streamlit.
 """
 import os
+import time
+import uuid
 from datetime import datetime
 import streamlit as st
 from utils.query_handler import handle_general_query, handle_pdf_query, handle_internet_query
+from utils.gemini_handler import TimedStream
+from utils import metrics
+from utils.ingestion_jobs import submit_ingestion, get_ingestion_jobs, FAILED
+from utils.lifecycle import UPLOAD_DIR, register_document, session_namespace, matter_namespace
+from utils.vektor_store import PDF_COLLECTION
+from utils.progress import Progress, INFO, SUCCESS
+
+class StreamlitProgress(Progress):
+    """
+        Shows the status messages of the query handlers on the page.
+    """
+
+    def emit(self, level: str, message: str):
+        if level == INFO:
+            st.info(message)
+        elif level == SUCCESS:
+            st.success(message)
+        else:
+            st.error(message)
 
 def load_css():
     """
@@ -14,6 +35,74 @@ def load_css():
     with open("app/assets/style.css", encoding='utf-8') as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+def write_answer_stream(answer_stream, started_at):
+    """
+        Writes the answer as it is generated and shows the time to first token and the total time.
+    """
+    if answer_stream is None:
+        return
+    timed_stream = TimedStream(answer_stream, started_at)
+    st.write_stream(timed_stream)
+    if timed_stream.first_token_seconds is not None:
+        st.caption(f"⏱️ First token: {timed_stream.first_token_seconds:.2f}s · "
+                   f"Total: {timed_stream.total_seconds:.2f}s")
+
+def render_ingestion_status(job):
+    if job.status == FAILED:
+        st.error(f"⚠️ {job.document} could not be processed: {job.error}")
+    elif job.finished:
+        st.success(f"📚 {job.document} is ready for your questions.")
+    else:
+        pages = f"{job.pages_parsed}/{job.page_count}" if job.page_count else "0"
+        st.progress(job.progress(), text=f"⏳ Processing {job.document}: {pages} pages parsed, "
+                                         f"{job.chunks_embedded} chunks embedded")
+
+@st.fragment(run_every=1.0)
+def poll_ingestion_progress(content_hash):
+    """
+        Refreshes the progress of a queued or running ingestion every second.
+    """
+    job = get_ingestion_jobs().get(content_hash)
+    if job is None or job.finished:
+        # One rerun of the page shows the final state without the polling fragment
+        st.rerun()
+    render_ingestion_status(job)
+
+def show_ingestion_progress():
+    """
+        Shows the progress of the background ingestion of the uploaded PDF.
+        The page is only polled while the ingestion is queued or running.
+    """
+    content_hash = st.session_state.get("ingestion_hash")
+    job = get_ingestion_jobs().get(content_hash) if content_hash else None
+    if job is None:
+        return
+    if job.finished:
+        render_ingestion_status(job)
+    else:
+        poll_ingestion_progress(content_hash)
+
+def show_metrics_panel(query_trace):
+    """
+        Shows where the time of the last query went (only when metrics are enabled).
+    """
+    if query_trace is None or not query_trace.total_seconds:
+        return
+    with st.expander(f"📊 Stage breakdown ({query_trace.total_seconds:.2f}s)"):
+        stages = sorted(query_trace.stages.items(), key=lambda item: item[1][1], reverse=True)
+        st.table([
+            {
+                "Stage": stage,
+                "Calls": calls,
+                "Seconds": round(seconds, 3),
+                # Stages running in parallel threads can add up to more than the total
+                "Share": f"{seconds / query_trace.total_seconds:.0%}"
+            }
+            for stage, (calls, seconds) in stages
+        ])
+        if query_trace.counters:
+            st.json(query_trace.counters)
+
 def show_research_page(go_home_callback):
     """
         General research interface and web search operations according to desired style.
@@ -28,6 +117,8 @@ def show_research_page(go_home_callback):
         st.session_state.internet_mode = False
     if "uploaded_pdf_name" not in st.session_state:
         st.session_state.uploaded_pdf_name = None
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     def toggle_pdf():
         st.session_state.pdf_mode = True
@@ -79,17 +170,30 @@ def show_research_page(go_home_callback):
                 toggle_general()
 
     # PDF Upload Section
+    # Uploads belong to the matter if one is given, otherwise to this session, and expire with it
+    matter = st.session_state.get("matter", "").strip()
+    namespace = matter_namespace(matter) if matter else session_namespace(st.session_state.session_id)
+
     if st.session_state.pdf_mode:
+        st.text_input("📁 Matter (optional)", key="matter",
+                      help="PDFs of a matter are kept for all its sessions; without a matter they expire "
+                           "a day after the session stops using them.")
         uploaded_file = st.file_uploader("📤 Upload PDF File", type=["pdf"], key="pdf_uploader")
-        if uploaded_file is not None:
-            upload_dir = "uploaded_pdfs"
-            os.makedirs(upload_dir, exist_ok=True)
+        # The file is saved and its ingestion started once per upload, not on every rerun
+        if uploaded_file is not None and st.session_state.get("uploaded_file_id") != uploaded_file.file_id:
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            pdf_path = os.path.join(upload_dir, f"{timestamp}_{uploaded_file.name}")
+            pdf_path = os.path.join(UPLOAD_DIR, f"{timestamp}_{uploaded_file.name}")
             with open(pdf_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
+            st.session_state.uploaded_file_id = uploaded_file.file_id
             st.session_state.uploaded_pdf_name = pdf_path
+            job = submit_ingestion(pdf_path)
+            register_document(PDF_COLLECTION, job.content_hash, namespace, path=pdf_path)
+            st.session_state.ingestion_hash = job.content_hash
+        if uploaded_file is not None:
             st.success(f"✅ {uploaded_file.name} uploaded successfully.")
+        show_ingestion_progress()
 
     elif st.session_state.uploaded_pdf_name:
         st.markdown(f"📎 Uploaded: **{st.session_state.uploaded_pdf_name}**")
@@ -99,19 +203,26 @@ def show_research_page(go_home_callback):
 
     if send_clicked:
         query = user_input.strip()
+        started_at = time.perf_counter()
 
         if st.session_state.pdf_mode:
-            st.info("📄 Searching in PDF...")
-            pdf_path = st.session_state.uploaded_pdf_name
-            answer = handle_pdf_query(query, pdf_path)
-            st.write(answer)
+            with metrics.trace("pdf") as query_trace:
+                st.info("📄 Searching in PDF...")
+                pdf_path = st.session_state.uploaded_pdf_name
+                answer_stream = handle_pdf_query(query, pdf_path, stream=True, namespace=namespace,
+                                                 progress=StreamlitProgress())
+                write_answer_stream(answer_stream, started_at)
 
         elif st.session_state.internet_mode:
-            st.info("🌐 Searching online...")
-            answer = handle_internet_query(query)
-            st.write(answer)
+            with metrics.trace("internet") as query_trace:
+                st.info("🌐 Searching online...")
+                answer_stream = handle_internet_query(query, stream=True, progress=StreamlitProgress())
+                write_answer_stream(answer_stream, started_at)
 
         else:
-            st.info("💬 Processing general question...")
-            answer = handle_general_query(query)
-            st.write(answer)
\ No newline at end of file
+            with metrics.trace("general") as query_trace:
+                st.info("💬 Processing general question...")
+                answer_stream = handle_general_query(query, stream=True, progress=StreamlitProgress())
+                write_answer_stream(answer_stream, started_at)
+
+        show_metrics_panel(query_trace)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+    Compressed side store for chunk texts on SQLite.
+    With PAYLOAD_STORE=side the vector store only keeps the document ID, chunk number and
+    content hash of a point; text and metadata are stored here, zlib-compressed and keyed
+    by point ID, and read only for the final search results.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Tuple
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", os.path.join(CACHE_DIR, "chunk_text.sqlite3"))
+CHUNK_STORE_COMPRESSION = int(os.getenv("CHUNK_STORE_COMPRESSION", "6"))
+
+# SQLite limits the number of parameters in a single statement
+_SQL_BATCH = 500
+
+def encode_chunk(text: str, metadata: dict) -> bytes:
+    return zlib.compress(
+        json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8"),
+        CHUNK_STORE_COMPRESSION
+    )
+
+def decode_chunk(data: bytes) -> Tuple[str, dict]:
+    record = json.loads(zlib.decompress(data).decode("utf-8"))
+    return record["text"], record["metadata"]
+
+class ChunkStore:
+    """
+        Chunk texts and metadata per collection and point ID.
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                doc_id TEXT,
+                chunk INTEGER,
+                data BLOB NOT NULL,
+                PRIMARY KEY (collection, id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(collection, doc_id, chunk)")
+        self._conn.commit()
+
+    def put_many(self, collection_name: str, records):
+        """
+            Saves (point ID, doc_id, chunk number, text, metadata) records.
+        """
+        rows = [
+            (collection_name, pid, doc_id, chunk, encode_chunk(text, metadata))
+            for pid, doc_id, chunk, text, metadata in records
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, id, doc_id, chunk, data) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get_many(self, collection_name: str, ids: List[str]) -> Dict[str, Tuple[str, dict]]:
+        """
+            Returns {point ID: (text, metadata)} of the stored chunks.
+        """
+        found = {}
+        ids = list(dict.fromkeys(ids))
+        with self._lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                batch = ids[i:i + _SQL_BATCH]
+                for pid, data in self._conn.execute(
+                    f"SELECT id, data FROM chunks WHERE collection = ? AND id IN ({','.join('?' * len(batch))})",
+                    [collection_name, *batch]
+                ):
+                    found[pid] = decode_chunk(data)
+        return found
+
+    def delete_document_tail(self, collection_name: str, doc_id: str, chunk_count: int):
+        """
+            Deletes the chunks of a document numbered chunk_count and above.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND doc_id = ? AND chunk >= ?",
+                (collection_name, doc_id, chunk_count)
+            )
+            self._conn.commit()
+
+    def delete_documents(self, collection_name: str, doc_ids: List[str]):
+        """
+            Deletes all chunks of the given documents.
+        """
+        doc_ids = list(doc_ids)
+        with self._lock:
+            for i in range(0, len(doc_ids), _SQL_BATCH):
+                batch = doc_ids[i:i + _SQL_BATCH]
+                self._conn.execute(
+                    f"DELETE FROM chunks WHERE collection = ? AND doc_id IN ({','.join('?' * len(batch))})",
+                    [collection_name, *batch]
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """
+            Returns the number of chunks and the stored (compressed) bytes.
+        """
+        with self._lock:
+            count, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks"
+            ).fetchone()
+        return {"path": self.path, "chunks": count, "stored_bytes": stored_bytes}
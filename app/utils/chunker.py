@@ -0,0 +1,151 @@
+"""
+    Chunking of Turkish legal texts.
+    Texts are split at their structure first: statute articles ("Madde 12", "Geçici Madde 3")
+    and the headings of court decisions (DAVA, GEREKÇE, HÜKÜM...). Small consecutive sections are
+    packed into one chunk, the ruling (HÜKÜM / SONUÇ) always starts a new one, and sections longer
+    than the chunk size fall back to overlapping windows cut at paragraph, line, sentence or word ends.
+    Chunks are (start, end) offsets into the source text; the text is only copied once, when a
+    Document is made from it.
+"""
+import re
+from typing import Iterator, List
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Part of the ingestion fingerprint, changes whenever the chunk boundaries change
+CHUNKER_VERSION = "legal-1"
+
+# Headings at the start of a line; longer alternatives first (DAVACI before DAVA)
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?P<heading>"
+    r"(?:(?:GEÇİCİ|Geçici|EK|Ek)[ \t]+)?(?:MADDE|Madde)[ \t]+\d+(?:/[A-Za-z])?"
+    r"|(?:HÜKÜM|SONUÇ|GEREĞİ[ \t]+DÜŞÜNÜLDÜ|GEREKÇE|DAVACI|DAVALI|DAVA|İNCELENEN[ \t]+KARARIN"
+    r"|ESAS[ \t]+NO|KARAR[ \t]+NO|T\.C\.)(?![^\W\d_])"
+    r")",
+    re.MULTILINE
+)
+
+# Sections that always start a new chunk
+_HARD_HEADINGS = ("HÜKÜM", "SONUÇ", "GEREĞİ")
+
+# Preferred cut points of the fallback windows, best first
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+class Chunk:
+    """
+        A chunk as offsets into its source text, with the heading of the section it starts in.
+    """
+    __slots__ = ("source", "start", "end", "section")
+
+    def __init__(self, source: str, start: int, end: int, section: str = None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.section = section
+
+    @property
+    def text(self) -> str:
+        return self.source[self.start:self.end]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Chunk({self.start}, {self.end}, section={self.section!r})"
+
+class Document:
+    """
+        Chunk text with its metadata (the page_content / metadata interface of LangChain documents).
+    """
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: dict = None):
+        self.page_content = page_content
+        self.metadata = {} if metadata is None else metadata
+
+    def __repr__(self):
+        return f"Document(page_content={self.page_content[:40]!r}..., metadata={self.metadata!r})"
+
+def _trim(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _sections(text: str, start: int, end: int, heading: str = None):
+    """
+        Yields (start, end, heading, hard) of the structural sections of text[start:end].
+        `heading` is the heading of the text before the first one found.
+    """
+    section_start, hard = start, False
+    for match in _HEADING_RE.finditer(text, start, end):
+        if match.start() > section_start:
+            yield section_start, match.start(), heading, hard
+        section_start = match.start()
+        heading = " ".join(match.group("heading").split())
+        hard = heading.startswith(_HARD_HEADINGS)
+    if section_start < end:
+        yield section_start, end, heading, hard
+
+def _windows(text: str, start: int, end: int, chunk_size: int, chunk_overlap: int) -> Iterator[tuple]:
+    """
+        Yields (start, end) windows of at most chunk_size characters, cut at the best separator
+        in the second half of the window and overlapping by up to chunk_overlap characters.
+    """
+    position = start
+    while position < end:
+        if end - position <= chunk_size:
+            yield position, end
+            return
+        limit = position + chunk_size
+        cut = limit
+        for separator in _SEPARATORS:
+            found = text.rfind(separator, position + chunk_size // 2, limit)
+            if found >= 0:
+                cut = found + len(separator)
+                break
+        yield position, cut
+
+        # The next window starts at the beginning of a word inside the overlap
+        following = max(cut - chunk_overlap, position + 1)
+        while following < cut and not text[following - 1].isspace():
+            following += 1
+        position = following
+
+def iter_chunks(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                start: int = 0, end: int = None, heading: str = None) -> Iterator[Chunk]:
+    """
+        Yields the chunks of text[start:end] in order.
+        `heading` is the section the text starts in, when it continues an earlier part.
+    """
+    end = len(text) if end is None else end
+    chunk_start = chunk_end = None
+
+    def emit(first, last, section):
+        for window_start, window_end in _windows(text, first, last, chunk_size, chunk_overlap):
+            window_start, window_end = _trim(text, window_start, window_end)
+            if window_end > window_start:
+                yield Chunk(text, window_start, window_end, section)
+
+    for section_start, section_end, section_heading, hard in _sections(text, start, end, heading):
+        if chunk_start is not None and (hard or section_end - chunk_start > chunk_size):
+            yield from emit(chunk_start, chunk_end, heading)
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start, heading = section_start, section_heading
+        chunk_end = section_end
+
+    if chunk_start is not None:
+        yield from emit(chunk_start, chunk_end, heading)
+
+def split_chunks(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 heading: str = None) -> List[Chunk]:
+    return list(iter_chunks(text, chunk_size, chunk_overlap, heading=heading))
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+        Returns the chunk texts (same interface as a text splitter's split_text).
+    """
+    return [chunk.text for chunk in iter_chunks(text, chunk_size, chunk_overlap)]
@@ -0,0 +1,32 @@
+"""
+    Shared process setup: loads .env once and configures the Gemini SDK on first use.
+    Entry points import this module first, so every other module reads its settings
+    from the environment after .env has been applied.
+    google.generativeai is only imported by the code paths that call the API.
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+PDF_COLLECTION = "research_pdf"
+DECISION_COLLECTION = "research_pdfs"
+
+_lock = threading.Lock()
+_genai = None
+
+def configure_genai():
+    """
+        Imports and configures google.generativeai (once per process) and returns the module.
+    """
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GOOGLE_API_KEY)
+                _genai = genai
+    return _genai
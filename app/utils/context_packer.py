@@ -0,0 +1,173 @@
+"""
+    Assembles the document context of the answer prompt.
+    Retrieved chunks are reranked for diversity (maximal marginal relevance), packed into
+    a token budget, merged with their neighbours from the same document without the
+    repeated overlap text (found with the chunks' offsets in the document), and labeled with their source.
+"""
+import os
+from collections import namedtuple
+from typing import List, Optional
+import numpy as np
+
+# Below the ~1500 tokens of the BASELINE_K chunks the prompt used to contain
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Candidates retrieved for packing (more than fit, MMR picks among them)
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "12"))
+# Number of top chunks the prompt contained before packing; the savings are measured against them
+BASELINE_K = 6
+# 1.0 ranks by relevance only, lower values prefer chunks unlike the ones already chosen
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Rough size of a token; Gemini's tokenizer needs an API call, so tokens are estimated
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+PackedContext = namedtuple("PackedContext", ["text", "tokens", "baseline_tokens", "chunks", "candidate_chunks"])
+
+def estimate_tokens(text: str) -> int:
+    """
+        Estimates the number of tokens of the text.
+    """
+    return int(len(text) / CHARS_PER_TOKEN + 0.5)
+
+def mmr_order(documents, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """
+        Returns the indices of the documents in maximal marginal relevance order.
+        Uses the "score" (similarity to the query) and "vector" metadata of the search results;
+        without them the retrieval order is kept.
+    """
+    vectors = [doc.metadata.get("vector") for doc in documents]
+    if len(documents) < 2 or any(vector is None for vector in vectors):
+        return list(range(len(documents)))
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    similarity = matrix @ matrix.T
+    relevance = np.array([doc.metadata.get("score", 0.0) for doc in documents], dtype=np.float32)
+
+    order = [int(np.argmax(relevance))]
+    remaining = set(range(len(documents))) - set(order)
+    while remaining:
+        candidates = np.fromiter(remaining, dtype=np.int64)
+        redundancy = similarity[np.ix_(candidates, order)].max(axis=1)
+        scores = lambda_mult * relevance[candidates] - (1 - lambda_mult) * redundancy
+        best = int(candidates[int(np.argmax(scores))])
+        order.append(best)
+        remaining.discard(best)
+    return order
+
+# Overlap accepted between chunks without offsets (indexed before they were stored)
+MIN_OVERLAP = 20
+
+def overlap_length(previous: str, following: str, min_overlap: int = MIN_OVERLAP) -> int:
+    """
+        Length of the longest end of `previous` that `following` starts with, if it is at least
+        min_overlap characters long and starts at a word boundary of `previous`; otherwise 0.
+        Chunk windows restart at the beginning of a word, so shorter or mid-word matches are chance.
+    """
+    for length in range(min(len(previous), len(following)), min_overlap - 1, -1):
+        if previous.endswith(following[:length]) and (length == len(previous) or previous[-length - 1].isspace()):
+            return length
+    return 0
+
+def _append_chunk(text: str, end, doc) -> tuple:
+    """
+        Appends the next chunk of a run to its text; end is the offset where the text ends (None if unknown).
+        Returns the new (text, end).
+    """
+    following = doc.page_content
+    start, following_end = doc.metadata.get("start"), doc.metadata.get("end")
+    if end is not None and start is not None and following_end is not None:
+        # Offsets in the document tell exactly how much of the chunk is already in the text
+        if start >= end:
+            return text + "\n" + following, following_end
+        return text + following[end - start:], max(end, following_end)
+    overlap = overlap_length(text, following)
+    return (text + following[overlap:] if overlap else text + "\n" + following), None
+
+def _document_key(doc, position: int):
+    doc_id = doc.metadata.get("doc_id") or doc.metadata.get("document") or doc.metadata.get("source")
+    return doc_id if doc_id is not None else ("position", position)
+
+def _merge_runs(documents, positions):
+    """
+        Groups the chosen chunks by document and merges consecutive chunks into one text.
+        Returns (key, first position, [docs], text) runs.
+    """
+    groups = {}
+    for position in positions:
+        groups.setdefault(_document_key(documents[position], position), []).append(position)
+
+    runs = []
+    for key, group in groups.items():
+        group.sort(key=lambda position: (documents[position].metadata.get("chunk") is None,
+                                         documents[position].metadata.get("chunk", 0)))
+        run = []
+        for position in group:
+            chunk = documents[position].metadata.get("chunk")
+            if run:
+                previous_chunk = documents[run[-1]].metadata.get("chunk")
+                if chunk is None or previous_chunk is None or chunk != previous_chunk + 1:
+                    runs.append((key, run))
+                    run = []
+            run.append(position)
+        runs.append((key, run))
+
+    merged = []
+    for key, run in runs:
+        text, end = documents[run[0]].page_content, documents[run[0]].metadata.get("end")
+        for position in run[1:]:
+            text, end = _append_chunk(text, end, documents[position])
+        merged.append((key, run, text))
+    return merged
+
+def source_label(documents) -> str:
+    """
+        Describes where the (merged) chunks come from, e.g. "Decision 123, HÜKÜM" or
+        "law.pdf, Madde 4-Madde 6, pages 3-4".
+    """
+    metadata = documents[0].metadata
+    sections = list(dict.fromkeys(doc.metadata["section"] for doc in documents if doc.metadata.get("section")))
+    if metadata.get("decision_id") is not None:
+        label = f"Decision {metadata['decision_id']}"
+        return f"{label}, {', '.join(sections)}" if sections else label
+
+    label = metadata.get("document") or metadata.get("source") or "Document"
+    if sections:
+        label += f", {sections[0]}" if len(sections) == 1 else f", {sections[0]}-{sections[-1]}"
+    page_starts = [doc.metadata["page_start"] for doc in documents if doc.metadata.get("page_start") is not None]
+    page_ends = [doc.metadata["page_end"] for doc in documents if doc.metadata.get("page_end") is not None]
+    if page_starts and page_ends:
+        first, last = min(page_starts), max(page_ends)
+        label += f", page {first}" if first == last else f", pages {first}-{last}"
+    return label
+
+def _render(documents, merged, rank) -> str:
+    merged = sorted(merged, key=lambda item: min(rank[position] for position in item[1]))
+    return "\n\n".join(
+        f"[{number}] {source_label([documents[position] for position in run])}\n{text}"
+        for number, (_, run, text) in enumerate(merged, start=1)
+    )
+
+def pack_context(documents, token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET,
+                 lambda_mult: float = MMR_LAMBDA) -> PackedContext:
+    """
+        Builds the context text from the retrieved documents within token_budget tokens.
+        Chunks are added in MMR order as long as the context still fits; the most relevant chunk
+        is always included. baseline_tokens is the size of the BASELINE_K most relevant documents
+        simply joined, i.e. the context sent without packing.
+    """
+    documents = list(documents)
+    baseline_tokens = estimate_tokens("\n\n".join(doc.page_content for doc in documents[:BASELINE_K]))
+    order = mmr_order(documents, lambda_mult)
+    rank = {position: i for i, position in enumerate(order)}
+
+    chosen = []
+    text = ""
+    for position in order:
+        candidate_text = _render(documents, _merge_runs(documents, chosen + [position]), rank)
+        if chosen and token_budget is not None and estimate_tokens(candidate_text) > token_budget:
+            continue
+        chosen.append(position)
+        text = candidate_text
+
+    return PackedContext(text, estimate_tokens(text), baseline_tokens, len(chosen), len(documents))
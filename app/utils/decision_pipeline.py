@@ -0,0 +1,45 @@
+"""
+    Staged pipeline for court decisions: download -> chunk -> embed and save.
+    Each decision is chunked and indexed as soon as it is downloaded, while the
+    remaining downloads are still running.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from utils.pdf_handler import process_decisions_text, decision_doc_id
+from utils.vektor_store import add_to_vector_store
+from utils.web_searcher import iter_decision_texts, FETCH_MAX_WORKERS
+from utils.lifecycle import register_document, SHARED_NAMESPACE
+from utils import metrics
+
+# Decisions embedded and saved at the same time
+INDEX_WORKERS = 2
+
+def index_decisions(client, embeddings, collection_name: str, decision_ids, max_workers=FETCH_MAX_WORKERS):
+    """
+        Downloads and indexes the given decisions, each as its own document ("decision:<id>").
+        Returns (decision_id, text) pairs of the indexed decisions in ranking order; decisions that
+        could not be indexed are left out.
+        Decisions are kept in the shared namespace until they are not used for DECISION_TTL.
+    """
+    downloaded = {}
+    pending = []
+    index = metrics.bind(add_to_vector_store)
+    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as indexer:
+        for rank, decision_id, text in iter_decision_texts(decision_ids, max_workers=max_workers):
+            docs = process_decisions_text(text, decision_id=decision_id)
+            if not docs:
+                continue
+            downloaded[rank] = (decision_id, text)
+            pending.append((rank, decision_id, len(docs), indexer.submit(
+                index, client, embeddings, docs, collection_name, decision_doc_id(decision_id)
+            )))
+        for rank, decision_id, chunk_count, future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                # The other decisions can still answer the question
+                print(f"⚠️ Decision {decision_id} could not be indexed: {e}")
+                del downloaded[rank]
+                continue
+            register_document(collection_name, decision_doc_id(decision_id), SHARED_NAMESPACE, chunks=chunk_count)
+
+    return [downloaded[rank] for rank in sorted(downloaded)]
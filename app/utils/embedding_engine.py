@@ -0,0 +1,117 @@
+"""
+    Bulk embedding operations.
+    Sends texts to the embedding backend in batches, runs a limited number of batches
+    at the same time and returns the vectors in input order.
+    Gemini requests go through the shared scheduler (gemini_scheduler.py): question embeddings
+    as interactive requests, document batches as bulk ones.
+"""
+import hashlib
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from utils.config import configure_genai
+from utils.gemini_scheduler import get_scheduler
+from utils import metrics
+
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_DIM = 768  # Gemini embedding dimension
+
+# Gemini accepts at most 100 texts in a single embed_content request
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+
+class GeminiEmbeddingBackend:
+    """
+        Embeds a batch of texts with a single Google Gemini API request.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+
+    def embed(self, texts: List[str], task_type: str, request_type: str = "document_embedding") -> List[List[float]]:
+        """
+            Returns one embedding per text.
+        """
+        metrics.count("embedding_api_calls")
+        result = get_scheduler().call(
+            lambda: configure_genai().embed_content(model=self.model_name, content=texts, task_type=task_type),
+            self.model_name, request_type
+        )
+        return result['embedding']
+
+class HashEmbeddingBackend:
+    """
+        Deterministic local embeddings without any API call.
+        Every word is hashed into a fixed dimension, so equal texts always get
+        equal vectors and texts sharing words are similar. Used in tests and offline runs.
+    """
+
+    def __init__(self, dimension: int = EMBEDDING_DIM):
+        self.dimension = dimension
+        self.model_name = f"local/hash-{dimension}"
+
+    def embed(self, texts: List[str], task_type: str, request_type: str = None) -> List[List[float]]:
+        """
+            Returns one normalized embedding per text.
+        """
+        return [self._embed_text(text) for text in texts]
+
+    def _embed_text(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+def get_embedding_backend(model_name=EMBEDDING_MODEL):
+    """
+        Selects the embedding backend from the EMBEDDING_BACKEND environment variable.
+        ("gemini" by default, "local" for the deterministic hash embeddings)
+    """
+    if os.getenv("EMBEDDING_BACKEND", "gemini").lower() == "local":
+        return HashEmbeddingBackend()
+    return GeminiEmbeddingBackend(model_name)
+
+class BatchEmbedder:
+    """
+        Splits texts into batches and embeds them concurrently.
+        Failed requests are retried by the backend (the Gemini scheduler), not here.
+    """
+
+    def __init__(self, backend, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_workers: int = EMBEDDING_MAX_WORKERS):
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+
+    def embed(self, texts: List[str], task_type: str, request_type: str = "document_embedding") -> List[List[float]]:
+        """
+            Returns the embeddings of all texts in the same order as the input.
+        """
+        texts = list(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return []
+
+        if len(batches) == 1 or self.max_workers == 1:
+            results = [self._embed_batch(batch, task_type, request_type) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                # map() keeps the order of the batches
+                embed_batch = metrics.bind(lambda batch: self._embed_batch(batch, task_type, request_type))
+                results = list(executor.map(embed_batch, batches))
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _embed_batch(self, batch: List[str], task_type: str, request_type: str) -> List[List[float]]:
+        """
+            Embeds one batch and checks that every text got a vector.
+        """
+        vectors = self.backend.embed(batch, task_type, request_type)
+        if len(vectors) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, received {len(vectors)}")
+        return vectors
@@ -0,0 +1,134 @@
+"""
+    Local stand-in for google.generativeai.GenerativeModel.
+    Returns deterministic responses with a configurable latency, in one piece or streamed,
+    so the generation code paths can run without the API (tests and benchmarks).
+    A FakeQuota makes the fake answer 429 like the API does when its limits are exceeded.
+"""
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+# Default latencies of the fake model, e.g. for load tests of a server started with GENERATION_BACKEND=fake
+FAKE_FIRST_TOKEN_LATENCY = float(os.getenv("FAKE_FIRST_TOKEN_LATENCY", "0"))
+FAKE_TOKEN_LATENCY = float(os.getenv("FAKE_TOKEN_LATENCY", "0"))
+
+class FakeAPIError(Exception):
+    """
+        An API error with its HTTP status in `code`, like google.api_core exceptions.
+    """
+
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(f"{code} {message}".strip())
+        self.code = code
+
+class FakeQuota:
+    """
+        Server-side limits of the fake API: at most `rpm` requests per rolling minute and
+        `max_concurrency` requests at the same time; anything above is rejected with 429.
+    """
+
+    def __init__(self, rpm: float = None, max_concurrency: int = None, window: float = 60.0):
+        self.rpm = rpm
+        self.max_concurrency = max_concurrency
+        self.window = window
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self._started = deque()
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._started and self._started[0] <= now - self.window:
+                self._started.popleft()
+            if (self.rpm is not None and len(self._started) >= self.rpm * self.window / 60.0) or \
+                    (self.max_concurrency is not None and self.in_flight >= self.max_concurrency):
+                self.rejected += 1
+                raise FakeAPIError(429, "Resource has been exhausted (e.g. check quota).")
+            self._started.append(now)
+            self.in_flight += 1
+            self.accepted += 1
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def call(self, function, *args, **kwargs):
+        """
+            Runs function (the work of one request) within the quota.
+        """
+        self.enter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.exit()
+
+class FakeResponse:
+    """
+        Mimics the parts of a Gemini response used by the application.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))]
+
+class FakeGenerativeModel:
+    """
+        A GenerativeModel replacement.
+        `reply` is a fixed text or a function of the prompt; the first token is returned after
+        `first_token_latency` seconds and every following piece after `token_latency` seconds.
+        Requests count against `quota` (a FakeQuota) if one is given.
+    """
+
+    def __init__(self, model_name: str = "fake-model", reply=None,
+                 first_token_latency: float = FAKE_FIRST_TOKEN_LATENCY, token_latency: float = FAKE_TOKEN_LATENCY,
+                 chunk_words: int = 3, quota: FakeQuota = None):
+        self.model_name = model_name
+        self.reply = reply
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_words = max(1, chunk_words)
+        self.quota = quota
+
+    def _reply_text(self, prompt: str) -> str:
+        if callable(self.reply):
+            return self.reply(prompt)
+        if self.reply is not None:
+            return self.reply
+        words = " ".join(str(prompt).split()[-12:])
+        return f"[{self.model_name}] Answer based on: {words}"
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        """
+            Same call signature as GenerativeModel.generate_content.
+        """
+        text = self._reply_text(prompt)
+        if stream:
+            return self._stream(text)
+        if self.quota is not None:
+            return self.quota.call(self._respond, text)
+        return self._respond(text)
+
+    def _respond(self, text: str):
+        words = text.split(" ")
+        time.sleep(self.first_token_latency + self.token_latency * (len(words) // self.chunk_words))
+        return FakeResponse(text)
+
+    def _stream(self, text: str):
+        # The API rejects a streamed request when the first piece is read
+        if self.quota is not None:
+            self.quota.enter()
+        try:
+            words = text.split(" ")
+            time.sleep(self.first_token_latency)
+            for i in range(0, len(words), self.chunk_words):
+                if i:
+                    time.sleep(self.token_latency)
+                piece = " ".join(words[i:i + self.chunk_words])
+                yield FakeResponse(piece if i == 0 else " " + piece)
+        finally:
+            if self.quota is not None:
+                self.quota.exit()
@@ -0,0 +1,52 @@
+"""
+    Advisory file locks shared between processes (e.g. the Streamlit app and bulk_ingest.py).
+    Uses flock, so the locks are only taken on POSIX systems; elsewhere they are no-ops.
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+class FileLockedError(RuntimeError):
+    """
+        The lock is held by another process.
+    """
+
+def acquire_lock(path: str, blocking: bool = True):
+    """
+        Takes an exclusive lock on the file at path (created if needed) and returns its handle;
+        the lock is held until release_lock() or the end of the process.
+        Without blocking, FileLockedError is raised when another process holds the lock.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a+b")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        handle.close()
+        raise FileLockedError(f"{path} is locked by another process.") from None
+    return handle
+
+def release_lock(handle):
+    """
+        Releases a lock taken with acquire_lock().
+    """
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    handle.close()
+
+@contextmanager
+def file_lock(path: str):
+    """
+        Holds the lock on path for the duration of the block, waiting for other processes.
+    """
+    handle = acquire_lock(path)
+    try:
+        yield
+    finally:
+        release_lock(handle)
@@ -1,40 +1,107 @@
 """
     Generating responses using Google API Key. (Includes document handling)
+    Responses can be returned at once or streamed piece by piece.
+    Every request goes through the shared scheduler (gemini_scheduler.py), which applies the
+    rate limits and retries throttled calls.
 """
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+import time
+from utils.config import configure_genai
+from utils.resources import get_resource, clear_resources
+from utils.context_packer import pack_context, PackedContext, CONTEXT_TOKEN_BUDGET
+from utils.gemini_scheduler import get_scheduler
+from utils import metrics
 
-load_dotenv()
+GENERATION_MODEL = "gemini-2.0-flash"
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+# Creates the model objects; replaced with set_model_factory() e.g. by a FakeGenerativeModel in tests.
+# None means genai.GenerativeModel, the SDK is imported with the first model.
+_model_factory = None
+if os.getenv("GENERATION_BACKEND", "gemini").lower() == "fake":
+    from utils.fake_gemini import FakeGenerativeModel
+    _model_factory = FakeGenerativeModel
 
-def generate_answer(prompt: str):
+def set_model_factory(factory):
+    """
+        Replaces the function that creates a model from its name.
+    """
+    global _model_factory
+    _model_factory = factory
+    clear_resources("model")
+
+def get_model(model_name: str = GENERATION_MODEL):
+    """
+        Returns the shared model handle of the given model.
+    """
+    factory = _model_factory or configure_genai().GenerativeModel
+    return get_resource(("model", model_name), lambda: factory(model_name))
+
+def generate_answer(prompt: str, request_type: str = "answer"):
     """
         Generates a response based on the given prompt
     """
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    response = model.generate_content(prompt)
+    model = get_model(GENERATION_MODEL)
+    metrics.count("generation_api_calls")
+    with metrics.span("generate"):
+        response = get_scheduler().call(lambda: model.generate_content(prompt), GENERATION_MODEL, request_type)
     return response
 
-def generate_answer_from_docs(query, documents) -> str:
+def generate_answer_stream(prompt: str, request_type: str = "answer"):
     """
-        Creates a detailed yet concise response from user query and relevant documents
-        Combines page contents from the documents
+        Generates a response based on the given prompt and yields the text as it arrives.
     """
-    context = "\n\n".join([doc.page_content for doc in documents])
+    model = get_model(GENERATION_MODEL)
+    metrics.count("generation_api_calls")
+    chunks = get_scheduler().stream(
+        lambda: model.generate_content(prompt, stream=True), GENERATION_MODEL, request_type
+    )
+    for chunk in metrics.timed_iter("generate", chunks):
+        # Chunks without parts (e.g. only finish/safety information) have no text
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
 
-    prompt = f"""
+def response_text(response) -> str:
+    """
+        Returns the text of a non-streamed response.
+    """
+    return response.candidates[0].content.parts[0].text
+
+class TimedStream:
+    """
+        Wraps a text stream and measures the time to the first piece and the total time.
+        Times are counted from `started_at` (the creation of the wrapper by default).
+    """
+
+    def __init__(self, chunks, started_at: float = None):
+        self.chunks = chunks
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.text = ""
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.first_token_seconds is None:
+                self.first_token_seconds = time.perf_counter() - self.started_at
+            self.text += chunk
+            yield chunk
+        self.total_seconds = time.perf_counter() - self.started_at
+
+def build_docs_prompt(query, context: PackedContext) -> str:
+    """
+        Creates the prompt for answering the query from the packed document context.
+    """
+    return f"""
         Below you will find a legal question from the user and text excerpts obtained from documents related to this question.
         Considering the documents, create a detailed but concise response in formal and understandable language.
+        Each excerpt starts with its number and source in square brackets.
 
         Question:
         \"{query}\"
 
         Relevant Documents:
         \"\"\"
-        {context}
+        {context.text}
         \"\"\"
 
         The answer should be based solely on the information in the documents and should not include any speculation.
@@ -42,4 +109,19 @@ def generate_answer_from_docs(query, documents) -> str:
 
         Answer:
         """
+
+def generate_answer_from_docs(query, documents, stream: bool = False, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+        Creates a detailed yet concise response from user query and relevant documents.
+        The documents are packed into at most token_budget context tokens (see context_packer.py).
+        With stream=True a generator of text pieces is returned instead of the response.
+    """
+    with metrics.span("pack_context"):
+        context = pack_context(documents, token_budget)
+    metrics.count("context_tokens", context.tokens)
+    metrics.count("context_chunks", context.chunks)
+    metrics.count("prompt_tokens_saved", context.baseline_tokens - context.tokens)
+    prompt = build_docs_prompt(query, context)
+    if stream:
+        return generate_answer_stream(prompt)
     return generate_answer(prompt)
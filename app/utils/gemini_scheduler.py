@@ -0,0 +1,355 @@
+"""
+    Process-wide scheduler of the Gemini API calls.
+    Answers, keyword extraction and embeddings share the same API quota, so every call goes
+    through one scheduler:
+    - token buckets limit the requests per minute of each model and of each request type,
+    - interactive requests (answers, keywords, question embeddings) are started before bulk
+      ones (document embeddings) whenever both are waiting,
+    - the number of concurrent calls per model adapts to the API (AIMD): it grows by one after
+      a window of successful calls and is halved when the API answers 429 or 5xx,
+    - failed calls are retried with exponential backoff as long as the request deadline allows.
+    The clock and sleep functions can be replaced, e.g. to test against utils/fake_gemini.FakeQuota.
+"""
+import bisect
+import itertools
+import os
+import random
+import threading
+import time
+from utils.resources import get_resource
+from utils import metrics
+
+INTERACTIVE = 0
+BULK = 1
+
+# Priority of every request type
+REQUEST_TYPES = {
+    "answer": INTERACTIVE,
+    "keywords": INTERACTIVE,
+    "query_embedding": INTERACTIVE,
+    "document_embedding": BULK,
+}
+
+def _parse_limits(value: str) -> dict:
+    """
+        Reads "name=requests per minute,..." settings.
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, rpm = item.rsplit("=", 1)
+            limits[name.strip()] = float(rpm)
+    return limits
+
+# Requests per minute of each model and (optionally) of each request type
+MODEL_RPM = _parse_limits(os.getenv("GEMINI_MODEL_RPM", "gemini-2.0-flash=2000,models/embedding-001=1500"))
+TYPE_RPM = _parse_limits(os.getenv("GEMINI_TYPE_RPM", "document_embedding=1200"))
+DEFAULT_MODEL_RPM = float(os.getenv("GEMINI_DEFAULT_MODEL_RPM", "1000"))
+# Requests a bucket can start at once after an idle period, in seconds of its rate
+BURST_SECONDS = float(os.getenv("GEMINI_BURST_SECONDS", "2"))
+
+# Concurrent calls per model
+INITIAL_CONCURRENCY = int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "8"))
+MIN_CONCURRENCY = int(os.getenv("GEMINI_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+
+# Seconds a request may take, waiting and retries included
+INTERACTIVE_DEADLINE = float(os.getenv("GEMINI_INTERACTIVE_DEADLINE", "60"))
+BULK_DEADLINE = float(os.getenv("GEMINI_BULK_DEADLINE", "600"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "6"))
+RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "1.0"))
+MAX_RETRY_DELAY = 30.0
+
+# HTTP statuses of an overloaded API: the call is retried and the model's concurrency is lowered
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+class SchedulerError(Exception):
+    """
+        A call the scheduler gave up on; the callers should not retry it again.
+    """
+
+class DeadlineExceeded(SchedulerError):
+    pass
+
+class RetriesExhausted(SchedulerError):
+    pass
+
+def error_status(error):
+    """
+        HTTP status of an API error (google.api_core errors carry it as `code`), or None.
+    """
+    for status in (getattr(error, "code", None), getattr(error, "status_code", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+def is_throttled(error) -> bool:
+    return error_status(error) in THROTTLE_STATUSES
+
+def is_retryable(error) -> bool:
+    return is_throttled(error) or isinstance(error, (ConnectionError, TimeoutError))
+
+class TokenBucket:
+    """
+        Allows `rate_per_minute` requests per minute, with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None, now: float = 0.0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, capacity if capacity is not None else self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """
+            Seconds until a request can be started (0 if it can be started now).
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+class _ModelState:
+    __slots__ = ("limit", "in_flight", "decreased_at")
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.decreased_at = float("-inf")
+
+class _Waiter:
+    __slots__ = ("order", "model", "buckets", "granted_at")
+
+    def __init__(self, order, model, buckets):
+        self.order = order
+        self.model = model
+        self.buckets = buckets
+        self.granted_at = None
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+class GeminiScheduler:
+    """
+        Starts the API calls of all threads in priority order within the rate and concurrency limits.
+    """
+
+    def __init__(self, model_rpm: dict = None, type_rpm: dict = None, default_model_rpm: float = DEFAULT_MODEL_RPM,
+                 initial_concurrency: int = INITIAL_CONCURRENCY, min_concurrency: int = MIN_CONCURRENCY,
+                 max_concurrency: int = MAX_CONCURRENCY, max_retries: int = MAX_RETRIES,
+                 backoff: float = RETRY_BACKOFF, burst_seconds: float = BURST_SECONDS,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.model_rpm = MODEL_RPM if model_rpm is None else model_rpm
+        self.type_rpm = TYPE_RPM if type_rpm is None else type_rpm
+        self.default_model_rpm = default_model_rpm
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.initial_concurrency = min(max(initial_concurrency, self.min_concurrency), self.max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self.sleep = sleep
+
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiting = []  # _Waiter, in (priority, arrival) order
+        self._buckets = {}
+        self._models = {}
+        self.throttled = 0
+        self.retries = 0
+
+    def _bucket(self, key, rpm):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rpm, rpm / 60.0 * self.burst_seconds, now=self.clock())
+        return bucket
+
+    def _model(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(float(self.initial_concurrency))
+        return state
+
+    def _dispatch(self, now: float):
+        """
+            Starts the waiting requests that the limits allow, highest priority first.
+            Returns the seconds until a token bucket can start the next one (None if no request waits for one).
+        """
+        next_wait = None
+        granted = False
+        for waiter in list(self._waiting):
+            state = self._models[waiter.model]
+            if state.in_flight >= int(state.limit):
+                continue
+            wait = max(bucket.wait_time(now) for bucket in waiter.buckets)
+            if wait > 0:
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+                continue
+            for bucket in waiter.buckets:
+                bucket.take(now)
+            state.in_flight += 1
+            waiter.granted_at = now
+            self._waiting.remove(waiter)
+            granted = True
+        if granted:
+            self._condition.notify_all()
+        return next_wait
+
+    def _publish(self):
+        metrics.gauge("gemini_queue_depth", len(self._waiting))
+        for model, state in self._models.items():
+            metrics.gauge(f"gemini_in_flight:{model}", state.in_flight)
+            metrics.gauge(f"gemini_concurrency_limit:{model}", int(state.limit))
+
+    def acquire(self, model: str, request_type: str, deadline: float) -> float:
+        """
+            Waits until the request may be started and returns the time it was started at.
+            Raises DeadlineExceeded if that does not happen before the deadline.
+        """
+        priority = REQUEST_TYPES.get(request_type, BULK)
+        queued_at = now = self.clock()
+        with self._condition:
+            self._model(model)
+            buckets = [self._bucket(("model", model), self.model_rpm.get(model, self.default_model_rpm))]
+            if request_type in self.type_rpm:
+                buckets.append(self._bucket(("type", request_type), self.type_rpm[request_type]))
+            waiter = _Waiter((priority, next(self._sequence)), model, buckets)
+            bisect.insort(self._waiting, waiter)
+            try:
+                while True:
+                    next_wait = self._dispatch(now)
+                    if waiter.granted_at is not None:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        metrics.count("gemini_deadline_exceeded")
+                        raise DeadlineExceeded(f"{request_type} request to {model} was not started in time")
+                    self._publish()
+                    self._condition.wait(remaining if next_wait is None else min(remaining, next_wait))
+                    now = self.clock()
+            finally:
+                if waiter.granted_at is None:
+                    self._waiting.remove(waiter)
+                self._publish()
+        metrics.observe("gemini_queue_wait", waiter.granted_at - queued_at)
+        return waiter.granted_at
+
+    def release(self, model: str, started_at: float, error=None):
+        """
+            Frees the concurrency slot of a finished call and adapts the model's limit to its outcome.
+        """
+        with self._condition:
+            state = self._models[model]
+            state.in_flight -= 1
+            now = self.clock()
+            if error is not None and is_throttled(error):
+                self.throttled += 1
+                metrics.count("gemini_throttled")
+                # Calls started before the last decrease ran under the old limit, they do not lower it again
+                if started_at >= state.decreased_at:
+                    state.limit = max(float(self.min_concurrency), state.limit / 2)
+                    state.decreased_at = now
+            elif error is None:
+                # +1 after as many successful calls as the current limit
+                state.limit = min(float(self.max_concurrency), state.limit + 1 / state.limit)
+            self._dispatch(now)
+            # Waiters blocked by the concurrency limit recheck their token buckets
+            self._condition.notify_all()
+            self._publish()
+
+    def _retry_delay(self, error, attempt: int, deadline: float, request_type: str) -> float:
+        """
+            Returns the backoff before the next attempt, or raises when the call should not be retried.
+        """
+        if not is_retryable(error):
+            raise error
+        if attempt >= self.max_retries:
+            raise RetriesExhausted(f"{request_type} request failed {attempt + 1} times: {error}") from error
+        delay = min(MAX_RETRY_DELAY, self.backoff * (2 ** attempt)) * (1 + random.random() * 0.1)
+        if self.clock() + delay >= deadline:
+            metrics.count("gemini_deadline_exceeded")
+            raise DeadlineExceeded(f"{request_type} request failed with no time left to retry: {error}") from error
+        print(f"⚠️ Gemini {request_type} request failed ({error}), retrying in {delay:.1f}s...")
+        self.retries += 1
+        metrics.count("gemini_retries")
+        return delay
+
+    def _deadline(self, request_type: str, timeout: float = None) -> float:
+        if timeout is None:
+            timeout = INTERACTIVE_DEADLINE if REQUEST_TYPES.get(request_type, BULK) == INTERACTIVE else BULK_DEADLINE
+        return self.clock() + timeout
+
+    def call(self, function, model: str, request_type: str, timeout: float = None):
+        """
+            Runs function() (one API call) within the limits and returns its result, retrying transient errors.
+        """
+        deadline = self._deadline(request_type, timeout)
+        attempt = 0
+        while True:
+            started_at = self.acquire(model, request_type, deadline)
+            try:
+                result = function()
+            except Exception as e:
+                self.release(model, started_at, e)
+                self.sleep(self._retry_delay(e, attempt, deadline, request_type))
+                attempt += 1
+                continue
+            self.release(model, started_at)
+            return result
+
+    def stream(self, open_stream, model: str, request_type: str, timeout: float = None):
+        """
+            Yields the pieces of the streamed call open_stream() within the limits.
+            The call holds its concurrency slot until the stream ends; it is only retried
+            if it fails before the first piece arrived.
+        """
+        deadline = self._deadline(request_type, timeout)
+        attempt = 0
+        while True:
+            started_at = self.acquire(model, request_type, deadline)
+            error = None
+            received = False
+            try:
+                for piece in open_stream():
+                    received = True
+                    yield piece
+                return
+            except Exception as e:
+                error = e
+                if received:
+                    raise
+            finally:
+                self.release(model, started_at, error)
+            self.sleep(self._retry_delay(error, attempt, deadline, request_type))
+            attempt += 1
+
+    def stats(self) -> dict:
+        """
+            Current queue and concurrency of the scheduler.
+        """
+        with self._condition:
+            return {
+                "queued_interactive": sum(waiter.order[0] == INTERACTIVE for waiter in self._waiting),
+                "queued_bulk": sum(waiter.order[0] == BULK for waiter in self._waiting),
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "models": {
+                    model: {"in_flight": state.in_flight, "concurrency_limit": int(state.limit)}
+                    for model, state in self._models.items()
+                }
+            }
+
+def get_scheduler() -> GeminiScheduler:
+    """
+        Returns the scheduler shared by every thread of the process.
+    """
+    return get_resource(("gemini_scheduler",), GeminiScheduler)
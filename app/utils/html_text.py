@@ -0,0 +1,181 @@
+"""
+    Text extraction from court decision HTML.
+    A single regex pass over the tags gives the same text as BeautifulSoup's
+    body.get_text("\\n", strip=True) (every text node between two tags stripped, empty ones dropped,
+    entities decoded) without building a tree. Input it does not handle the same way, e.g. stray
+    "<" before a letter, CDATA, <template>, nested <body> tags, falls back to BeautifulSoup.
+    Many decisions can be extracted by a process pool (HTML_EXTRACT_WORKERS).
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5
+from utils.resources import get_resource
+from utils import metrics
+
+# Processes that extract decision texts for the fetch threads, 0 extracts in the calling thread
+HTML_EXTRACT_WORKERS = int(os.getenv("HTML_EXTRACT_WORKERS", "0"))
+# Smaller documents are extracted in the calling thread even when the pool is on
+POOL_MIN_BYTES = 64 * 1024
+
+_TOKEN_RE = re.compile(r"""
+    <(?:
+        (?P<raw>script|style)\b(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|=)*(?<!/)>.*?</\s*(?P=raw)\s*>
+      | (?P<end>/)?(?P<name>[a-zA-Z][-.a-zA-Z0-9:_]*)(?=[\s/>])(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|=)*>
+      | !--(?!-?>)[^-]*(?:-[^-]+)*-->
+      | ![a-zA-Z][^>]*>
+      | \?[^>]*>
+    )""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+# Character references with a semicolon; any other "&" before a letter or "#" is left to the tree builder
+_ENTITY_RE = re.compile(r"&(?:#([0-9]{1,7});|#[xX]([0-9a-fA-F]{1,6});|([a-zA-Z][a-zA-Z0-9]*);|(?=[a-zA-Z#]))")
+
+# Named references without the semicolon, as BeautifulSoup resolves them
+_ENTITIES = {name[:-1]: value for name, value in html5.items() if name.endswith(";")}
+
+# A "<" the tokenizer did not consume that the HTML parser would still read as markup
+_MARKUP_RE = re.compile(r"<[a-zA-Z/!?]")
+
+# Elements the HTML tree builder keeps open until their end tag (no text of their own)
+_VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer"
+))
+
+# Elements whose strings get_text() leaves out, besides script and style
+_EXCLUDED_ELEMENTS = frozenset(("template", "rt", "rp"))
+
+class _Unsupported(Exception):
+    pass
+
+def _entity(match) -> str:
+    decimal, hexadecimal, name = match.groups()
+    if name is not None:
+        # Unknown names are kept without their semicolon
+        return _ENTITIES.get(name, "&" + name)
+    if decimal is None and hexadecimal is None:
+        raise _Unsupported
+    code = int(decimal, 10) if decimal is not None else int(hexadecimal, 16)
+    # NUL, surrogates and out of range become U+FFFD, C1 controls are read as windows-1252
+    if code == 0 or 0x80 <= code <= 0x9f or 0xd800 <= code <= 0xdfff or code > 0x10ffff:
+        raise _Unsupported
+    return chr(code)
+
+def _unescape(text: str) -> str:
+    return _ENTITY_RE.sub(_entity, text) if "&" in text else text
+
+def _fast_text(html: str) -> str:
+    """
+        Returns the text of the <body>, or raises _Unsupported when the tree builder could read it differently.
+    """
+    open_tags = []
+    lines = []
+    # Unescaped text since the last tag that ends a text node
+    pending = []
+    # Void elements opened as <br>; BeautifulSoup skips one later </br> each, without ending the text node
+    closed_void = []
+    in_body = False
+    position = 0
+
+    def take_text(end: int):
+        text = html[position:end]
+        if "<" in text and _MARKUP_RE.search(text):
+            raise _Unsupported
+        if text and in_body:
+            pending.append(_unescape(text))
+
+    def flush():
+        text = "".join(pending).strip()
+        pending.clear()
+        if text:
+            lines.append(text)
+
+    for token in _TOKEN_RE.finditer(html):
+        take_text(token.start())
+        position = token.end()
+
+        name = token.group("name")
+        name = name.lower() if name is not None else None
+        if token.group("end") and name in closed_void:
+            closed_void.remove(name)
+            continue
+        flush()
+        if name is None:
+            continue
+        if name in _EXCLUDED_ELEMENTS or name in ("script", "style"):
+            # script and style only get here unterminated, self-closed or as a stray end tag
+            raise _Unsupported
+
+        if token.group("end"):
+            if in_body:
+                if name == "body" or (name == "html" and "html" in open_tags):
+                    return "\n".join(lines)
+            elif name in open_tags:
+                del open_tags[len(open_tags) - 1 - open_tags[::-1].index(name):]
+        elif name in ("body", "html"):
+            # A body inside another element, a second one or an <html> inside it changes what closes the body
+            if in_body or name == "html" and open_tags or any(tag != "html" for tag in open_tags):
+                raise _Unsupported
+            if name == "html":
+                open_tags.append(name)
+            else:
+                in_body = True
+        elif name in _VOID_ELEMENTS:
+            if not token.group().endswith("/>"):
+                closed_void.append(name)
+        elif not in_body and not token.group().endswith("/>"):
+            open_tags.append(name)
+
+    if not in_body:
+        return ""
+    take_text(len(html))
+    flush()
+    return "\n".join(lines)
+
+def soup_text(html: str) -> str:
+    """
+        Text of the <body> read by BeautifulSoup (the reference the fast path matches).
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    body = soup.find("body")
+    return body.get_text(separator="\n", strip=True) if body else ""
+
+def html_to_text(html: str) -> str:
+    """
+        Extracts only the text content of the <body>.
+    """
+    try:
+        return _fast_text(html)
+    except _Unsupported:
+        metrics.count("html_fallbacks")
+        return soup_text(html)
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    # Spawned like the PDF page pool, the fetch threads are running when it starts
+    return get_resource(("html_extract_pool",), lambda: ProcessPoolExecutor(
+        max_workers=HTML_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    ))
+
+def extract_text(html: str) -> str:
+    """
+        Extracts the text in the shared process pool when it is enabled and the document is large,
+        so concurrent fetch threads do not take turns on the GIL.
+    """
+    if HTML_EXTRACT_WORKERS > 0 and len(html) >= POOL_MIN_BYTES:
+        return get_extract_pool().submit(html_to_text, html).result()
+    return html_to_text(html)
+
+def extract_texts(htmls, workers: int = None) -> list:
+    """
+        Extracts the texts of many documents, in a process pool when workers > 1.
+    """
+    htmls = list(htmls)
+    workers = HTML_EXTRACT_WORKERS if workers is None else workers
+    if workers <= 1 or len(htmls) < 2:
+        return [html_to_text(html) for html in htmls]
+    with ProcessPoolExecutor(max_workers=min(workers, len(htmls)),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(html_to_text, htmls, chunksize=max(1, len(htmls) // (workers * 4))))
@@ -0,0 +1,177 @@
+"""
+    Background ingestion of uploaded PDFs.
+    A PDF is parsed, embedded and saved by a worker as soon as it is uploaded. Jobs are kept
+    per file content in a process-wide registry, so they survive Streamlit reruns and are shared
+    by all sessions; at most INGEST_MAX_JOBS files are processed at the same time.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.pdf_handler import iter_pdf_chunks, CHUNK_SIZE, CHUNK_OVERLAP
+from utils.vektor_store import initialize_vector_store, add_stream_to_vector_store, get_embeddings, PDF_COLLECTION
+from utils.ingestion_manifest import file_content_hash, ingestion_params, is_indexed, record_ingestion
+from utils.resources import get_resource
+from utils.lifecycle import register_document
+
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "2"))
+# Finished jobs are forgotten after this many seconds, and the oldest ones beyond the limit earlier
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))
+INGEST_MAX_FINISHED_JOBS = int(os.getenv("INGEST_MAX_FINISHED_JOBS", "100"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class IngestionJob:
+    """
+        State and progress of the ingestion of one file content.
+    """
+
+    def __init__(self, content_hash: str, pdf_path: str):
+        self.content_hash = content_hash
+        self.pdf_path = pdf_path
+        self.document = os.path.basename(pdf_path)
+        self.status = QUEUED
+        self.page_count = None
+        self.pages_parsed = 0
+        self.chunks_embedded = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+            Waits until the job has finished; returns False on timeout.
+        """
+        return self._finished.wait(timeout)
+
+    def progress(self) -> float:
+        """
+            Share of the pages parsed so far (1.0 once the job has finished).
+        """
+        if self.finished:
+            return 1.0
+        if not self.page_count:
+            return 0.0
+        return min(self.pages_parsed / self.page_count, 1.0)
+
+    def _finish(self, status: str, error: str = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._finished.set()
+
+class IngestionJobs:
+    """
+        Registry of ingestion jobs keyed by the content hash of the file.
+        Queued and running jobs are always kept; finished ones only until they are pruned.
+    """
+
+    def __init__(self, collection_name: str = PDF_COLLECTION, max_jobs: int = INGEST_MAX_JOBS):
+        self.collection_name = collection_name
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="ingestion")
+
+    def submit(self, pdf_path: str, content_hash: str = None) -> IngestionJob:
+        """
+            Starts the ingestion of the file unless the same content is already indexed,
+            queued or being processed. Returns the job of the content.
+        """
+        content_hash = content_hash or file_content_hash(pdf_path)
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(content_hash)
+            # A finished job is only reused while its content is still in the index
+            if job is not None and job.status != FAILED and (
+                    job.status != DONE or is_indexed(self.collection_name, content_hash, self._params())):
+                return job
+
+            job = IngestionJob(content_hash, pdf_path)
+            self._jobs[content_hash] = job
+            self._executor.submit(self._run, job)
+        return job
+
+    def get(self, content_hash: str):
+        """
+            Returns the job of the content, or None.
+        """
+        with self._lock:
+            return self._jobs.get(content_hash)
+
+    def jobs(self) -> list:
+        """
+            Returns all jobs, newest first.
+        """
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _prune(self, now: float = None):
+        """
+            Drops finished jobs older than INGEST_JOB_TTL and the oldest ones beyond
+            INGEST_MAX_FINISHED_JOBS. Called with the lock held.
+        """
+        now = time.time() if now is None else now
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at, reverse=True
+        )
+        for position, job in enumerate(finished):
+            if position >= INGEST_MAX_FINISHED_JOBS or now - job.finished_at > INGEST_JOB_TTL:
+                del self._jobs[job.content_hash]
+
+    @staticmethod
+    def _params() -> dict:
+        return ingestion_params(CHUNK_SIZE, CHUNK_OVERLAP, get_embeddings().model_name)
+
+    def _run(self, job: IngestionJob):
+        try:
+            client, embeddings = initialize_vector_store(self.collection_name)
+            params = self._params()
+            if is_indexed(self.collection_name, job.content_hash, params):
+                job._finish(DONE)
+                return
+
+            import fitz
+            job.status = RUNNING
+            # Registered before the first points are saved, so a sweep never sees them as orphans
+            register_document(self.collection_name, job.content_hash)
+            with fitz.open(job.pdf_path) as pdf_doc:
+                job.page_count = pdf_doc.page_count
+
+            def chunks():
+                for chunk in iter_pdf_chunks(job.pdf_path, CHUNK_SIZE, CHUNK_OVERLAP):
+                    job.pages_parsed = max(job.pages_parsed, chunk.metadata.get("page_end", 0))
+                    yield chunk
+
+            def on_progress(saved_chunks):
+                job.chunks_embedded = saved_chunks
+
+            chunk_count = add_stream_to_vector_store(
+                client, embeddings, chunks(), self.collection_name, doc_id=job.content_hash, on_progress=on_progress
+            )
+            record_ingestion(self.collection_name, job.content_hash, params, job.document, chunk_count)
+            register_document(self.collection_name, job.content_hash, chunks=chunk_count)
+            job.pages_parsed = job.page_count
+            job._finish(DONE)
+        except Exception as e:
+            print(f"⚠️ Ingestion of {job.document} failed: {e}")
+            job._finish(FAILED, str(e))
+
+def get_ingestion_jobs() -> IngestionJobs:
+    """
+        Returns the shared job registry of the process.
+    """
+    return get_resource(("ingestion_jobs", PDF_COLLECTION), IngestionJobs)
+
+def submit_ingestion(pdf_path: str, content_hash: str = None) -> IngestionJob:
+    """
+        Starts (or reuses) the background ingestion of the PDF.
+    """
+    return get_ingestion_jobs().submit(pdf_path, content_hash)
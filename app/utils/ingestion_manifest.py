@@ -0,0 +1,93 @@
+"""
+    Ingestion manifest for documents saved to the vector store.
+    Keeps track of which file contents were indexed with which chunking and embedding settings.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from utils.chunker import CHUNKER_VERSION
+from utils.file_lock import file_lock
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "ingestion_manifest.json")
+# Serializes the updates of the processes sharing the manifest (the app and bulk_ingest.py)
+MANIFEST_LOCK_PATH = f"{MANIFEST_PATH}.lock"
+
+_lock = threading.Lock()
+
+def file_content_hash(path: str) -> str:
+    """
+        Calculates the SHA-256 hash of the file content in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ingestion_params(chunk_size: int, chunk_overlap: int, embedding_model: str,
+                     chunker: str = CHUNKER_VERSION) -> dict:
+    """
+        Returns the parameters that affect the indexed content of a document.
+    """
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model,
+        "chunker": chunker
+    }
+
+def _load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest: dict):
+    os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def is_indexed(collection_name: str, content_hash: str, params: dict) -> bool:
+    """
+        Checks whether the content was already indexed into the collection with the same parameters.
+    """
+    with _lock:
+        entry = _load_manifest().get(collection_name, {}).get(content_hash)
+    return entry is not None and entry.get("params") == params
+
+def manifest_entries(collection_name: str) -> dict:
+    """
+        Returns {content hash: entry} of the documents indexed into the collection.
+    """
+    with _lock:
+        return _load_manifest().get(collection_name, {})
+
+def record_ingestion(collection_name: str, content_hash: str, params: dict,
+                     document: str, chunk_count: int):
+    """
+        Saves the indexed document to the manifest.
+    """
+    with _lock, file_lock(MANIFEST_LOCK_PATH):
+        manifest = _load_manifest()
+        manifest.setdefault(collection_name, {})[content_hash] = {
+            "params": params,
+            "document": document,
+            "chunks": chunk_count,
+            "indexed_at": datetime.now().isoformat(timespec="seconds")
+        }
+        _save_manifest(manifest)
+
+def forget_ingestion(collection_name: str, content_hash: str):
+    """
+        Removes a document from the manifest so it gets indexed again.
+    """
+    with _lock, file_lock(MANIFEST_LOCK_PATH):
+        manifest = _load_manifest()
+        if manifest.get(collection_name, {}).pop(content_hash, None) is not None:
+            _save_manifest(manifest)
@@ -1,21 +1,224 @@
 """
     Extracts keywords from the entered question.
-    Returns these keywords using the generate_answer() function.
+    The local extractor scores the words of the question with TF-IDF against a vocabulary
+    built from the fetched court decisions. The generate_answer() based extractor is used
+    when KEYWORD_EXTRACTOR=llm, or as a fallback when the local one finds too few keywords.
 """
-from utils.gemini_handler import generate_answer
+import atexit
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from utils.gemini_handler import generate_answer, response_text
 
-def extract_keywords(question, max_keywords=5):
+KEYWORD_EXTRACTOR = os.getenv("KEYWORD_EXTRACTOR", "local")
+MIN_LOCAL_KEYWORDS = 2
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+VOCABULARY_PATH = os.path.join(CACHE_DIR, "keyword_vocabulary.json")
+# Seconds to collect vocabulary updates before they are written in the background
+VOCABULARY_SAVE_DELAY = float(os.getenv("VOCABULARY_SAVE_DELAY", "10"))
+# Words kept in the vocabulary (the most frequent ones) and documents remembered as counted
+VOCABULARY_MAX_TERMS = int(os.getenv("VOCABULARY_MAX_TERMS", "50000"))
+VOCABULARY_MAX_DOCUMENTS = int(os.getenv("VOCABULARY_MAX_DOCUMENTS", "100000"))
+
+# Digits are kept: law and article numbers ("4857 sayılı", "17. madde") are the best search terms
+TOKEN_PATTERN = re.compile(r"[0-9a-zçğıöşüâîû]+")
+
+TURKISH_STOPWORDS = {
+    "acaba", "ama", "ancak", "artık", "aslında", "bana", "bazı", "belki", "ben", "beni", "benim", "bir",
+    "biri", "birkaç", "birşey", "biz", "bize", "bizim", "bu", "buna", "bunda", "bundan", "bunu", "bunun",
+    "çok", "çünkü", "da", "daha", "de", "değil", "diye", "eğer", "en", "gibi", "göre", "hangi", "hangisi",
+    "hem", "hep", "her", "hiç", "için", "ile", "ise", "kadar", "kendi", "ki", "kim", "kime", "mı", "mi",
+    "mu", "mü", "mıdır", "midir", "nasıl", "ne", "neden", "nedir", "nerede", "nereye", "niçin", "niye",
+    "o", "olan", "olarak", "oldu", "olduğu", "olmak", "olur", "ona", "ondan", "onu", "onun", "sen",
+    "siz", "şey", "şu", "şunu", "tüm", "var", "ve", "veya", "ya", "yani", "yok", "zaman", "sonra",
+    "önce", "olursa", "olsa", "mıyım", "miyim", "mısınız", "misiniz", "alabilir", "alabilirim",
+    "edebilir", "edebilirim", "yapabilir", "yapabilirim", "istiyorum", "lazım", "gerekir", "durumda",
+    "durumunda", "hakkında", "konusunda", "nelerdir", "nereden", "kaç", "ayrıca", "veyahut", "yine"
+}
+# Words of a legislation reference; the numbers next to them carry the meaning
+CITATION_STOPWORDS = {
+    "sayılı", "kanun", "kanunu", "kanununun", "kanununda", "kanunun", "madde", "maddesi", "maddesinde",
+    "maddesine", "maddeye", "maddenin", "fıkra", "fıkrası", "fıkrasında", "bent", "bendi", "bendinde", "yönetmelik",
+    "yönetmeliği"
+}
+ENGLISH_STOPWORDS = {
+    "the", "and", "for", "with", "what", "which", "who", "whom", "how", "when", "where", "why", "can",
+    "could", "should", "would", "does", "did", "are", "was", "were", "been", "being", "have", "has",
+    "had", "this", "that", "these", "those", "there", "their", "from", "into", "about", "under", "any",
+    "not", "you", "your", "our", "his", "her", "its", "they", "them", "will", "shall", "may", "might",
+    "must", "get", "got", "case", "question", "legal", "law"
+}
+STOPWORDS = TURKISH_STOPWORDS | ENGLISH_STOPWORDS | CITATION_STOPWORDS
+
+# Words that are almost always worth searching for in a legal question
+LEGAL_TERMS = {
+    "tazminat", "boşanma", "nafaka", "velayet", "kıdem", "ihbar", "fazla", "mesai", "icra", "haciz",
+    "kira", "tahliye", "kiracı", "alacak", "itiraz", "zamanaşımı", "hakaret", "tehdit", "dolandırıcılık",
+    "hırsızlık", "kasten", "taksirle", "yaralama", "trafik", "kaza", "sigorta", "ehliyetsiz", "miras",
+    "tapu", "tescil", "ecrimisil", "işçi", "işveren", "fesih", "sözleşme", "tüketici", "ayıplı", "kefil",
+    "senet", "çek", "bono", "ipotek", "vasiyet", "mal", "rejimi", "nüfus", "soybağı", "tanıma", "iflas",
+    "konkordato", "manevi", "maddi", "işe", "iade", "arabuluculuk", "kamulaştırma", "imar", "ortaklığın",
+    "giderilmesi", "men", "müdahale", "vekalet", "ücret", "rücu", "hükmün", "bozma"
+}
+LEGAL_TERM_BONUS = 1.5
+
+_vocabulary_lock = threading.Lock()
+_save_lock = threading.Lock()
+_vocabulary = None
+_save_timer = None
+
+def turkish_lower(text: str) -> str:
     """
-        Extracts the specified number of keywords from the given legal question.
+        Lowercases text with the Turkish rules for I/ı and İ/i.
+    """
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+def tokenize(text: str) -> list:
+    """
+        Splits text into lowercase words, dropping apostrophe suffixes (e.g. "Yargıtay'ın" -> "yargıtay").
+    """
+    text = re.sub(r"['’][a-zçğıöşü]+", "", turkish_lower(text))
+    return TOKEN_PATTERN.findall(text)
+
+def is_legal_term(token: str) -> bool:
+    """
+        Checks whether the word is a legal term, with or without suffixes ("tazminatı" -> "tazminat").
+    """
+    return token in LEGAL_TERMS or any(len(term) > 3 and token.startswith(term) for term in LEGAL_TERMS)
+
+def _load_vocabulary() -> dict:
+    global _vocabulary
+    if _vocabulary is None:
+        try:
+            with open(VOCABULARY_PATH, encoding="utf-8") as f:
+                _vocabulary = json.load(f)
+        except (OSError, ValueError):
+            _vocabulary = {"documents": 0, "df": {}}
+        # IDs of the counted documents, oldest first
+        _vocabulary["counted"] = dict.fromkeys(_vocabulary.get("counted", []))
+    return _vocabulary
+
+def _prune(vocabulary: dict):
+    """
+        Keeps the most frequent words (90% of VOCABULARY_MAX_TERMS once it is exceeded, so that
+        pruning does not run on every update) and the VOCABULARY_MAX_DOCUMENTS most recently
+        counted document IDs.
+    """
+    df = vocabulary["df"]
+    if len(df) > VOCABULARY_MAX_TERMS:
+        vocabulary["df"] = dict(Counter(df).most_common(VOCABULARY_MAX_TERMS * 9 // 10))
+    counted = vocabulary["counted"]
+    for doc_id in list(counted)[:max(0, len(counted) - VOCABULARY_MAX_DOCUMENTS)]:
+        del counted[doc_id]
+
+def update_vocabulary(documents):
+    """
+        Adds the document frequencies of the words in the given (document ID, text) pairs
+        (e.g. fetched decisions) to the legal-domain vocabulary.
+        Documents counted before are skipped; the vocabulary is saved in the background.
+    """
+    global _save_timer
+    with _vocabulary_lock:
+        vocabulary = _load_vocabulary()
+        counted = vocabulary["counted"]
+        new_documents = [(str(doc_id), text) for doc_id, text in documents if text and str(doc_id) not in counted]
+        if not new_documents:
+            return
+        df = vocabulary["df"]
+        for doc_id, text in new_documents:
+            for token in set(tokenize(text)):
+                df[token] = df.get(token, 0) + 1
+            counted[doc_id] = None
+        vocabulary["documents"] += len(new_documents)
+        _prune(vocabulary)
+
+        if _save_timer is None:
+            _save_timer = threading.Timer(VOCABULARY_SAVE_DELAY, save_vocabulary)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+def save_vocabulary():
+    """
+        Writes the vocabulary to VOCABULARY_PATH if it changed since the last save.
+    """
+    global _save_timer
+    with _save_lock:
+        with _vocabulary_lock:
+            if _save_timer is None:
+                return
+            _save_timer.cancel()
+            _save_timer = None
+            vocabulary = dict(_vocabulary, df=dict(_vocabulary["df"]), counted=list(_vocabulary["counted"]))
+
+        os.makedirs(os.path.dirname(VOCABULARY_PATH) or ".", exist_ok=True)
+        tmp_path = f"{VOCABULARY_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(vocabulary, f, ensure_ascii=False)
+        os.replace(tmp_path, VOCABULARY_PATH)
+
+# Updates still waiting for the timer are written when the process exits
+atexit.register(save_vocabulary)
+
+def extract_keywords_local(question, max_keywords=5):
+    """
+        Extracts keywords without an API call.
+        Words are scored by their frequency in the question times their inverse document
+        frequency in the vocabulary; legal terms get a bonus and earlier words win ties.
+    """
+    # Short numbers stay (article numbers), short words do not
+    tokens = [token for token in tokenize(question)
+              if (len(token) > 2 or token.isdigit()) and token not in STOPWORDS]
+    if not tokens:
+        return ""
+
+    with _vocabulary_lock:
+        vocabulary = _load_vocabulary()
+    documents = vocabulary["documents"]
+    df = vocabulary["df"]
+
+    term_counts = Counter(tokens)
+    first_position = {}
+    for position, token in enumerate(tokens):
+        first_position.setdefault(token, position)
+
+    def score(token):
+        idf = math.log((documents + 1) / (df.get(token, 0) + 1)) + 1 if documents else 1.0
+        bonus = LEGAL_TERM_BONUS if is_legal_term(token) else 1.0
+        return term_counts[token] * idf * bonus
+
+    ranked = sorted(term_counts, key=lambda token: (-score(token), first_position[token]))
+    selected = set(ranked[:max_keywords])
+    # Keywords keep the order of the question, which reads better as a search phrase
+    return " ".join(token for token in sorted(selected, key=first_position.get))
+
+def extract_keywords_llm(question, max_keywords=5):
+    """
+        Extracts the specified number of keywords from the given legal question with Gemini.
     """
     prompt = f"""Extract the most relevant {max_keywords} keywords from the following legal question.
         Write the keywords separated by single spaces.
 
-        Example Output: unlicensed accident motorcycle  
+        Example Output: unlicensed accident motorcycle
 
         Question: {question}
 
         Keywords:"""
 
-    response = generate_answer(prompt)
-    return response.candidates[0].content.parts[0].text
+    response = generate_answer(prompt, request_type="keywords")
+    return response_text(response)
+
+def extract_keywords(question, max_keywords=5, mode=None):
+    """
+        Extracts the specified number of keywords from the given legal question.
+        mode is "local" or "llm" (KEYWORD_EXTRACTOR by default).
+    """
+    mode = mode or KEYWORD_EXTRACTOR
+    if mode == "local":
+        keywords = extract_keywords_local(question, max_keywords)
+        if len(keywords.split()) >= min(MIN_LOCAL_KEYWORDS, max_keywords):
+            return keywords
+    return extract_keywords_llm(question, max_keywords)
@@ -0,0 +1,420 @@
+"""
+    Lifecycle of uploaded files and indexed documents.
+    Every indexed document (an uploaded PDF or a downloaded decision) is registered with the
+    namespaces that use it: the session or matter that uploaded a PDF, "shared" for decisions
+    and "corpus" for bulk-ingested documents. A namespace keeps a document alive until it has not
+    been used for its TTL; a document no namespace holds any more is deleted with its vectors,
+    stored texts and uploaded files.
+    A background sweep also enforces the chunk (memory) and upload (disk) quotas by evicting the
+    least recently used documents, removes files and points that belong to no registered document,
+    and compacts the local vector index.
+
+    Inspect or sweep the registry with:  PYTHONPATH=app python -m utils.lifecycle [--sweep] [--release NAMESPACE]
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from utils.config import PDF_COLLECTION, DECISION_COLLECTION
+from utils.ingestion_manifest import forget_ingestion, manifest_entries
+from utils import metrics
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+LIFECYCLE_PATH = os.path.join(CACHE_DIR, "lifecycle.sqlite3")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploaded_pdfs")
+
+SHARED_NAMESPACE = "shared"
+CORPUS_NAMESPACE = "corpus"
+LEGACY_NAMESPACE = "legacy"
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Time without use after which a namespace lets go of a document
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(DAY)))
+MATTER_TTL = float(os.getenv("MATTER_TTL", str(30 * DAY)))
+DECISION_TTL = float(os.getenv("DECISION_TTL", str(30 * DAY)))
+
+# Quotas: indexed chunks (vector memory) and bytes of the uploaded files
+MAX_INDEXED_CHUNKS = int(os.getenv("MAX_INDEXED_CHUNKS", "500000"))
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "2048")) * 1024 * 1024)
+
+# Files and documents younger than this are never treated as orphans (uploads being registered)
+ORPHAN_GRACE = float(os.getenv("ORPHAN_GRACE", str(HOUR)))
+
+# Seconds between two background sweeps (0 turns the worker off)
+LIFECYCLE_INTERVAL = float(os.getenv("LIFECYCLE_INTERVAL", str(HOUR)))
+
+COLLECTIONS = (PDF_COLLECTION, DECISION_COLLECTION)
+
+_lock = threading.Lock()
+_registry = None
+_worker = None
+
+def session_namespace(session_id: str) -> str:
+    return f"session:{session_id}"
+
+def matter_namespace(matter: str) -> str:
+    """
+        Namespace of a matter name ("Kira Davası 2024/15" -> "matter:kira-davası-2024-15").
+    """
+    return "matter:" + re.sub(r"[^\w]+", "-", matter.strip().lower()).strip("-")
+
+def namespace_ttl(namespace: str):
+    """
+        TTL of the documents of a namespace (None: kept until released).
+    """
+    if namespace == CORPUS_NAMESPACE:
+        return None
+    if namespace.startswith("matter:"):
+        return MATTER_TTL
+    if namespace in (SHARED_NAMESPACE, LEGACY_NAMESPACE):
+        return DECISION_TTL
+    return SESSION_TTL
+
+class DocumentRegistry:
+    """
+        Documents, the namespaces holding them and their uploaded files, on SQLite.
+    """
+
+    def __init__(self, path: str = LIFECYCLE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # The bulk ingestion CLI writes from another process
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (collection, doc_id)
+            );
+            CREATE TABLE IF NOT EXISTS holds (
+                namespace TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                path TEXT,
+                size INTEGER NOT NULL DEFAULT 0,
+                ttl REAL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, collection, doc_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_holds_doc ON holds(collection, doc_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def register(self, collection_name: str, doc_id: str, namespace: str = None, path: str = None,
+                 size: int = None, chunks: int = None, now: float = None):
+        """
+            Records a use of the document (by the namespace, if given) and refreshes its last access.
+            Registering an existing document again works as a touch.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO documents (collection, doc_id, chunks, created_at, last_access) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (collection, doc_id) DO UPDATE SET
+                    last_access = excluded.last_access,
+                    chunks = COALESCE(?, chunks)
+            """, (collection_name, doc_id, chunks or 0, now, now, chunks))
+            if namespace is not None:
+                self._conn.execute("""
+                    INSERT INTO holds (namespace, collection, doc_id, path, size, ttl, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (namespace, collection, doc_id) DO UPDATE SET
+                        last_access = excluded.last_access,
+                        path = COALESCE(excluded.path, path),
+                        size = CASE WHEN excluded.path IS NULL THEN size ELSE excluded.size END
+                """, (namespace, collection_name, doc_id, path, size or 0, namespace_ttl(namespace), now))
+            self._conn.commit()
+
+    def release(self, namespace: str) -> int:
+        """
+            Drops all holds of the namespace; its documents are deleted by the next sweep
+            unless another namespace holds them. Returns the number of released documents.
+        """
+        with self._lock:
+            released = self._conn.execute("DELETE FROM holds WHERE namespace = ?", (namespace,)).rowcount
+            self._conn.commit()
+        return released
+
+    def expire_holds(self, now: float) -> list:
+        """
+            Drops the holds not used for their TTL. Returns their file paths (None without a file).
+        """
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT path FROM holds WHERE ttl IS NOT NULL AND last_access + ttl < ?", (now,)
+            )]
+            self._conn.execute("DELETE FROM holds WHERE ttl IS NOT NULL AND last_access + ttl < ?", (now,))
+            self._conn.commit()
+        return expired
+
+    def unheld_documents(self, before: float) -> list:
+        """
+            Returns (collection, doc_id) of the documents no namespace holds, last used before `before`.
+        """
+        with self._lock:
+            return self._conn.execute("""
+                SELECT collection, doc_id FROM documents AS d
+                WHERE last_access < ? AND NOT EXISTS (
+                    SELECT 1 FROM holds AS h WHERE h.collection = d.collection AND h.doc_id = d.doc_id
+                )
+            """, (before,)).fetchall()
+
+    def eviction_candidates(self) -> list:
+        """
+            Returns (collection, doc_id, chunks, upload bytes) of the documents that may be evicted
+            (no hold without TTL), least recently used first.
+        """
+        with self._lock:
+            return self._conn.execute("""
+                SELECT d.collection, d.doc_id, d.chunks, COALESCE(SUM(h.size), 0) FROM documents AS d
+                LEFT JOIN holds AS h ON h.collection = d.collection AND h.doc_id = d.doc_id
+                GROUP BY d.collection, d.doc_id
+                HAVING COUNT(h.namespace) = 0 OR COUNT(h.ttl) = COUNT(h.namespace)
+                ORDER BY d.last_access
+            """).fetchall()
+
+    def totals(self) -> dict:
+        with self._lock:
+            documents, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM documents"
+            ).fetchone()
+            upload_bytes, = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT path, size FROM holds WHERE path IS NOT NULL)"
+            ).fetchone()
+            namespaces = dict(self._conn.execute("SELECT namespace, COUNT(*) FROM holds GROUP BY namespace"))
+        return {"documents": documents, "chunks": chunks, "upload_bytes": upload_bytes, "namespaces": namespaces}
+
+    def document_ids(self, collection_name: str) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT doc_id FROM documents WHERE collection = ?", (collection_name,)
+            )}
+
+    def held_paths(self) -> set:
+        with self._lock:
+            return {os.path.abspath(row[0]) for row in self._conn.execute(
+                "SELECT DISTINCT path FROM holds WHERE path IS NOT NULL"
+            )}
+
+    def remove(self, collection_name: str, doc_ids) -> list:
+        """
+            Removes the documents and their holds. Returns the paths of their uploaded files.
+        """
+        paths = []
+        with self._lock:
+            for doc_id in doc_ids:
+                paths += [row[0] for row in self._conn.execute(
+                    "SELECT path FROM holds WHERE collection = ? AND doc_id = ? AND path IS NOT NULL",
+                    (collection_name, doc_id)
+                )]
+                self._conn.execute("DELETE FROM holds WHERE collection = ? AND doc_id = ?", (collection_name, doc_id))
+                self._conn.execute("DELETE FROM documents WHERE collection = ? AND doc_id = ?",
+                                   (collection_name, doc_id))
+            self._conn.commit()
+        return paths
+
+    def get_meta(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+def get_registry() -> DocumentRegistry:
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = DocumentRegistry()
+        return _registry
+
+def register_document(collection_name: str, doc_id: str, namespace: str = None, path: str = None,
+                      chunks: int = None):
+    """
+        Records that the namespace uses the document (and its uploaded file).
+        Errors are only logged, the registry must never break a query.
+    """
+    try:
+        size = os.path.getsize(path) if path and os.path.exists(path) else None
+        get_registry().register(collection_name, doc_id, namespace, path=path, size=size, chunks=chunks)
+    except Exception as e:
+        print(f"⚠️ Document {doc_id} could not be registered: {e}")
+
+def release_namespace(namespace: str) -> int:
+    """
+        Lets go of all documents of the namespace (e.g. a closed matter).
+    """
+    return get_registry().release(namespace)
+
+def _delete(registry: DocumentRegistry, collection_name: str, doc_ids) -> int:
+    """
+        Deletes the documents from the vector store, the manifest and the registry, and their files.
+    """
+    from utils.vektor_store import initialize_vector_store, delete_documents
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return 0
+    client, _ = initialize_vector_store(collection_name)
+    delete_documents(client, collection_name, doc_ids)
+    if collection_name == PDF_COLLECTION:
+        # Makes the ingestion job index the content again if it is uploaded again
+        for doc_id in doc_ids:
+            forget_ingestion(collection_name, doc_id)
+
+    _remove_unheld_files(registry, registry.remove(collection_name, doc_ids))
+    metrics.count("lifecycle_deleted_documents", len(doc_ids))
+    return len(doc_ids)
+
+def _remove_unheld_files(registry: DocumentRegistry, paths):
+    """
+        Deletes the files among paths that no other hold uses (the same file can be held by
+        several namespaces).
+    """
+    held = registry.held_paths()
+    for path in set(paths):
+        if path and os.path.abspath(path) not in held:
+            _remove_file(path)
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"⚠️ {path} could not be deleted: {e}")
+        return False
+
+def _evict_over_quota(registry: DocumentRegistry) -> dict:
+    """
+        Picks the least recently used documents to delete until both quotas are met.
+        Returns {collection: [doc_id, ...]}.
+    """
+    totals = registry.totals()
+    chunks, upload_bytes = totals["chunks"], totals["upload_bytes"]
+    evicted = {}
+    for collection_name, doc_id, doc_chunks, doc_bytes in registry.eviction_candidates():
+        if chunks <= MAX_INDEXED_CHUNKS and upload_bytes <= MAX_UPLOAD_BYTES:
+            break
+        # Documents without files do not help the disk quota
+        if chunks <= MAX_INDEXED_CHUNKS and not doc_bytes:
+            continue
+        evicted.setdefault(collection_name, []).append(doc_id)
+        chunks -= doc_chunks
+        upload_bytes -= doc_bytes
+    return evicted
+
+def _orphan_files(registry: DocumentRegistry, before: float) -> int:
+    """
+        Deletes the uploaded files no document holds.
+    """
+    if not os.path.isdir(UPLOAD_DIR):
+        return 0
+    held = registry.held_paths()
+    removed = 0
+    for entry in os.scandir(UPLOAD_DIR):
+        if entry.is_file() and os.path.abspath(entry.path) not in held and entry.stat().st_mtime < before:
+            removed += _remove_file(entry.path)
+    return removed
+
+def _orphan_points(registry: DocumentRegistry, now: float) -> dict:
+    """
+        Deletes the points of documents that are not in the registry.
+        On the first sweep they are adopted instead, as documents indexed before the registry existed.
+    """
+    from utils.vektor_store import initialize_vector_store
+    adopt = registry.get_meta("adopted_at") is None
+    removed = {}
+    for collection_name in COLLECTIONS:
+        client, _ = initialize_vector_store(collection_name)
+        unknown = client.document_ids(collection_name) - registry.document_ids(collection_name) - {None}
+        if adopt:
+            for doc_id in unknown:
+                chunks = manifest_entries(collection_name).get(doc_id, {}).get("chunks")
+                registry.register(collection_name, doc_id, LEGACY_NAMESPACE, chunks=chunks, now=now)
+        elif unknown:
+            removed[collection_name] = _delete(registry, collection_name, unknown)
+    if adopt:
+        registry.set_meta("adopted_at", str(now))
+    return removed
+
+def sweep(now: float = None) -> dict:
+    """
+        Runs one garbage collection pass and returns what it did.
+    """
+    from utils.vektor_store import initialize_vector_store
+    now = time.time() if now is None else now
+    registry = get_registry()
+    expired = registry.expire_holds(now)
+    _remove_unheld_files(registry, expired)
+    report = {"expired_holds": len(expired), "deleted": {}, "evicted": {}}
+
+    unheld = {}
+    for collection_name, doc_id in registry.unheld_documents(before=now - ORPHAN_GRACE):
+        unheld.setdefault(collection_name, []).append(doc_id)
+    for collection_name, doc_ids in unheld.items():
+        report["deleted"][collection_name] = _delete(registry, collection_name, doc_ids)
+
+    for collection_name, doc_ids in _evict_over_quota(registry).items():
+        report["evicted"][collection_name] = _delete(registry, collection_name, doc_ids)
+
+    report["orphan_files"] = _orphan_files(registry, before=now - ORPHAN_GRACE)
+    report["orphan_points"] = _orphan_points(registry, now)
+
+    for collection_name in COLLECTIONS:
+        client, _ = initialize_vector_store(collection_name)
+        # Only the local index keeps deleted rows; Qdrant vacuums its segments itself
+        if hasattr(client, "compact"):
+            client.compact(collection_name)
+
+    report.update(registry.totals())
+    metrics.count("lifecycle_sweeps")
+    return report
+
+def _run_worker(interval: float):
+    while True:
+        try:
+            report = sweep()
+            print(f"🧹 Lifecycle sweep: {report['expired_holds']} holds expired, "
+                  f"deleted {report['deleted']}, evicted {report['evicted']}, "
+                  f"{report['orphan_files']} orphan files, orphan points {report['orphan_points']}")
+        except Exception as e:
+            print(f"⚠️ Lifecycle sweep failed: {e}")
+        time.sleep(interval)
+
+def start_lifecycle_worker(interval: float = LIFECYCLE_INTERVAL):
+    """
+        Runs sweep() every `interval` seconds in a background thread (once per process).
+    """
+    global _worker
+    with _lock:
+        if _worker is not None or interval <= 0:
+            return
+        _worker = threading.Thread(target=_run_worker, args=(interval,), name="lifecycle", daemon=True)
+    _worker.start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shows the document registry and runs a sweep.")
+    parser.add_argument("--sweep", action="store_true", help="run one garbage collection pass")
+    parser.add_argument("--release", metavar="NAMESPACE", help="let go of the documents of a namespace")
+    args = parser.parse_args()
+    if args.release:
+        print(f"{release_namespace(args.release)} documents released from {args.release}")
+    print(json.dumps(sweep() if args.sweep else get_registry().totals(), indent=2, ensure_ascii=False))
@@ -0,0 +1,332 @@
+"""
+    Lightweight timing spans and counters for the query pipeline.
+    Turned on with METRICS=1; when off, span(), count() and timed_iter() return at once.
+    Process totals are exported in the Prometheus text format, every finished query trace
+    is appended as a JSON line to METRICS_LOG (if set) and can be shown in the app.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.getenv("METRICS", "0") == "1"
+METRICS_LOG = os.getenv("METRICS_LOG", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Interface of the Prometheus endpoint, only reachable from this machine by default
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PREFIX = "legal_assistant"
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current_trace = contextvars.ContextVar("metrics_trace", default=None)
+_lock = threading.Lock()
+_histograms = {}  # stage -> [count per bucket..., +Inf count, sum]
+_counters = {}
+_gauges = {}
+_server = None
+
+class Trace:
+    """
+        Stage times and counters of a single query, collected from all threads working on it.
+    """
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+        self.started_at = time.time()
+        self.total_seconds = None
+        self.stages = {}  # stage -> [calls, seconds]
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_count(self, name: str, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace": self.name,
+                **self.labels,
+                "started_at": round(self.started_at, 3),
+                "total_seconds": None if self.total_seconds is None else round(self.total_seconds, 4),
+                "stages": {
+                    stage: {"calls": calls, "seconds": round(seconds, 4)}
+                    for stage, (calls, seconds) in self.stages.items()
+                },
+                "counters": dict(self.counters)
+            }
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def set_enabled(enabled: bool):
+    """
+        Turns the collection on or off at runtime.
+    """
+    global METRICS_ENABLED
+    METRICS_ENABLED = enabled
+
+def span(stage: str):
+    """
+        Context manager that records the time spent in the block under `stage`.
+    """
+    return _Span(stage) if METRICS_ENABLED else _NO_SPAN
+
+def observe(stage: str, seconds: float):
+    """
+        Records a duration for the stage (process histogram and current trace).
+    """
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+    current = _current_trace.get()
+    if current is not None:
+        current.add_time(stage, seconds)
+
+def count(name: str, value=1):
+    """
+        Increases a counter (API calls, chunks, bytes...).
+    """
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+    current = _current_trace.get()
+    if current is not None:
+        current.add_count(name, value)
+
+def gauge(name: str, value):
+    """
+        Sets a value that goes up and down (queue depth, concurrency limit...).
+    """
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+def timed(stage: str):
+    """
+        Decorator version of span().
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return function(*args, **kwargs)
+            with _Span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def timed_iter(stage: str, iterable):
+    """
+        Records the time spent producing the items of a (lazy) iterable as one observation,
+        without the time the consumer spends between the items.
+    """
+    if not METRICS_ENABLED:
+        return iterable
+    return _timed_iter(stage, iterable)
+
+def _timed_iter(stage: str, iterable):
+    iterator = iter(iterable)
+    seconds = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds += time.perf_counter() - started
+                return
+            seconds += time.perf_counter() - started
+            yield item
+    finally:
+        observe(stage, seconds)
+
+def bind(function):
+    """
+        Makes `function` record into the current trace when it runs in another thread
+        (e.g. a ThreadPoolExecutor worker).
+    """
+    current = _current_trace.get()
+    if current is None:
+        return function
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current_trace.set(current)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return wrapper
+
+class trace:
+    """
+        Collects the stages of one query: `with metrics.trace("pdf") as query_trace: ...`
+        query_trace is None when metrics are off.
+    """
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+        self.trace = None
+        self._token = None
+        self._started = None
+
+    def __enter__(self):
+        if not METRICS_ENABLED:
+            return None
+        self.trace = Trace(self.name, **self.labels)
+        self._token = _current_trace.set(self.trace)
+        self._started = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self.trace is None:
+            return False
+        self.trace.total_seconds = time.perf_counter() - self._started
+        _current_trace.reset(self._token)
+        observe(f"query_{self.name}", self.trace.total_seconds)
+        if METRICS_LOG:
+            write_jsonl(METRICS_LOG, [self.trace.to_dict()])
+        return False
+
+def current_trace():
+    """
+        Returns the trace of the running query, or None.
+    """
+    return _current_trace.get()
+
+def write_jsonl(path: str, records):
+    """
+        Appends records as JSON lines.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def snapshot() -> dict:
+    """
+        Returns the process totals: calls and seconds per stage, the counters and the gauges.
+    """
+    with _lock:
+        return {
+            "stages": {
+                stage: {"calls": histogram[len(BUCKETS)], "seconds": round(histogram[-1], 4)}
+                for stage, histogram in _histograms.items()
+            },
+            "counters": dict(_counters),
+            "gauges": dict(_gauges)
+        }
+
+def export_prometheus() -> str:
+    """
+        Returns the process totals in the Prometheus text exposition format.
+    """
+    lines = [
+        f"# HELP {METRICS_PREFIX}_stage_seconds Time spent in the pipeline stages.",
+        f"# TYPE {METRICS_PREFIX}_stage_seconds histogram"
+    ]
+    with _lock:
+        histograms = {stage: list(histogram) for stage, histogram in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    for stage, histogram in sorted(histograms.items()):
+        for bound, bucket_count in zip(BUCKETS, histogram):
+            lines.append(f'{METRICS_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+        total = histogram[len(BUCKETS)]
+        lines.append(f'{METRICS_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+        lines.append(f'{METRICS_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram[-1]:.6f}')
+        lines.append(f'{METRICS_PREFIX}_stage_seconds_count{{stage="{stage}"}} {total}')
+
+    lines.append(f"# HELP {METRICS_PREFIX}_events_total Pipeline counters (API calls, chunks, bytes).")
+    lines.append(f"# TYPE {METRICS_PREFIX}_events_total counter")
+    for name, value in sorted(counters.items()):
+        lines.append(f'{METRICS_PREFIX}_events_total{{name="{name}"}} {value}')
+
+    lines.append(f"# HELP {METRICS_PREFIX}_gauge Current values (queue depths, concurrency limits).")
+    lines.append(f"# TYPE {METRICS_PREFIX}_gauge gauge")
+    for name, value in sorted(gauges.items()):
+        lines.append(f'{METRICS_PREFIX}_gauge{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """
+        Clears the process totals.
+    """
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """
+        Serves /metrics for Prometheus on the given port (once per process, only when metrics are enabled).
+    """
+    global _server
+    with _lock:
+        if _server is not None or not port or not METRICS_ENABLED:
+            return
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
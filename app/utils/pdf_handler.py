@@ -1,77 +1,184 @@
 """
     Text extraction operations from PDFs.
+    fitz is imported by the functions that use it, so importing this module
+    (e.g. for decision_doc_id) stays cheap. Texts are split by utils/chunker.py.
 """
+import multiprocessing
+import os
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
-import fitz
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.chunker import Document, split_chunks, CHUNK_SIZE, CHUNK_OVERLAP
+from utils import metrics
 
-def extract_text_from_pdf(pdf_path, max_pages: int = 200):
+# Files with at least this many pages are read by a process pool
+PARALLEL_PAGE_THRESHOLD = 300
+PAGES_PER_TASK = 50
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", "4"))
+
+def iter_pdf_pages(pdf_path, max_pages: int = None, workers: int = None):
     """
-        Extracts text from a PDF by reading the first N pages.
+        Yields (page number, text) pairs of a PDF in page order.
+        Large files are read by a process pool, a few page ranges at a time.
     """
+    import fitz
     try:
         pdf_doc = fitz.open(pdf_path)
     except Exception as e:
         print(f"PDF reading error ({pdf_path}): {e}")
-        return ""
+        return
+
+    page_count = pdf_doc.page_count
+    if max_pages is not None and page_count > max_pages:
+        print(f"Only the first {max_pages} of {page_count} pages are read ({pdf_path})")
+        page_count = max_pages
 
-    full_text = ""
-    for i, page in enumerate(pdf_doc):
-        if i >= max_pages:
-            break
-        full_text += page.get_text()
+    workers = workers or min(os.cpu_count() or 1, PDF_MAX_WORKERS)
+    if workers <= 1 or page_count < PARALLEL_PAGE_THRESHOLD:
+        try:
+            for i in range(page_count):
+                yield i + 1, pdf_doc[i].get_text()
+        finally:
+            pdf_doc.close()
+        return
 
-    return full_text
+    pdf_doc.close()
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PAGES_PER_TASK)]
+    # Spawned, not forked: this also runs in the ingestion threads of the app, and forking a process
+    # with other threads (gRPC, SQLite) running can deadlock the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Only a couple of ranges per worker are in flight, so memory does not grow with the file
+        pending = deque()
+        for start, end in ranges:
+            pending.append((start, executor.submit(_extract_page_range, pdf_path, start, end)))
+            if len(pending) >= workers * 2:
+                yield from _page_range_result(*pending.popleft())
+        while pending:
+            yield from _page_range_result(*pending.popleft())
 
-def process_uploaded_pdf(pdf_path) -> list[Document]:
+def _extract_page_range(pdf_path, start: int, end: int) -> List[str]:
     """
-        Extracts text from uploaded PDF file, splits the text into chunks,
-        and returns as a list of LangChain Document objects.
+        Reads the texts of pages [start, end) in a worker process.
     """
-    full_text = extract_text_from_pdf(pdf_path)
+    import fitz
+    with fitz.open(pdf_path) as pdf_doc:
+        return [pdf_doc[i].get_text() for i in range(start, end)]
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(full_text)
+def _page_range_result(start: int, future):
+    for offset, text in enumerate(future.result()):
+        yield start + offset + 1, text
 
-    documents = []
-    for i, chunk in enumerate(chunks):
-        doc = Document(
-            page_content=chunk,
-            metadata={
-                "chunk": i,
-                "document": pdf_path.split("/")[-1]
-            }
-        )
-        documents.append(doc)
+def extract_text_from_pdf(pdf_path, max_pages: int = None):
+    """
+        Extracts text from a PDF, optionally reading only the first N pages.
+    """
+    return "".join(text for _, text in iter_pdf_pages(pdf_path, max_pages))
 
-    return documents
+def iter_pdf_chunks(pdf_path, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                    max_pages: int = None, workers: int = None):
+    """
+        Splits the PDF into chunks while its pages are being read.
+        Only the text that can still belong to the next chunk is kept in memory.
+        Chunks carry the page range and the section (e.g. "Madde 12") they come from in their metadata,
+        and their start and end offsets in the text of the whole document.
+    """
+    document_name = os.path.basename(pdf_path)
+
+    buffer = ""
+    heading = None  # Section the buffer starts in
+    page_offsets = []  # Start offsets of the pages in the buffer
+    page_numbers = []
+    buffer_offset = 0  # Offset of the buffer in the text of the whole document
+    chunk_index = 0
+
+    def make_chunk(chunk):
+        metrics.count("chunks")
+        metadata = {
+            "chunk": chunk_index,
+            "document": document_name,
+            "page_start": page_numbers[bisect_right(page_offsets, chunk.start) - 1],
+            "page_end": page_numbers[bisect_right(page_offsets, chunk.end - 1) - 1],
+            "start": buffer_offset + chunk.start,
+            "end": buffer_offset + chunk.end
+        }
+        if chunk.section:
+            metadata["section"] = chunk.section
+        return Document(chunk.text, metadata)
 
-def process_decisions_text(decisions_text: str, source_name: str = "court_decision") -> list[Document]:
+    for page_number, text in metrics.timed_iter("extract", iter_pdf_pages(pdf_path, max_pages, workers)):
+        metrics.count("pdf_pages")
+        metrics.count("pdf_characters", len(text))
+        page_offsets.append(len(buffer))
+        page_numbers.append(page_number)
+        buffer += text
+        if len(buffer) < 2 * chunk_size:
+            continue
+
+        with metrics.span("split"):
+            chunks = split_chunks(buffer, chunk_size, chunk_overlap, heading)
+        if len(chunks) < 2:
+            continue
+        for chunk in chunks[:-1]:
+            yield make_chunk(chunk)
+            chunk_index += 1
+
+        # The last chunk may continue on the next page, it is split again with it
+        cursor = chunks[-1].start
+        heading = chunks[-1].section
+        buffer = buffer[cursor:]
+        buffer_offset += cursor
+        kept = max(bisect_right(page_offsets, cursor) - 1, 0)
+        page_offsets = [max(offset - cursor, 0) for offset in page_offsets[kept:]]
+        page_numbers = page_numbers[kept:]
+
+    with metrics.span("split"):
+        chunks = split_chunks(buffer, chunk_size, chunk_overlap, heading)
+    for chunk in chunks:
+        yield make_chunk(chunk)
+        chunk_index += 1
+
+def process_uploaded_pdf(pdf_path, chunk_size: int = CHUNK_SIZE,
+                         chunk_overlap: int = CHUNK_OVERLAP) -> List[Document]:
+    """
+        Extracts text from uploaded PDF file, splits the text into chunks,
+        and returns as a list of Document objects.
+    """
+    return list(iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap))
+
+def process_decisions_text(decisions_text: str, source_name: str = "court_decision",
+                           chunk_size: int = CHUNK_SIZE,
+                           chunk_overlap: int = CHUNK_OVERLAP,
+                           decision_id=None) -> List[Document]:
     """
         Splits long texts like court decisions into chunks and returns
         a list of Document objects.
+        With decision_id the chunks carry the decision ID and belong to the document "decision:<id>".
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(decisions_text)
+    with metrics.span("split"):
+        chunks = split_chunks(decisions_text, chunk_size, chunk_overlap)
+    metrics.count("chunks", len(chunks))
 
     documents = []
     for i, chunk in enumerate(chunks):
-        doc = Document(
-            page_content=chunk,
-            metadata={
-                "chunk": i,
-                "source": source_name
-            }
-        )
-        documents.append(doc)
+        metadata = {
+            "chunk": i,
+            "source": source_name,
+            "start": chunk.start,
+            "end": chunk.end
+        }
+        if chunk.section:
+            metadata["section"] = chunk.section
+        if decision_id is not None:
+            metadata["decision_id"] = decision_id
+            metadata["doc_id"] = decision_doc_id(decision_id)
+        documents.append(Document(chunk.text, metadata))
 
     return documents
+
+def decision_doc_id(decision_id) -> str:
+    """
+        Vector store document ID of a court decision.
+    """
+    return f"decision:{decision_id}"
@@ -0,0 +1,62 @@
+"""
+    Petition generation from the details of a case.
+    Used by the petition page and the HTTP API.
+"""
+from utils.gemini_handler import generate_answer, generate_answer_stream, response_text
+
+# Petition details: field -> (label, required)
+PETITION_FIELDS = {
+    "full_name": ("Full Name", True),
+    "address": ("Address", False),
+    "court_name": ("Court Name", True),
+    "case_type": ("Case Type", True),
+    "opponent_name": ("Opposing Party", True),
+    "petition_details": ("Case Summary", True),
+}
+
+CASE_TYPES = ["Divorce", "Execution", "Labor Case", "Consumer", "Other"]
+
+class PetitionValidationError(ValueError):
+    """
+        The petition details are incomplete (the caller's mistake, not a failure of the generation).
+    """
+
+def missing_petition_fields(details: dict) -> list:
+    """
+        Returns the labels of the required fields that are empty.
+    """
+    return [label for field, (label, required) in PETITION_FIELDS.items()
+            if required and not str(details.get(field) or "").strip()]
+
+def build_petition_prompt(details: dict) -> str:
+    """
+        Creates the prompt for the petition from its details.
+    """
+    return f"""
+        You are a legal assistant. Using the information below, prepare an official and proper petition.
+        The text should be written in clear and understandable Turkish. Include introduction,
+        case explanation and conclusion (request) sections.
+
+        Information:
+        - Full Name: {details.get("full_name", "")}
+        - Address: {details.get("address", "")}
+        - Court: {details.get("court_name", "")}
+        - Case Type: {details.get("case_type", "")}
+        - Opposing Party: {details.get("opponent_name", "")}
+        - Case Summary / Justification: {details.get("petition_details", "")}
+
+        Use an official and valid petition structure. End with "I respectfully submit this petition."
+        """
+
+def generate_petition(details: dict, stream: bool = False):
+    """
+        Generates the petition text; with stream=True a generator of text pieces.
+        Raises PetitionValidationError if a required field is empty.
+    """
+    missing = missing_petition_fields(details)
+    if missing:
+        raise PetitionValidationError(f"Please fill in the following required fields: {', '.join(missing)}")
+    prompt = build_petition_prompt(details)
+    if stream:
+        return generate_answer_stream(prompt)
+    return response_text(generate_answer(prompt))
@@ -0,0 +1,49 @@
+"""
+    Progress messages of the query handlers.
+    The handlers report what they are doing through a Progress object instead of writing to a
+    user interface, so the same code serves the Streamlit pages and the HTTP API.
+"""
+import threading
+
+INFO = "info"
+SUCCESS = "success"
+ERROR = "error"
+
+class Progress:
+    """
+        Receives the status messages of a handler; this base class ignores them.
+    """
+
+    def emit(self, level: str, message: str):
+        pass
+
+    def info(self, message: str):
+        self.emit(INFO, message)
+
+    def success(self, message: str):
+        self.emit(SUCCESS, message)
+
+    def error(self, message: str):
+        self.emit(ERROR, message)
+
+class CallbackProgress(Progress):
+    """
+        Records the messages and passes every one to callback(level, message) if given.
+        Handlers return None after an error, `errors` tells the caller why.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.events = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def emit(self, level: str, message: str):
+        with self._lock:
+            self.events.append({"level": level, "message": message})
+            if level == ERROR:
+                self.errors.append(message)
+        if self.callback is not None:
+            self.callback(level, message)
+
+NO_PROGRESS = Progress()
@@ -1,18 +1,112 @@
 """
-    Interface design using Streamlit.
-    Saving text extractions from PDFs to Qdrant Vector Store.
+    Query handlers: general questions, questions about an uploaded PDF and questions answered
+    from court decisions searched online. Status messages go to a Progress object (progress.py),
+    so the handlers run the same under the Streamlit pages and the HTTP API.
 """
-import streamlit as st
-from utils.gemini_handler import generate_answer, generate_answer_from_docs
-from utils.pdf_handler import process_uploaded_pdf, process_decisions_text
-from utils.vektor_store import initialize_vector_store, add_to_vector_store, query_vector_store
-from utils.keyword_extractor import extract_keywords
-from utils.web_searcher import fetch_decision_texts
+import os
+import threading
+from utils.gemini_handler import generate_answer, generate_answer_stream, generate_answer_from_docs, response_text
+from utils.pdf_handler import decision_doc_id
+from utils.vektor_store import (
+    initialize_vector_store, query_vector_store, get_embeddings, PDF_COLLECTION, DECISION_COLLECTION
+)
+from utils.ingestion_jobs import submit_ingestion, FAILED
+from utils.keyword_extractor import extract_keywords, update_vocabulary
+from utils.web_searcher import search_decision_ids
+from utils.decision_pipeline import index_decisions
+from utils.response_cache import response_cache
+from utils.context_packer import CONTEXT_FETCH_K
+from utils.lifecycle import register_document, SHARED_NAMESPACE
+from utils.progress import Progress, NO_PROGRESS
+from utils import metrics
+
+def _question_vector(embeddings, query: str):
+    """
+        Embedding of the question for the answer cache and the retrieval (None if it cannot be created).
+    """
+    try:
+        return embeddings.embed_query(query)
+    except Exception as e:
+        print(f"⚠️ Question could not be embedded: {e}")
+        return None
+
+class _QuestionVector:
+    """
+        Embedding of the question, created on first use and at most once.
+        The answer cache only asks for it when it holds questions to compare with, and the PDF and
+        internet retrieval search with the same vector.
+    """
+
+    def __init__(self, embeddings, query: str):
+        self.embeddings = embeddings
+        self.query = query
+        self.created = False
+        self.vector = None
+
+    def __call__(self):
+        if not self.created:
+            self.vector = _question_vector(self.embeddings, self.query)
+            self.created = True
+        return self.vector
+
+def _cached_answer(mode: str, query: str, sources, question_vector: _QuestionVector, stream: bool,
+                   progress: Progress):
+    """
+        Returns the cached answer (as text or a single-piece stream), or None.
+    """
+    cached = response_cache.lookup(mode, query, sources, question_vector)
+    if cached is None:
+        return None
+    progress.info("⚡ Answer found in cache.")
+    return iter([cached]) if stream else cached
+
+def _store_answer(mode: str, query: str, answer: str, sources, question_vector: _QuestionVector):
+    """
+        Saves the answer to the answer cache.
+        If the question was not embedded yet, the answer is found by its exact question at once and
+        the embedding for the semantic path is added in the background, off the request path.
+    """
+    if question_vector.created:
+        response_cache.store(mode, query, answer, sources, question_vector.vector)
+        return
+    response_cache.store(mode, query, answer, sources)
+    threading.Thread(
+        target=lambda: response_cache.store(mode, query, answer, sources, question_vector()),
+        name="answer-cache", daemon=True
+    ).start()
+
+def _stream_and_store(mode: str, query: str, chunks, sources, question_vector: _QuestionVector):
+    """
+        Passes a streamed answer through and stores it once the stream is complete.
+    """
+    pieces = []
+    for chunk in chunks:
+        pieces.append(chunk)
+        yield chunk
+    _store_answer(mode, query, "".join(pieces), sources, question_vector)
 
-def handle_general_query(query: str):
+def _answer(mode: str, query: str, sources, question_vector: _QuestionVector, generate, stream: bool):
+    """
+        Generates the answer with generate(stream) and saves it to the answer cache.
+    """
+    if stream:
+        return _stream_and_store(mode, query, generate(True), sources, question_vector)
+    answer = response_text(generate(False))
+    _store_answer(mode, query, answer, sources, question_vector)
+    return answer
+
+def handle_general_query(query: str, stream: bool = False, progress: Progress = None):
     """
         Generates a simple response for general legal questions.
+        With stream=True the handlers return a generator of text pieces instead of the text.
+        They return None when no answer can be given; the reason is reported to `progress`.
     """
+    progress = progress or NO_PROGRESS
+    question_vector = _QuestionVector(get_embeddings(), query)
+    cached = _cached_answer("general", query, (), question_vector, stream, progress)
+    if cached is not None:
+        return cached
+
     prompt = f"""
         You are a professional legal consultant. Below is a legal question from a user.
         Your goal is to provide a brief, clear response based on technical terms and formal language.
@@ -22,61 +116,110 @@ def handle_general_query(query: str):
 
         Answer:
         """
-    response = generate_answer(prompt)
-    return response.candidates[0].content.parts[0].text
-
-def handle_pdf_query(query: str, pdf_path: str):
+    return _answer(
+        "general", query, (), question_vector,
+        lambda streamed: generate_answer_stream(prompt) if streamed else generate_answer(prompt),
+        stream
+    )
+
+def handle_pdf_query(query: str, pdf_path: str, stream: bool = False, namespace: str = None,
+                     progress: Progress = None):
     """
         Extracts the most relevant information from the uploaded PDF file
         and generates a response to the query.
+        The PDF is indexed by a background job (started at upload time or here); the query waits for it.
+        The query keeps the PDF alive in the namespace (session or matter) that uploaded it.
     """
-    collection_name = "research_pdf"
+    progress = progress or NO_PROGRESS
+    collection_name = PDF_COLLECTION
 
-    st.info("Processing PDF...")
-    docs = process_uploaded_pdf(pdf_path)
+    if not pdf_path:
+        progress.error("No PDF has been uploaded. Please upload one first.")
+        return None
+    if not os.path.exists(pdf_path):
+        progress.error("The uploaded PDF has expired and was deleted. Please upload it again.")
+        return None
 
     client, embeddings = initialize_vector_store(collection_name)
 
-    st.info("Saving to vector database...")
-    add_to_vector_store(client, embeddings, docs, collection_name)
-
-    st.info("Searching for the most relevant content for your query...")
-    relevant_docs = query_vector_store(client, embeddings, query, collection_name)
-
-    st.info("Generating response...")
-    answer = generate_answer_from_docs(query, relevant_docs)
-
-    return answer.candidates[0].content.parts[0].text
-
-def handle_internet_query(query: str):
+    job = submit_ingestion(pdf_path)
+    content_hash = job.content_hash
+    if job.finished:
+        progress.info("PDF is already indexed, skipping processing...")
+    else:
+        progress.info("Waiting for the PDF to be processed and saved to vector database...")
+        job.wait()
+    if job.status == FAILED:
+        progress.error(f"The PDF could not be processed: {job.error}")
+        return None
+    register_document(collection_name, content_hash, namespace or SHARED_NAMESPACE, path=pdf_path)
+
+    question_vector = _QuestionVector(embeddings, query)
+    cached = _cached_answer("pdf", query, [content_hash], question_vector, stream, progress)
+    if cached is not None:
+        return cached
+
+    progress.info("Searching for the most relevant content for your query...")
+    relevant_docs = query_vector_store(
+        client, embeddings, query, collection_name, k=CONTEXT_FETCH_K, doc_ids=[content_hash], with_vectors=True,
+        query_embedding=question_vector()
+    )
+
+    progress.info("Generating response...")
+    return _answer(
+        "pdf", query, [content_hash], question_vector,
+        lambda streamed: generate_answer_from_docs(query, relevant_docs, stream=streamed),
+        stream
+    )
+
+def handle_internet_query(query: str, stream: bool = False, progress: Progress = None):
     """
         Downloads relevant court decision texts from the Supreme Court website,
         processes them, and generates a response.
+        Every decision is chunked and saved while the other downloads are still running.
     """
-    collection_name = "research_pdfs"
-
-    keywords = extract_keywords(query)
-    st.success(f"Extracted Keywords: {keywords}")
-
-    st.info("Searching for relevant decisions on Yargitay.gov.tr...")
-    decisions_text = fetch_decision_texts(keywords)
-
-    if not decisions_text:
-        st.error("No relevant decisions found. Please modify your query and try again.")
+    progress = progress or NO_PROGRESS
+    collection_name = DECISION_COLLECTION
+
+    with metrics.span("keywords"):
+        keywords = extract_keywords(query)
+    progress.success(f"Extracted Keywords: {keywords}")
+
+    progress.info("Searching for relevant decisions on Yargitay.gov.tr...")
+    try:
+        decision_ids = search_decision_ids(keywords)
+    except Exception as e:
+        print(f"⚠️ Error occurred: {e}")
+        decision_ids = []
+
+    if not decision_ids:
+        progress.error("No relevant decisions found. Please modify your query and try again.")
     else:
-        st.info("Downloading and processing decisions...")
-        docs = process_decisions_text(decisions_text)
-        if not docs:
-            st.error("An error occurred while processing decisions.")
+        client, embeddings = initialize_vector_store(collection_name)
+        question_vector = _QuestionVector(embeddings, query)
+        sources = [decision_doc_id(decision_id) for decision_id in decision_ids]
+        cached = _cached_answer("internet", query, sources, question_vector, stream, progress)
+        if cached is not None:
+            return cached
+
+        progress.info("Downloading, processing and saving decisions...")
+        decisions = index_decisions(client, embeddings, collection_name, decision_ids)
+        if not decisions:
+            progress.error("An error occurred while processing decisions.")
         else:
-            st.info("Saving to vector database...")
-            client, embeddings = initialize_vector_store(collection_name)
-            add_to_vector_store(client, embeddings, docs, collection_name)
-
-            st.info("Searching for the most relevant content for your query...")
-            relevant_docs = query_vector_store(client, embeddings, query, collection_name)
-
-            st.info("Generating response...")
-            answer = generate_answer_from_docs(query, relevant_docs)
-
-            return answer.candidates[0].content.parts[0].text
+            # Fetched decisions extend the vocabulary of the local keyword extractor
+            update_vocabulary(decisions)
+
+            progress.info("Searching for the most relevant content for your query...")
+            relevant_docs = query_vector_store(
+                client, embeddings, query, collection_name, k=CONTEXT_FETCH_K,
+                doc_ids=[decision_doc_id(decision_id) for decision_id, _ in decisions], with_vectors=True,
+                query_embedding=question_vector()
+            )
+
+            progress.info("Generating response...")
+            return _answer(
+                "internet", query, sources, question_vector,
+                lambda streamed: generate_answer_from_docs(query, relevant_docs, stream=streamed),
+                stream
+            )
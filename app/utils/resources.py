@@ -0,0 +1,71 @@
+"""
+    Process-wide shared resources.
+    Model handles and vector store clients are created once and reused by every Streamlit
+    rerun and session (modules, and so these objects, stay loaded between reruns).
+"""
+import os
+import threading
+
+WARMUP = os.getenv("WARMUP", "0") == "1"
+
+_resources = {}
+_key_locks = {}
+_lock = threading.Lock()
+_warm_up_thread = None
+
+def get_resource(key, factory):
+    """
+        Returns the resource stored under key, creating it with factory() on first use.
+        Concurrent first calls for the same key create it only once.
+    """
+    resource = _resources.get(key)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        resource = _resources.get(key)
+        if resource is None:
+            resource = factory()
+            _resources[key] = resource
+    return resource
+
+def clear_resources(kind=None):
+    """
+        Drops the cached resources (only those whose key starts with `kind` if given).
+    """
+    with _lock:
+        for key in list(_resources):
+            if kind is None or (isinstance(key, tuple) and key[0] == kind):
+                del _resources[key]
+
+def warm_up():
+    """
+        Creates the model handle, the vector store client and the collections,
+        and opens the connection to the embedding API, so the first query does not pay for them.
+    """
+    from utils.gemini_handler import get_model, GENERATION_MODEL
+    from utils.vektor_store import initialize_vector_store, PDF_COLLECTION, DECISION_COLLECTION
+
+    get_model(GENERATION_MODEL)
+    for collection_name in (PDF_COLLECTION, DECISION_COLLECTION):
+        _, embeddings = initialize_vector_store(collection_name)
+    embeddings.embed_query("warm-up")
+
+def start_warm_up():
+    """
+        Runs warm_up() once per process in a background thread.
+    """
+    global _warm_up_thread
+    with _lock:
+        if _warm_up_thread is not None:
+            return
+        _warm_up_thread = threading.Thread(target=_run_warm_up, name="warm-up", daemon=True)
+    _warm_up_thread.start()
+
+def _run_warm_up():
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"⚠️ Warm-up failed: {e}")
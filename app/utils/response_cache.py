@@ -0,0 +1,150 @@
+"""
+    In-memory cache of generated answers, shared by all sessions of the process.
+    An answer is found either by the normalized question (exact path) or by a previous
+    question whose embedding is similar enough (semantic path). Both paths only look at entries
+    of the same mode and the same set of source documents.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+import numpy as np
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+
+def normalize_question(question: str) -> str:
+    """
+        Lowercases the question (Turkish I/i aware), drops punctuation and collapses whitespace.
+    """
+    question = question.replace("I", "ı").replace("İ", "i").lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", question).split())
+
+class _Entry:
+    __slots__ = ("scope", "vector", "response", "expires_at")
+
+    def __init__(self, scope, vector, response, expires_at):
+        self.scope = scope
+        self.vector = vector
+        self.response = response
+        self.expires_at = expires_at
+
+class ResponseCache:
+    """
+        Exact and semantic answer cache with TTL and LRU eviction.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 threshold: float = RESPONSE_CACHE_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope(mode: str, sources: Iterable[str]):
+        return mode, tuple(sorted(set(sources or ())))
+
+    @staticmethod
+    def _normalize_vector(vector) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, mode: str, question: str, sources: Iterable[str] = (), vector=None) -> Optional[str]:
+        """
+            Returns a cached answer for the question, or None.
+            vector is the question's embedding or a function returning it. The function is only
+            called when the exact path misses and the scope has entries with embeddings, so a cold
+            cache costs no embedding call. Without a vector only the exact path is used.
+        """
+        scope = self._scope(mode, sources)
+        key = (scope, normalize_question(question))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.response
+            has_candidates = any(
+                candidate.scope == scope and candidate.vector is not None and candidate.expires_at > now
+                for candidate in self._entries.values()
+            )
+
+        # The embedding may need an API call, it is created outside the lock
+        if has_candidates and callable(vector):
+            vector = vector()
+        query_vector = self._normalize_vector(vector) if has_candidates else None
+
+        with self._lock:
+            if query_vector is not None:
+                candidates = [
+                    (candidate_key, candidate) for candidate_key, candidate in self._entries.items()
+                    if candidate.scope == scope and candidate.vector is not None and candidate.expires_at > now
+                ]
+                if candidates:
+                    similarities = np.stack([candidate.vector for _, candidate in candidates]) @ query_vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        best_key, best_entry = candidates[best]
+                        self._entries.move_to_end(best_key)
+                        self.semantic_hits += 1
+                        return best_entry.response
+
+            self.misses += 1
+        return None
+
+    def store(self, mode: str, question: str, response: str, sources: Iterable[str] = (), vector=None):
+        """
+            Saves an answer, evicting expired and least recently used entries.
+        """
+        if not response:
+            return
+        scope = self._scope(mode, sources)
+        key = (scope, normalize_question(question))
+        now = time.time()
+
+        with self._lock:
+            self._entries[key] = _Entry(scope, self._normalize_vector(vector), response, now + self.ttl)
+            self._entries.move_to_end(key)
+            for expired_key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+                del self._entries[expired_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+            Deletes all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+            Returns the number of entries and the hit rates.
+        """
+        with self._lock:
+            entries = len(self._entries)
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+response_cache = ResponseCache()
@@ -0,0 +1,179 @@
+"""
+    Persistent key-value cache with expiry times on SQLite.
+    Used for web search results and decision texts so repeated queries do not go to the website again.
+
+    Inspect a cache file with:  python app/utils/ttl_cache.py .cache/web_cache.sqlite3
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+WEB_CACHE_PATH = os.path.join(CACHE_DIR, "web_cache.sqlite3")
+
+_MISSING = object()
+
+class TTLCache:
+    """
+        A named cache table with a default TTL, an entry limit and LRU eviction.
+        Values must be JSON serializable.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, path: str = WEB_CACHE_PATH):
+        if not re.fullmatch(r"\w+", name):
+            raise ValueError(f"Invalid cache name: {name}")
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_access ON {name}(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+            Returns the cached value, or default if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.name} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute(f"UPDATE {self.name} SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+            Saves a value, evicting the least recently used entries above the limit.
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, expires_at, now)
+            )
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.name} WHERE key IN "
+                    f"(SELECT key FROM {self.name} ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def get_or_set(self, key: str, producer, ttl: Optional[float] = None) -> Any:
+        """
+            Returns the cached value or calls producer() and caches its result.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = producer()
+            self.set(key, value, ttl)
+        return value
+
+    def purge_expired(self) -> int:
+        """
+            Deletes expired entries and returns their number.
+        """
+        with self._lock:
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.name} WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self):
+        """
+            Deletes all entries.
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.name}")
+            self._conn.commit()
+
+    def entries(self, limit: int = 20) -> list:
+        """
+            Lists the most recently used entries (without their values) for inspection.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, LENGTH(value), created_at, expires_at, last_access FROM {self.name} "
+                "ORDER BY last_access DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            {"key": key, "size": size, "created_at": created, "expires_at": expires, "last_access": access}
+            for key, size, created, expires, access in rows
+        ]
+
+    def stats(self) -> dict:
+        """
+            Returns the size of the cache and the hit/miss counters.
+        """
+        with self._lock:
+            entries, size, expired = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0), "
+                f"COALESCE(SUM(expires_at <= ?), 0) FROM {self.name}", (time.time(),)
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": entries,
+            "expired": expired,
+            "max_entries": self.max_entries,
+            "value_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(name: str, ttl: float, max_entries: int, path: str = WEB_CACHE_PATH) -> TTLCache:
+    """
+        Returns the process-wide cache with the given name, creating it on first use.
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(name, ttl, max_entries, path)
+        return _caches[name]
+
+if __name__ == "__main__":
+    cache_path = sys.argv[1] if len(sys.argv) > 1 else WEB_CACHE_PATH
+    connection = sqlite3.connect(cache_path)
+    tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        cache = TTLCache(table, ttl=0, max_entries=sys.maxsize, path=cache_path)
+        print(json.dumps(cache.stats(), indent=2))
+        for entry in cache.entries():
+            print(f"  {entry['key']}  ({entry['size']} bytes)")
@@ -0,0 +1,569 @@
+"""
+    Vector store backends used by vektor_store.py.
+    QdrantVectorStore talks to a Qdrant server, LocalVectorIndex keeps the vectors
+    in-process in a (memory-mapped) NumPy matrix. Select with VECTOR_BACKEND=qdrant|local.
+    With VECTOR_QUANTIZATION=int8 both search int8 copies of the vectors and rescore the best
+    candidates with the full-precision vectors.
+    qdrant_client is imported by QdrantVectorStore, the local backend does not load it.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+import numpy as np
+from utils.resources import get_resource
+from utils.file_lock import acquire_lock, FileLockedError
+
+# Payload field that identifies the document a point belongs to
+DOC_ID_FIELD = "doc_id"
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(CACHE_DIR, "vector_index"))
+
+# "none" or "int8" (scalar quantization)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Candidates rescored with full precision, as a multiple of k
+RESCORE_OVERSAMPLING = float(os.getenv("RESCORE_OVERSAMPLING", "3"))
+# Rows of the int8 matrix converted to float at a time while scoring (fits in the CPU cache)
+QUANTIZED_SCORE_BLOCK = 4096
+
+# vector is only filled when the search is made with with_vectors=True
+SearchHit = namedtuple("SearchHit", ["id", "score", "payload", "vector"], defaults=(None,))
+
+class QdrantVectorStore:
+    """
+        Vector store operations on a Qdrant server (or Qdrant's local mode with location=":memory:").
+    """
+
+    def __init__(self, url: str = None, api_key: str = None, location: str = None,
+                 quantization: str = VECTOR_QUANTIZATION):
+        from qdrant_client import QdrantClient
+        self.quantization = quantization
+        if location:
+            self.client = QdrantClient(location=location)
+            # Local mode is not thread-safe, calls are serialized
+            self._lock = threading.Lock()
+        else:
+            self.client = QdrantClient(url=url, api_key=api_key)
+            self._lock = nullcontext()
+        # Collections already checked by this client
+        self._collections = set()
+
+    def ensure_collection(self, collection_name: str, dimension: int):
+        """
+            Creates the collection and the doc_id payload index if they do not exist.
+            The check is done once per collection.
+        """
+        from qdrant_client import models
+        from qdrant_client.http.exceptions import UnexpectedResponse
+        if collection_name in self._collections:
+            return
+        try:
+            self.client.get_collection(collection_name)
+        except (UnexpectedResponse, ValueError) as e:
+            # Local mode raises ValueError for unknown collections; other server errors (auth, 5xx) are not
+            # a missing collection and must not be cached as checked
+            if getattr(e, "status_code", 404) != 404:
+                raise
+            self.client.create_collection(
+                collection_name=collection_name,
+                vectors_config=models.VectorParams(
+                    size=dimension,
+                    distance=models.Distance.COSINE,
+                    # With quantization the original vectors are only read for rescoring
+                    on_disk=self.quantization == "int8"
+                ),
+                quantization_config=self._quantization_config()
+            )
+
+        # Filtered searches by document need a payload index (no-op if it already exists)
+        try:
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=DOC_ID_FIELD,
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+        except UnexpectedResponse as e:
+            print(f"Payload index could not be created ({collection_name}): {e}")
+        self._collections.add(collection_name)
+
+    def _quantization_config(self):
+        from qdrant_client import models
+        if self.quantization != "int8":
+            return None
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+
+    def retrieve_payloads(self, collection_name: str, ids: List[str], fields: List[str]) -> Dict[str, dict]:
+        """
+            Returns the requested payload fields of the existing points.
+        """
+        with self._lock:
+            points = self.client.retrieve(
+                collection_name=collection_name,
+                ids=ids,
+                with_payload=fields,
+                with_vectors=False
+            )
+        return {str(point.id): point.payload for point in points}
+
+    def upsert(self, collection_name: str, ids: List[str], vectors: List[List[float]], payloads: List[dict]):
+        """
+            Adds or replaces points.
+        """
+        from qdrant_client import models
+        with self._lock:
+            self.client.upsert(
+                collection_name=collection_name,
+                points=[
+                    models.PointStruct(id=pid, vector=vector, payload=payload)
+                    for pid, vector, payload in zip(ids, vectors, payloads)
+                ]
+            )
+
+    def delete_document_tail(self, collection_name: str, doc_id: str, chunk_count: int):
+        """
+            Deletes the chunks of a document numbered chunk_count and above.
+        """
+        from qdrant_client import models
+        with self._lock:
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=models.Filter(must=[
+                    models.FieldCondition(key=DOC_ID_FIELD, match=models.MatchValue(value=doc_id)),
+                    models.FieldCondition(key="chunk", range=models.Range(gte=chunk_count))
+                ]))
+            )
+
+    def delete_documents(self, collection_name: str, doc_ids: List[str]):
+        """
+            Deletes all points of the given documents.
+        """
+        from qdrant_client import models
+        with self._lock:
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(filter=document_filter(doc_ids))
+            )
+
+    def document_ids(self, collection_name: str) -> set:
+        """
+            Returns the doc_ids of all points in the collection (scrolls the whole collection).
+        """
+        doc_ids = set()
+        offset = None
+        while True:
+            with self._lock:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=[DOC_ID_FIELD],
+                    with_vectors=False
+                )
+            doc_ids.update(point.payload.get(DOC_ID_FIELD) for point in points)
+            if offset is None:
+                return doc_ids
+
+    def search(self, collection_name: str, vector: List[float], k: int, doc_ids=None,
+               with_vectors: bool = False) -> List[SearchHit]:
+        """
+            Returns the k most similar points, optionally only from the given documents.
+            An empty doc_ids matches no document.
+        """
+        from qdrant_client import models
+        if doc_ids is not None and not doc_ids:
+            return []
+        with self._lock:
+            results = self.client.search(
+                collection_name=collection_name,
+                query_vector=vector,
+                query_filter=document_filter(doc_ids) if doc_ids is not None else None,
+                limit=k,
+                with_vectors=with_vectors,
+                search_params=models.SearchParams(
+                    quantization=models.QuantizationSearchParams(rescore=True, oversampling=RESCORE_OVERSAMPLING)
+                ) if self.quantization == "int8" else None
+            )
+        return [
+            SearchHit(str(result.id), result.score, result.payload, result.vector if with_vectors else None)
+            for result in results
+        ]
+
+def document_filter(doc_ids):
+    """
+        Qdrant filter that matches the points of the given documents.
+    """
+    from qdrant_client import models
+    return models.Filter(must=[models.FieldCondition(key=DOC_ID_FIELD, match=models.MatchAny(any=list(doc_ids)))])
+
+class _LocalCollection:
+    """
+        A single collection of LocalVectorIndex.
+        Rows of the vector matrix are appended; deleted rows are only marked dead until compact().
+        Payloads live in SQLite and are read only for the search results.
+        With int8 quantization every row also has int8 codes and a scale (vector ~= codes * scale);
+        searches scan the codes and only read the float32 rows of the best candidates.
+    """
+
+    def __init__(self, directory: Optional[str], dimension: int, quantization: str = VECTOR_QUANTIZATION):
+        self.directory = directory
+        self.dimension = dimension
+        self.quantized = quantization == "int8"
+        self.lock = threading.RLock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Every process keeps its own row bookkeeping, so only one may open the collection
+            try:
+                self.process_lock = acquire_lock(os.path.join(directory, "index.lock"), blocking=False)
+            except FileLockedError:
+                raise FileLockedError(
+                    f"The local vector index {directory} is open in another process "
+                    "(e.g. the Streamlit app); stop it or use the Qdrant backend."
+                ) from None
+            self.db = sqlite3.connect(os.path.join(directory, "points.sqlite3"), check_same_thread=False)
+        else:
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS points (
+                row INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                doc_id TEXT,
+                payload TEXT NOT NULL
+            )
+        """)
+        self.db.commit()
+
+        self.id_to_row = {}
+        self.doc_rows = {}
+        for row, pid, doc_id in self.db.execute("SELECT row, id, doc_id FROM points"):
+            self.id_to_row[pid] = row
+            self.doc_rows.setdefault(doc_id, set()).add(row)
+
+        self.count = max(self.id_to_row.values(), default=-1) + 1
+        self.vectors = self._open_matrix("vectors.f32", np.float32, self.dimension, max(self.count, 1024))
+        capacity = self.vectors.shape[0]
+        if self.quantized:
+            self.codes = self._open_matrix("vectors.i8", np.int8, self.dimension, capacity)
+            self.scales = self._open_matrix("scales.f32", np.float32, 1, capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+        if self.id_to_row:
+            self.alive[list(self.id_to_row.values())] = True
+        if self.quantized:
+            # Rows saved before quantization was turned on have no codes yet
+            missing = np.flatnonzero(self.alive[:self.count] & (self.scales[:self.count, 0] == 0))
+            for start in range(0, missing.size, QUANTIZED_SCORE_BLOCK):
+                rows = missing[start:start + QUANTIZED_SCORE_BLOCK]
+                self.codes[rows], self.scales[rows] = quantize(np.asarray(self.vectors[rows]))
+            self._flush()
+
+    def _open_matrix(self, name: str, dtype, columns: int, capacity: int):
+        if not self.directory:
+            return np.zeros((capacity, columns), dtype=dtype)
+        path = os.path.join(self.directory, name)
+        row_bytes = np.dtype(dtype).itemsize * columns
+        with open(path, "a+b") as f:
+            # Creates or grows the file, np.memmap does not extend existing files
+            capacity = max(capacity, os.path.getsize(path) // row_bytes)
+            f.truncate(capacity * row_bytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, columns))
+
+    def _matrices(self):
+        if self.quantized:
+            return [("vectors", "vectors.f32", np.float32, self.dimension),
+                    ("codes", "vectors.i8", np.int8, self.dimension),
+                    ("scales", "scales.f32", np.float32, 1)]
+        return [("vectors", "vectors.f32", np.float32, self.dimension)]
+
+    def _flush(self):
+        for attribute, *_ in self._matrices():
+            matrix = getattr(self, attribute)
+            if isinstance(matrix, np.memmap):
+                matrix.flush()
+
+    def _ensure_capacity(self, rows: int):
+        capacity = self.vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2)
+        for attribute, name, dtype, columns in self._matrices():
+            matrix = getattr(self, attribute)
+            if self.directory:
+                matrix.flush()
+                delattr(self, attribute)
+                del matrix
+                setattr(self, attribute, self._open_matrix(name, dtype, columns, new_capacity))
+            else:
+                grown = np.zeros((new_capacity, columns), dtype=dtype)
+                grown[:capacity] = matrix
+                setattr(self, attribute, grown)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:capacity] = self.alive
+        self.alive = alive
+
+    def upsert(self, ids, vectors, payloads):
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimension)
+        # A point ID given twice would get two rows; the last occurrence wins
+        positions = list({pid: position for position, pid in enumerate(ids)}.values())
+        if len(positions) < len(ids):
+            ids = [ids[position] for position in positions]
+            payloads = [payloads[position] for position in positions]
+            matrix = matrix[positions]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            previous_docs = self._select(ids, "id", "id, doc_id")
+            rows = []
+            new_rows = 0
+            for pid in ids:
+                row = self.id_to_row.get(pid)
+                if row is None:
+                    row = self.count + new_rows
+                    new_rows += 1
+                rows.append(row)
+            self._ensure_capacity(self.count + new_rows)
+
+            self.vectors[rows] = matrix
+            if self.quantized:
+                self.codes[rows], self.scales[rows] = quantize(matrix)
+            records = []
+            for pid, row, payload in zip(ids, rows, payloads):
+                doc_id = payload.get(DOC_ID_FIELD)
+                if pid in previous_docs:
+                    self.doc_rows.get(previous_docs[pid], set()).discard(row)
+                self.id_to_row[pid] = row
+                self.doc_rows.setdefault(doc_id, set()).add(row)
+                self.alive[row] = True
+                records.append((row, pid, doc_id, json.dumps(payload, ensure_ascii=False)))
+            self.count += new_rows
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO points (row, id, doc_id, payload) VALUES (?, ?, ?, ?)", records
+            )
+            self.db.commit()
+            self._flush()
+
+    def delete_rows(self, rows):
+        with self.lock:
+            rows = list(rows)
+            if not rows:
+                return
+            self.alive[rows] = False
+            for row, (pid, doc_id) in self._select(rows, "row", "row, id, doc_id").items():
+                self.id_to_row.pop(pid, None)
+                self.doc_rows.get(doc_id, set()).discard(row)
+            self.db.executemany("DELETE FROM points WHERE row = ?", [(row,) for row in rows])
+            self.db.commit()
+
+    def _select(self, keys, key_column: str, columns: str) -> dict:
+        """
+            Reads points by row or ID; returns {first column: remaining column(s)}.
+        """
+        keys = list(keys)
+        result = {}
+        # SQLite limits the number of parameters in a single statement
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            for record in self.db.execute(
+                f"SELECT {columns} FROM points WHERE {key_column} IN ({','.join('?' * len(batch))})", batch
+            ):
+                result[record[0]] = record[1] if len(record) == 2 else record[1:]
+        return result
+
+    def payloads(self, rows) -> Dict[int, dict]:
+        return {row: json.loads(payload) for row, payload in self._select(rows, "row", "row, payload").items()}
+
+    def search(self, vector, k: int, doc_ids=None, with_vectors: bool = False):
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / (norm or 1)
+
+        with self.lock:
+            if doc_ids is not None:
+                candidate_rows = set()
+                for doc_id in doc_ids:
+                    candidate_rows |= self.doc_rows.get(doc_id, set())
+                rows = np.sort(np.fromiter(candidate_rows, dtype=np.int64, count=len(candidate_rows)))
+            else:
+                rows = np.flatnonzero(self.alive[:self.count])
+            # Every row up to count is searched, so the matrices can be read without an index array
+            full_scan = rows.size == self.count
+            if rows.size == 0:
+                return []
+
+            if self.quantized:
+                # Approximate scores on the int8 codes, exact scores for the best candidates only
+                candidates = min(rows.size, max(k, int(k * RESCORE_OVERSAMPLING)))
+                approximate = self._quantized_scores(rows, query, full_scan)
+                rows = rows[np.argpartition(-approximate, candidates - 1)[:candidates]]
+                scores = np.asarray(self.vectors[rows]) @ query
+            elif full_scan:
+                scores = self.vectors[:self.count] @ query
+            else:
+                scores = self.vectors[rows] @ query
+
+            k = min(k, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            top_rows = rows[top]
+            points = self._select(top_rows.tolist(), "row", "row, id, payload")
+            top_vectors = np.array(self.vectors[top_rows]) if with_vectors else [None] * len(top_rows)
+
+        return [
+            SearchHit(points[row][0], float(score), json.loads(points[row][1]), top_vector)
+            for row, score, top_vector in zip(top_rows.tolist(), scores[top].tolist(), top_vectors)
+            if row in points
+        ]
+
+    def _quantized_scores(self, rows, query, contiguous: bool):
+        scores = np.empty(rows.size, dtype=np.float32)
+        buffer = np.empty((min(QUANTIZED_SCORE_BLOCK, rows.size), self.dimension), dtype=np.float32)
+        for start in range(0, rows.size, QUANTIZED_SCORE_BLOCK):
+            end = min(start + QUANTIZED_SCORE_BLOCK, rows.size)
+            block = slice(start, end) if contiguous else rows[start:end]
+            codes = buffer[:end - start]
+            np.copyto(codes, self.codes[block], casting="unsafe")
+            scores[start:end] = (codes @ query) * self.scales[block, 0]
+        return scores
+
+    def compact(self):
+        """
+            Rewrites the matrices without the deleted rows.
+        """
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.count])
+            if live.size == self.count:
+                return
+            kept = {attribute: np.array(getattr(self, attribute)[live]) for attribute, *_ in self._matrices()}
+            remap = {int(old): new for new, old in enumerate(live.tolist())}
+            self.db.execute("UPDATE points SET row = -row - 1")
+            self.db.executemany(
+                "UPDATE points SET row = ? WHERE row = ?", [(new, -old - 1) for old, new in remap.items()]
+            )
+            self.db.commit()
+
+            self.id_to_row = {pid: remap[row] for pid, row in self.id_to_row.items()}
+            self.doc_rows = {doc_id: {remap[row] for row in rows} for doc_id, rows in self.doc_rows.items()}
+            self.count = live.size
+            self.alive[:] = False
+            self.alive[:self.count] = True
+            for attribute, matrix in kept.items():
+                getattr(self, attribute)[:self.count] = matrix
+            self._flush()
+
+def quantize(matrix):
+    """
+        Symmetric int8 quantization of every row: returns (codes, scales) with row ~= codes * scale.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1, keepdims=True) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class LocalVectorIndex:
+    """
+        In-process vector index with cosine similarity, exact top-k search on a NumPy matrix
+        (or int8 search with full-precision rescoring, see _LocalCollection).
+        With a directory the vectors are memory-mapped and the index survives restarts.
+    """
+
+    def __init__(self, directory: Optional[str] = LOCAL_INDEX_DIR, quantization: str = VECTOR_QUANTIZATION):
+        self.directory = directory
+        self.quantization = quantization
+        self.collections = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, collection_name: str) -> _LocalCollection:
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        return collection
+
+    def ensure_collection(self, collection_name: str, dimension: int):
+        """
+            Opens (or creates) the collection.
+        """
+        with self._lock:
+            if collection_name not in self.collections:
+                directory = os.path.join(self.directory, collection_name) if self.directory else None
+                self.collections[collection_name] = _LocalCollection(directory, dimension, self.quantization)
+
+    def retrieve_payloads(self, collection_name: str, ids: List[str], fields: List[str]) -> Dict[str, dict]:
+        """
+            Returns the requested payload fields of the existing points.
+        """
+        collection = self._collection(collection_name)
+        rows = {collection.id_to_row[pid]: pid for pid in ids if pid in collection.id_to_row}
+        payloads = collection.payloads(rows)
+        return {
+            rows[row]: {field: payload.get(field) for field in fields}
+            for row, payload in payloads.items()
+        }
+
+    def upsert(self, collection_name: str, ids: List[str], vectors: List[List[float]], payloads: List[dict]):
+        """
+            Adds or replaces points.
+        """
+        self._collection(collection_name).upsert(ids, vectors, payloads)
+
+    def delete_document_tail(self, collection_name: str, doc_id: str, chunk_count: int):
+        """
+            Deletes the chunks of a document numbered chunk_count and above.
+        """
+        collection = self._collection(collection_name)
+        rows = collection.doc_rows.get(doc_id, set())
+        payloads = collection.payloads(rows)
+        collection.delete_rows(row for row, payload in payloads.items() if payload.get("chunk", 0) >= chunk_count)
+
+    def delete_documents(self, collection_name: str, doc_ids: List[str]):
+        """
+            Deletes all points of the given documents.
+        """
+        collection = self._collection(collection_name)
+        rows = set()
+        for doc_id in doc_ids:
+            rows |= collection.doc_rows.get(doc_id, set())
+        collection.delete_rows(rows)
+
+    def document_ids(self, collection_name: str) -> set:
+        """
+            Returns the doc_ids of all points in the collection.
+        """
+        collection = self._collection(collection_name)
+        with collection.lock:
+            return {doc_id for doc_id, rows in collection.doc_rows.items() if rows}
+
+    def search(self, collection_name: str, vector: List[float], k: int, doc_ids=None,
+               with_vectors: bool = False) -> List[SearchHit]:
+        """
+            Returns the k most similar points, optionally only from the given documents.
+        """
+        return self._collection(collection_name).search(vector, k, doc_ids, with_vectors)
+
+    def compact(self, collection_name: str):
+        """
+            Frees the rows of deleted points.
+        """
+        self._collection(collection_name).compact()
+
+def get_vector_store():
+    """
+        Returns the shared vector store selected with VECTOR_BACKEND.
+        One Qdrant client (with its connection pool) is kept per server for the whole process.
+    """
+    backend = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+    if backend == "local":
+        return get_resource(("vector_store", "local", LOCAL_INDEX_DIR), lambda: LocalVectorIndex(LOCAL_INDEX_DIR))
+
+    url = os.getenv("QDRANT_URL")
+    api_key = os.getenv("QDRANT_API_KEY", None)
+    if url == ":memory:":
+        return get_resource(("vector_store", "qdrant", url), lambda: QdrantVectorStore(location=url))
+    return get_resource(("vector_store", "qdrant", url), lambda: QdrantVectorStore(url=url, api_key=api_key))
@@ -1,111 +1,301 @@
 """
-    Classes and functions required for Qdrant operations
+    Classes and functions required for vector store operations
+    (Qdrant or the in-process index, see vector_backends.py)
 """
+import hashlib
 import os
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import google.generativeai as genai
-from langchain.schema import Document
-from qdrant_client.http.exceptions import UnexpectedResponse
-from dotenv import load_dotenv
+from utils.config import PDF_COLLECTION, DECISION_COLLECTION  # noqa: F401  (re-exported)
+from utils.vector_backends import DOC_ID_FIELD, get_vector_store
+from utils.embedding_engine import BatchEmbedder, get_embedding_backend, EMBEDDING_MODEL, EMBEDDING_DIM
+from utils.embedding_cache import embedding_key, get_embedding_cache
+from utils.resources import get_resource
+from utils.chunk_store import ChunkStore, CHUNK_STORE_PATH
+from utils.chunker import Document
+from utils import metrics
 
-load_dotenv()
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3a52-8f0e-4c8e-9a57-0d2f3b7e9c41")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+# Streaming ingestion: chunks per embed/upsert batch and batches in flight
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_PIPELINE_DEPTH = 2
+
+# "inline": chunk text and metadata in the point payload, "side": in the compressed chunk store
+PAYLOAD_STORE = os.getenv("PAYLOAD_STORE", "inline").lower()
 
 class GeminiEmbeddings:
     """
         Performs text embedding operations using Google Gemini API.
+        Another backend (e.g. HashEmbeddingBackend) can be given to work without the API.
+        Previously generated vectors are read from the embedding cache.
     """
 
-    def __init__(self, model_name="models/embedding-001"):
-        self.model_name = model_name
+    def __init__(self, model_name=EMBEDDING_MODEL, backend=None, cache="default", **engine_options):
+        self.backend = backend or get_embedding_backend(model_name)
+        self.model_name = self.backend.model_name
+        self.engine = BatchEmbedder(self.backend, **engine_options)
+        self.cache = get_embedding_cache() if cache == "default" else cache
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
-            Generates embeddings for multiple texts.
+            Generates embeddings for multiple texts in concurrent batches.
         """
-        return [self.embed_query(text) for text in texts]
+        return self._embed(texts, task_type="retrieval_document", request_type="document_embedding")
 
     def embed_query(self, text: str) -> List[float]:
         """
             Generates embedding for a single text.
         """
-        result = genai.embed_content(
-            model=self.model_name,
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
+        return self._embed([text], task_type="retrieval_document", request_type="query_embedding")[0]
+
+    @metrics.timed("embed")
+    def _embed(self, texts: List[str], task_type: str, request_type: str) -> List[List[float]]:
+        """
+            Embeds only the texts that are not in the cache and saves the new vectors.
+            request_type sets the priority of the API requests (see gemini_scheduler.py).
+        """
+        if self.cache is None:
+            metrics.count("embedded_texts", len(texts))
+            return self.engine.embed(texts, task_type=task_type, request_type=request_type)
+
+        keys = [embedding_key(self.model_name, task_type, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        metrics.count("embedding_cache_hits", len(keys) - len(missing))
+        if missing:
+            metrics.count("embedded_texts", len(missing))
+            new_vectors = self.engine.embed(list(missing.values()), task_type=task_type, request_type=request_type)
+            new_items = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(new_items)
+            vectors.update(new_items)
+
+        return [vectors[key] for key in keys]
 
 def initialize_vector_store(collection_name: str):
     """
-        Initializes Qdrant vector store.
-    """
-    client = QdrantClient(
-        url=os.getenv("QDRANT_URL"),
-        api_key=os.getenv("QDRANT_API_KEY", None)
-    )
-
-    embeddings = GeminiEmbeddings()
-
-    try:
-        client.get_collection(collection_name)
-    except UnexpectedResponse as e:
-        if e.status_code == 404:
-            client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=768,  # Gemini embedding dimension
-                    distance=Distance.COSINE
-                )
-            )
+        Initializes the vector store and makes sure the collection exists.
+        Returns the store (see vector_backends.py) and the embeddings.
+    """
+    store = get_vector_store()
+    store.ensure_collection(collection_name, EMBEDDING_DIM)
 
-    return client, embeddings
+    return store, get_embeddings()
 
-def add_to_vector_store(client, embeddings, documents, collection_name: str):
+def get_embeddings() -> GeminiEmbeddings:
     """
-        Adds documents to the vector store.
+        Returns the shared embeddings object.
     """
-    points = []
-    for i, doc in enumerate(documents):
-        embedding = embeddings.embed_query(doc.page_content)
-        points.append(
-            PointStruct(
-                id=i,
-                vector=embedding,
-                payload={
-                    "text": doc.page_content,
-                    "metadata": doc.metadata
-                }
-            )
-        )
+    return get_resource(("embeddings", EMBEDDING_MODEL), GeminiEmbeddings)
+
+def get_chunk_store():
+    """
+        Returns the shared chunk text store, or None when texts are kept in the payloads.
+    """
+    if PAYLOAD_STORE != "side":
+        return None
+    return _shared_chunk_store()
+
+def _shared_chunk_store() -> ChunkStore:
+    return get_resource(("chunk_store", CHUNK_STORE_PATH), lambda: ChunkStore(CHUNK_STORE_PATH))
+
+def point_id(doc_id: str, chunk_index: int) -> str:
+    """
+        Deterministic point ID derived from the document and the position of the chunk.
+    """
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{doc_id}:{chunk_index}"))
+
+def chunk_hash(text: str) -> str:
+    """
+        Hash of the chunk content, used to detect changed chunks.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def add_to_vector_store(client, embeddings, documents, collection_name: str, doc_id: str = None) -> int:
+    """
+        Adds documents to the vector store incrementally.
+        Each chunk gets a point ID derived from its document ID (metadata "doc_id" or the doc_id argument)
+        and chunk number. Only new or changed chunks are embedded and uploaded, and the leftover chunks of a
+        previously longer version of the document are deleted. Returns the number of uploaded points.
+        Chunks of several documents are embedded and uploaded together.
+    """
+    groups = {}
+    for doc in documents:
+        groups.setdefault(doc.metadata.get(DOC_ID_FIELD, doc_id), []).append(doc)
+
+    entries = []
+    for group_doc_id, group_docs in groups.items():
+        if group_doc_id is None:
+            raise ValueError("Documents need a doc_id to be added to the vector store.")
+        entries.extend(_chunk_entries(group_docs, group_doc_id))
 
-    client.upsert(
-        collection_name=collection_name,
-        points=points
-    )
+    uploaded = _upsert_entries(client, embeddings, entries, collection_name)
+    for group_doc_id, group_docs in groups.items():
+        _delete_tail(client, collection_name, group_doc_id, len(group_docs))
+    return uploaded
 
-def query_vector_store(client, embeddings, query: str, collection_name: str, k: int = 6):
+def add_stream_to_vector_store(client, embeddings, documents, collection_name: str, doc_id: str,
+                               batch_size: int = INGEST_BATCH_SIZE, on_progress=None) -> int:
     """
-        Performs a query on the vector store and converts results to LangChain Document format.
+        Adds the chunks of a single document from an iterator (e.g. iter_pdf_chunks) in batches.
+        While a batch is embedded and uploaded in the background, the next one is being produced,
+        so the first chunks are searchable before the whole document is read.
+        on_progress(chunks) is called with the number of saved chunks after every batch.
+        Returns the total number of chunks of the document.
+    """
+    chunk_count = 0
+    saved_count = 0
+    pending = deque()
+    upsert_chunks = metrics.bind(_upsert_chunks)
+
+    def wait_for(batch):
+        nonlocal saved_count
+        batch_future, batch_length = batch
+        batch_future.result()
+        saved_count += batch_length
+        if on_progress is not None:
+            on_progress(saved_count)
+
+    with ThreadPoolExecutor(max_workers=INGEST_PIPELINE_DEPTH) as executor:
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            chunk_count += 1
+            if len(batch) >= batch_size:
+                pending.append((executor.submit(
+                    upsert_chunks, client, embeddings, batch, collection_name, doc_id, chunk_count - len(batch)
+                ), len(batch)))
+                batch = []
+                # Limits the number of batches held in memory
+                while len(pending) >= INGEST_PIPELINE_DEPTH:
+                    wait_for(pending.popleft())
+        if batch:
+            pending.append((executor.submit(
+                upsert_chunks, client, embeddings, batch, collection_name, doc_id, chunk_count - len(batch)
+            ), len(batch)))
+        while pending:
+            wait_for(pending.popleft())
+
+    _delete_tail(client, collection_name, doc_id, chunk_count)
+    return chunk_count
+
+def _chunk_entries(documents, doc_id: str, first_position: int = 0) -> list:
     """
-    query_embedding = embeddings.embed_query(query)
+        Returns (point ID, document ID, chunk number, content hash, document) of every chunk.
+    """
+    entries = []
+    for position, doc in enumerate(documents, start=first_position):
+        chunk_index = doc.metadata.get("chunk", position)
+        entries.append((point_id(doc_id, chunk_index), doc_id, chunk_index, chunk_hash(doc.page_content), doc))
+    return entries
+
+def _upsert_chunks(client, embeddings, documents, collection_name: str, doc_id: str,
+                   first_position: int = 0) -> int:
+    """
+        Embeds and uploads the chunks whose content differs from the stored points.
+    """
+    return _upsert_entries(client, embeddings, _chunk_entries(documents, doc_id, first_position), collection_name)
+
+def _upsert_entries(client, embeddings, entries, collection_name: str) -> int:
+    existing = client.retrieve_payloads(collection_name, [entry[0] for entry in entries], ["chunk_hash"])
+    existing_hashes = {pid: payload.get("chunk_hash") for pid, payload in existing.items()}
+    changed = [entry for entry in entries if existing_hashes.get(entry[0]) != entry[3]]
+
+    if changed:
+        vectors = embeddings.embed_documents([entry[4].page_content for entry in changed])
+        chunk_store = get_chunk_store()
+        payloads = [
+            {
+                DOC_ID_FIELD: entry_doc_id,
+                "chunk": chunk_index,
+                "chunk_hash": content_hash
+            }
+            for _, entry_doc_id, chunk_index, content_hash, _ in changed
+        ]
+        if chunk_store is None:
+            for payload, entry in zip(payloads, changed):
+                payload["text"] = entry[4].page_content
+                payload["metadata"] = entry[4].metadata
+        else:
+            chunk_store.put_many(collection_name, [
+                (pid, entry_doc_id, chunk_index, doc.page_content, doc.metadata)
+                for pid, entry_doc_id, chunk_index, _, doc in changed
+            ])
+        with metrics.span("upsert"):
+            client.upsert(collection_name, [entry[0] for entry in changed], vectors, payloads)
+        metrics.count("upserted_chunks", len(changed))
 
-    results = client.search(
-        collection_name=collection_name,
-        query_vector=query_embedding,
-        limit=k
-    )
+    return len(changed)
+
+def _delete_tail(client, collection_name: str, doc_id: str, chunk_count: int):
+    """
+        Removes the tail chunks of a previous, longer version of the document.
+    """
+    client.delete_document_tail(collection_name, doc_id, chunk_count)
+    chunk_store = get_chunk_store()
+    if chunk_store is not None:
+        chunk_store.delete_document_tail(collection_name, doc_id, chunk_count)
+
+def delete_documents(client, collection_name: str, doc_ids):
+    """
+        Deletes all chunks of the given documents (points and stored texts).
+    """
+    doc_ids = list(doc_ids)
+    client.delete_documents(collection_name, doc_ids)
+    chunk_store = get_chunk_store()
+    if chunk_store is not None:
+        chunk_store.delete_documents(collection_name, doc_ids)
+
+def query_vector_store(client, embeddings, query: str, collection_name: str, k: int = 6, doc_ids=None,
+                       with_vectors: bool = False, query_embedding=None):
+    """
+        Performs a query on the vector store and converts results to Document objects.
+        If doc_ids is given, only the chunks of these documents are searched.
+        query_embedding is the embedding of the query if the caller already has it.
+        The metadata of the results also holds doc_id, chunk and score (and vector with with_vectors=True).
+    """
+    if query_embedding is None:
+        query_embedding = embeddings.embed_query(query)
+
+    with metrics.span("search"):
+        results = client.search(collection_name, query_embedding, k, doc_ids=doc_ids, with_vectors=with_vectors)
+
+    # Texts of the results that are not in the payload come from the chunk store
+    missing = [result.id for result in results if 'text' not in result.payload]
+    stored = {}
+    if missing:
+        # Also used after switching back to inline payloads, for the points saved before
+        with metrics.span("fetch_text"):
+            stored = _shared_chunk_store().get_many(collection_name, missing)
 
     documents = []
     for result in results:
+        if 'text' in result.payload:
+            text, metadata = result.payload['text'], result.payload['metadata']
+        elif result.id in stored:
+            text, metadata = stored[result.id]
+        else:
+            print(f"⚠️ Text of point {result.id} not found in the chunk store.")
+            continue
+        metadata = dict(metadata)
+        metadata.update(
+            doc_id=result.payload.get(DOC_ID_FIELD),
+            chunk=result.payload.get('chunk', metadata.get('chunk')),
+            score=result.score
+        )
+        if with_vectors:
+            metadata['vector'] = result.vector
         documents.append(
             Document(
-                page_content=result.payload['text'],
-                metadata=result.payload['metadata']
+                page_content=text,
+                metadata=metadata
             )
         )
 
@@ -1,10 +1,30 @@
 """
     Operations for retrieving requested information from "..." website.
 """
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-from bs4 import BeautifulSoup
+from utils.ttl_cache import get_cache
+from utils.html_text import extract_text
+from utils import metrics
 
-session = requests.Session()
+# Endpoints can be overridden, e.g. to run against a local stub server
+SEARCH_URL = os.getenv("YARGITAY_SEARCH_URL", "")
+DOCUMENT_URL = os.getenv("YARGITAY_DOCUMENT_URL", "https://..../getDokuman")
+
+REQUEST_TIMEOUT = float(os.getenv("YARGITAY_REQUEST_TIMEOUT", "15"))
+FETCH_MAX_WORKERS = int(os.getenv("YARGITAY_FETCH_MAX_WORKERS", "4"))
+MAX_SEARCH_PAGES = 5
+
+# Search results change slowly, published decisions never change
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+DECISION_CACHE_TTL = float(os.getenv("DECISION_CACHE_TTL", str(365 * 24 * 3600)))
+DECISION_CACHE_MAX_ENTRIES = int(os.getenv("DECISION_CACHE_MAX_ENTRIES", "20000"))
+
+# requests.Session is not thread-safe, every worker thread gets its own
+_thread_local = threading.local()
 
 # Custom HTTP headers for the Supreme Court decision search website
 headers = {
@@ -16,11 +36,49 @@ headers = {
     "X-Requested-With": "XMLHttpRequest",
 }
 
-def perform_search(query, page=1, page_size=10):
+def get_session() -> requests.Session:
+    """
+        Returns the HTTP session of the current thread.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        # Empty headers are left to requests
+        session.headers.update({name: value for name, value in headers.items() if value})
+        _thread_local.session = session
+    return session
+
+def search_cache():
+    """
+        Cache of search results, keyed by normalized query, page and page size.
+    """
+    return get_cache("search_results", SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+
+def decision_cache():
+    """
+        Cache of extracted decision texts, keyed by decision ID.
+    """
+    return get_cache("decision_texts", DECISION_CACHE_TTL, DECISION_CACHE_MAX_ENTRIES)
+
+def normalize_query(query: str) -> str:
+    """
+        Lowercases the query (Turkish dotted/dotless I aware) and collapses whitespace.
+    """
+    return " ".join(query.replace("I", "ı").replace("İ", "i").lower().split())
+
+def perform_search(query, page=1, page_size=10, timeout=REQUEST_TIMEOUT):
+    """
+        Returns search results from the cache, or from the Supreme Court decision search API.
+    """
+    cache_key = f"{normalize_query(query)}|{page}|{page_size}"
+    return search_cache().get_or_set(
+        cache_key, lambda: _perform_search(query, page, page_size, timeout)
+    )
+
+def _perform_search(query, page, page_size, timeout):
     """
         Sends a query to the Supreme Court decision search API and returns results as JSON.
     """
-    url = ""
     payload = {
         "data": {
             "aranan": query,
@@ -29,56 +87,130 @@ def perform_search(query, page=1, page_size=10):
             "pageNumber": page
         }
     }
-    response = session.post(url, json=payload, headers=headers)
+    with metrics.span("fetch"):
+        response = get_session().post(SEARCH_URL, json=payload, timeout=timeout)
+    metrics.count("http_requests")
+    metrics.count("http_bytes", len(response.content))
     response.raise_for_status()
     return response.json()
 
-def fetch_decision_by_id(doc_id):
+def fetch_decision_by_id(doc_id, timeout=REQUEST_TIMEOUT):
     """
         Retrieves decision details for the specified decision ID as JSON.
     """
-    url = f"https://..../getDokuman?id={doc_id}"
-    response = session.get(url, headers=headers)
+    with metrics.span("fetch"):
+        response = get_session().get(DOCUMENT_URL, params={"id": doc_id}, timeout=timeout)
+    metrics.count("http_requests")
+    metrics.count("http_bytes", len(response.content))
     response.raise_for_status()
     return response.json()
 
+@metrics.timed("parse_html")
 def extract_text_from_html(html_str):
     """
-        Extracts only the text content from HTML.
+        Extracts only the text content from HTML (see utils/html_text.py).
     """
-    soup = BeautifulSoup(html_str, "html.parser")
-    body = soup.find("body")
-    return body.get_text(separator="\n", strip=True) if body else ""
+    return extract_text(html_str)
 
-def fetch_decision_texts(keywords, limit=7):
+def search_decision_ids(keywords, limit=7, page_size=None, timeout=REQUEST_TIMEOUT):
     """
-        Searches for Supreme Court decisions using keywords, retrieves decision texts,
-        and returns them concatenated.
+        Pages through the search results until `limit` decision IDs are collected.
+        IDs are returned in ranking order.
     """
-    all_results = ""
+    page_size = page_size or limit
+    decision_ids = []
 
-    try:
-        search_results = perform_search(keywords, page=1, page_size=limit)
-        decisions = search_results.get("data", {}).get("data", [])[:limit]
-
-        all_results += f"\n### Search: '{keywords}'\n"
+    for page in range(1, MAX_SEARCH_PAGES + 1):
+        search_results = perform_search(keywords, page=page, page_size=page_size, timeout=timeout)
+        decisions = search_results.get("data", {}).get("data", [])
 
         for decision in decisions:
             decision_id = decision.get("id")
-            print(f"Processing: Decision ID {decision_id}")
-            if not decision_id:
-                continue
+            if decision_id and decision_id not in decision_ids:
+                decision_ids.append(decision_id)
+
+        if len(decision_ids) >= limit or len(decisions) < page_size:
+            break
 
-            decision_json = fetch_decision_by_id(decision_id)
-            html_content = decision_json.get("data", "")
-            text = extract_text_from_html(html_content)
+    return decision_ids[:limit]
 
-            all_results += f"\n--- Decision ID: {decision_id} ---\n{text}\n"
+def fetch_decision_text(decision_id, timeout=REQUEST_TIMEOUT):
+    """
+        Returns the text of a single decision from the cache, or downloads it.
+        Raises ValueError if the decision has no text; that is not cached, the next query tries again.
+    """
+    key = str(decision_id)
+    text = decision_cache().get(key)
+    # Empty texts cached by earlier versions are downloaded again
+    if not text:
+        text = _download_decision_text(decision_id, timeout)
+        decision_cache().set(key, text)
+    return text
 
-        all_results += "\n" + "=" * 80 + "\n"
+def _download_decision_text(decision_id, timeout):
+    print(f"Processing: Decision ID {decision_id}")
+    decision_json = fetch_decision_by_id(decision_id, timeout=timeout)
+    text = extract_text_from_html(decision_json.get("data") or "")
+    if not text:
+        raise ValueError(f"Decision {decision_id} has no text.")
+    return text
 
-    except Exception as e:
-        print(f"⚠️ Error occurred: {e}")
-        all_results += f"\n[ERROR: Problem encountered while searching for '{keywords}']\n"
+def cache_stats() -> list:
+    """
+        Returns the statistics of the search and decision caches.
+    """
+    return [search_cache().stats(), decision_cache().stats()]
 
+def iter_decision_texts(decision_ids, max_workers=FETCH_MAX_WORKERS, timeout=REQUEST_TIMEOUT):
+    """
+        Downloads up to `max_workers` decisions at the same time and yields
+        (rank, decision_id, text) as each download finishes. Failed decisions are skipped.
+    """
+    def fetch(decision_id):
+        try:
+            return fetch_decision_text(decision_id, timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ Decision {decision_id} could not be retrieved: {e}")
+            return None
+
+    if not decision_ids:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(decision_ids)))) as executor:
+        fetch = metrics.bind(fetch)
+        futures = {executor.submit(fetch, decision_id): rank for rank, decision_id in enumerate(decision_ids)}
+        for future in as_completed(futures):
+            text = future.result()
+            if text is not None:
+                rank = futures[future]
+                yield rank, decision_ids[rank], text
+
+def fetch_decisions(keywords, limit=7, max_workers=FETCH_MAX_WORKERS, page_size=None, timeout=REQUEST_TIMEOUT):
+    """
+        Searches for decisions and downloads up to `max_workers` of them at the same time.
+        Returns (decision_id, text) pairs in ranking order. Decisions that fail to download are skipped.
+    """
+    decision_ids = search_decision_ids(keywords, limit=limit, page_size=page_size, timeout=timeout)
+    results = sorted(iter_decision_texts(decision_ids, max_workers=max_workers, timeout=timeout))
+    return [(decision_id, text) for _, decision_id, text in results]
+
+def format_decision_texts(keywords, decisions) -> str:
+    """
+        Concatenates (decision_id, text) pairs into a single text with decision headers.
+    """
+    all_results = f"\n### Search: '{keywords}'\n"
+    for decision_id, text in decisions:
+        all_results += f"\n--- Decision ID: {decision_id} ---\n{text}\n"
+    all_results += "\n" + "=" * 80 + "\n"
     return all_results
+
+def fetch_decision_texts(keywords, limit=7, max_workers=FETCH_MAX_WORKERS):
+    """
+        Searches for Supreme Court decisions using keywords, retrieves decision texts,
+        and returns them concatenated.
+    """
+    try:
+        decisions = fetch_decisions(keywords, limit=limit, max_workers=max_workers)
+        return format_decision_texts(keywords, decisions)
+    except Exception as e:
+        print(f"⚠️ Error occurred: {e}")
+        return f"\n[ERROR: Problem encountered while searching for '{keywords}']\n"
@@ -0,0 +1,174 @@
+"""
+    Load test of the headless HTTP API (app/api_server.py).
+    Starts the server with the offline stand-ins (fake Gemini with a configurable latency, hash
+    embeddings, local vector store) unless --url points to a running one, then sends queries
+    from concurrent clients and measures the answers as a caller sees them.
+
+    Usage: python benchmarks/api_load_test.py [--clients 8 32 128] [--requests 200]
+                                              [--endpoints general petition] [--stream]
+                                              [--max-concurrency 16] [--max-queued 64]
+                                              [--first-token-latency 0.3] [--token-latency 0.01]
+                                              [--url http://127.0.0.1:8000]
+    Prints one JSON object per client count: throughput, latency (and time to first byte with --stream)
+    percentiles, and the requests rejected with 503.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import aiohttp
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+TOPICS = ["kira artışı", "kıdem tazminatı", "velayet", "nafaka", "tapu iptali", "trafik kazası", "miras payı",
+          "icra itirazı", "işe iade", "boşanma"]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args, port: int) -> subprocess.Popen:
+    """
+        Starts api_server.py with the offline stand-ins.
+    """
+    work_dir = tempfile.mkdtemp(prefix="api_load_test_")
+    env = dict(
+        os.environ,
+        GENERATION_BACKEND="fake",
+        EMBEDDING_BACKEND="local",
+        VECTOR_BACKEND="local",
+        KEYWORD_EXTRACTOR="local",
+        CACHE_DIR=work_dir,
+        UPLOAD_DIR=os.path.join(work_dir, "uploads"),
+        LIFECYCLE_INTERVAL="0",
+        METRICS="1",
+        FAKE_FIRST_TOKEN_LATENCY=str(args.first_token_latency),
+        FAKE_TOKEN_LATENCY=str(args.token_latency),
+    )
+    command = [sys.executable, os.path.join(APP_DIR, "api_server.py"), "--port", str(port),
+               "--max-concurrency", str(args.max_concurrency), "--max-queued", str(args.max_queued)]
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_until_healthy(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"The API at {url} did not become healthy in {timeout} seconds.")
+            await asyncio.sleep(0.2)
+
+def request_body(endpoint: str, i: int, stream: bool) -> dict:
+    """
+        A different question every time, so the answer cache does not answer them.
+    """
+    topic = TOPICS[i % len(TOPICS)]
+    if endpoint == "petition":
+        return {"full_name": f"Ayşe Yılmaz {i}", "court_name": "İstanbul Asliye Hukuk Mahkemesi",
+                "case_type": "Consumer", "opponent_name": "ABC A.Ş.",
+                "petition_details": f"{topic} hakkında uyuşmazlık, talep {i}", "stream": stream}
+    return {"query": f"{topic} konusunda hangi haklarım var? (soru {i})", "stream": stream}
+
+async def send(session, url: str, endpoint: str, body: dict, stream: bool) -> dict:
+    path = "/petition" if endpoint == "petition" else f"/query/{endpoint}"
+    started = time.perf_counter()
+    first_byte = None
+    async with session.post(f"{url}{path}", json=body) as response:
+        if stream and response.status == 200:
+            ok = True
+            async for line in response.content:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                if json.loads(line).get("event") == "error":
+                    ok = False
+        else:
+            await response.read()
+            ok = response.status == 200
+        return {"status": response.status, "ok": ok, "seconds": time.perf_counter() - started,
+                "first_byte_seconds": first_byte}
+
+async def run(url: str, clients: int, args, offset: int) -> dict:
+    results = []
+    counter = iter(range(args.requests))
+
+    async def client(session):
+        for i in counter:
+            endpoint = args.endpoints[i % len(args.endpoints)]
+            try:
+                results.append(await send(session, url, endpoint, request_body(endpoint, offset + i, args.stream),
+                                          args.stream))
+            except aiohttp.ClientError:
+                results.append({"status": None, "ok": False, "seconds": None, "first_byte_seconds": None})
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+    seconds = time.perf_counter() - started
+
+    def percentiles(values) -> dict:
+        if not values:
+            return None
+        values = np.array(values)
+        return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+    answered = [r for r in results if r["ok"]]
+    return {
+        "clients": clients,
+        "requests": len(results),
+        "stream": args.stream,
+        "seconds": round(seconds, 2),
+        "answers_per_second": round(len(answered) / seconds, 2),
+        "latency_seconds": percentiles([r["seconds"] for r in answered]),
+        "first_byte_seconds": percentiles([r["first_byte_seconds"] for r in answered]) if args.stream else None,
+        "rejected_503": sum(r["status"] == 503 for r in results),
+        "failed": sum(not r["ok"] and r["status"] != 503 for r in results)
+    }
+
+async def main_async(args):
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(args, port)
+    try:
+        await wait_until_healthy(url)
+        for n, clients in enumerate(args.clients):
+            print(json.dumps(await run(url, clients, args, n * args.requests)), flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--requests", type=int, default=200, help="requests per client count")
+    parser.add_argument("--endpoints", nargs="+", default=["general", "petition"],
+                        choices=["general", "internet", "petition"])
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--url", help="an API server that is already running")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-queued", type=int, default=64)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+    Compares the legal-structure chunker (utils/chunker.py) with LangChain's
+    RecursiveCharacterTextSplitter, the splitter it replaced, on synthetic court decisions and
+    statutes of increasing size: throughput, peak and retained memory of the chunk documents
+    (and of the bare offset records), and how often a chunk runs from the reasoning into the
+    ruling (HÜKÜM).
+
+    Usage: python benchmarks/chunker_benchmark.py [--sizes 20000 200000 2000000] [--repeats 5]
+    Prints one JSON object per text and splitter. The LangChain rows are skipped if it is not installed.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.chunker import Document, split_chunks, CHUNK_SIZE, CHUNK_OVERLAP  # noqa: E402
+
+WORDS = (
+    "kira sözleşmesi kiracı kiraya veren tahliye dava bedel ödeme temerrüt ihtar süre işçi işveren kıdem "
+    "ihbar tazminat fesih boşanma velayet nafaka miras tapu iptal tescil trafik kaza sigorta hasar kusur "
+    "mahkeme karar temyiz istinaf bozma onama hüküm gerekçe delil tanık bilirkişi davacı davalı vekili"
+).split()
+
+def sentence(rng) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))).capitalize() + "."
+
+def paragraphs(rng, characters: int) -> str:
+    parts, size = [], 0
+    while size < characters:
+        paragraph = " ".join(sentence(rng) for _ in range(rng.randint(3, 8)))
+        parts.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(parts)
+
+def decision(rng, characters: int) -> str:
+    """
+        A Yargıtay-style decision: header, claim, reasoning and a short ruling at the end.
+    """
+    return (
+        f"T.C.\nYARGITAY\n{rng.randint(1, 23)}. HUKUK DAİRESİ\n"
+        f"ESAS NO: 2021/{rng.randint(1, 9999)}\nKARAR NO: 2022/{rng.randint(1, 9999)}\n\n"
+        f"DAVA: {paragraphs(rng, characters * 3 // 10)}\n\n"
+        f"GEREĞİ DÜŞÜNÜLDÜ: {paragraphs(rng, characters * 6 // 10)}\n\n"
+        f"HÜKÜM: {sentence(rng)} Kararın ONANMASINA oybirliğiyle karar verildi.\n"
+    )
+
+def statute(rng, characters: int) -> str:
+    articles, size, number = [], 0, 1
+    while size < characters:
+        article = f"Madde {number} – " + " ".join(sentence(rng) for _ in range(rng.randint(1, 6)))
+        articles.append(article)
+        size += len(article) + 1
+        number += 1
+    return "\n".join(articles)
+
+def langchain_splitter():
+    try:
+        from langchain.schema import Document as LangChainDocument
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        return None
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, length_function=len)
+
+    def split(text):
+        return [LangChainDocument(page_content=chunk, metadata={"chunk": i})
+                for i, chunk in enumerate(splitter.split_text(text))]
+    return split
+
+def legal_splitter(text):
+    documents = []
+    for i, chunk in enumerate(split_chunks(text, CHUNK_SIZE, CHUNK_OVERLAP)):
+        metadata = {"chunk": i}
+        if chunk.section:
+            metadata["section"] = chunk.section
+        documents.append(Document(chunk.text, metadata))
+    return documents
+
+def legal_offsets(text):
+    """
+        Only the chunk records (offsets into the text), before any chunk text is copied.
+    """
+    return split_chunks(text, CHUNK_SIZE, CHUNK_OVERLAP)
+
+def chunk_text(item) -> str:
+    return item.text if hasattr(item, "text") else item.page_content
+
+def runs_into_ruling(texts) -> int:
+    """
+        Chunks that contain the HÜKÜM heading after other text, i.e. mix the ruling with the reasoning.
+    """
+    return sum(1 for text in texts if "\nHÜKÜM:" in text)
+
+def measure(split, text: str, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        split(text)
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    documents = split(text)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = statistics.median(times)
+    texts = [chunk_text(item) for item in documents]
+    lengths = [len(text) for text in texts]
+    return {
+        "median_ms": round(seconds * 1000, 2),
+        "mb_per_second": round(len(text.encode("utf-8")) / seconds / 1e6, 2),
+        "peak_memory_bytes": peak,
+        "retained_memory_bytes": retained,
+        "chunks": len(documents),
+        "mean_chunk_characters": round(statistics.mean(lengths)) if lengths else 0,
+        "max_chunk_characters": max(lengths, default=0),
+        "chunks_running_into_ruling": runs_into_ruling(texts)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000, 2_000_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    splitters = {"legal": legal_splitter, "legal_offsets": legal_offsets}
+    langchain = langchain_splitter()
+    if langchain is not None:
+        splitters["langchain"] = langchain
+    else:
+        print("LangChain is not installed, only the legal chunker is measured.", file=sys.stderr)
+
+    for kind, make in (("decision", decision), ("statute", statute)):
+        for size in args.sizes:
+            text = make(rng, size)
+            for name, split in splitters.items():
+                print(json.dumps({"text": kind, "characters": len(text), "splitter": name,
+                                  **measure(split, text, args.repeats)}), flush=True)
+
+if __name__ == "__main__":
+    main()
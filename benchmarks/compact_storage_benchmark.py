@@ -0,0 +1,155 @@
+"""
+    Measures the compact storage options: memory per million chunks and recall of the
+    int8 quantized search compared with full-precision search, and the size of inline
+    payloads compared with the compressed chunk store.
+
+    Usage: python benchmarks/compact_storage_benchmark.py [--size 200000] [--queries 200] [-k 6]
+                                                          [--oversampling 1 2 3 5]
+    Prints one JSON object per storage option.
+    The quantized search is measured on LocalVectorIndex; Qdrant's in-memory mode accepts the
+    quantization settings but does not apply them, so Qdrant can only be measured on a server.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils import vector_backends  # noqa: E402
+from utils.vector_backends import LocalVectorIndex  # noqa: E402
+from utils.chunk_store import ChunkStore  # noqa: E402
+
+COLLECTION = "benchmark"
+UPSERT_BATCH = 5000
+MILLION = 1_000_000
+
+WORDS = (
+    "kira sözleşmesi kiracı kiraya veren tahliye dava bedel ödeme temerrüt ihtar süre işçi işveren kıdem "
+    "ihbar tazminat fesih boşanma velayet nafaka miras tapu iptal tescil trafik kaza sigorta hasar kusur "
+    "mahkeme karar temyiz istinaf bozma onama hüküm gerekçe delil tanık bilirkişi davacı davalı vekili"
+).split()
+
+def clustered_vectors(rng, size: int, dim: int, clusters: int = 2000) -> np.ndarray:
+    """
+        Embedding-like data: points around topic centers instead of uniform noise.
+    """
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def build_index(vectors: np.ndarray, quantization: str) -> LocalVectorIndex:
+    index = LocalVectorIndex(directory=None, quantization=quantization)
+    index.ensure_collection(COLLECTION, vectors.shape[1])
+    for start in range(0, len(vectors), UPSERT_BATCH):
+        end = min(start + UPSERT_BATCH, len(vectors))
+        ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(start, end)]
+        index.upsert(COLLECTION, ids, vectors[start:end], [{"doc_id": "doc", "chunk": i} for i in range(start, end)])
+    return index
+
+def search_ids(index, queries, k: int):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = index.search(COLLECTION, query, k)
+        latencies.append(time.perf_counter() - started)
+        results.append({hit.id for hit in hits})
+    return results, latencies
+
+def vector_memory(collection, quantized: bool) -> dict:
+    """
+        Bytes per million chunks of the matrices a search scans, and of all matrices.
+    """
+    dim = collection.dimension
+    float_bytes = 4 * dim
+    if not quantized:
+        return {"scanned_bytes_per_million": float_bytes * MILLION, "stored_bytes_per_million": float_bytes * MILLION}
+    code_bytes = dim + 4  # int8 codes and a float32 scale per row
+    return {"scanned_bytes_per_million": code_bytes * MILLION,
+            "stored_bytes_per_million": (code_bytes + float_bytes) * MILLION}
+
+def payload_sizes(samples: int, seed: int) -> dict:
+    """
+        Compares inline JSON payloads with the compressed chunk store on synthetic chunks.
+    """
+    rng = random.Random(seed)
+    inline_bytes = 0
+    records = []
+    for i in range(samples):
+        text = " ".join(rng.choice(WORDS) for _ in range(140))[:1000]
+        metadata = {"chunk": i % 50, "source": "court_decision", "decision_id": str(100000 + i // 50),
+                    "doc_id": f"decision:{100000 + i // 50}"}
+        payload = {"text": text, "metadata": metadata, "doc_id": metadata["doc_id"], "chunk": i % 50,
+                   "chunk_hash": "0" * 40}
+        inline_bytes += len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        records.append((f"00000000-0000-0000-0000-{i:012d}", metadata["doc_id"], i % 50, text, metadata))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chunks.sqlite3")
+        store = ChunkStore(path)
+        store.put_many(COLLECTION, records)
+        stored_bytes = store.stats()["stored_bytes"]
+        store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        file_bytes = os.path.getsize(path)
+
+    # Payload left in the vector store with the side store: doc_id, chunk and chunk_hash
+    slim_payload = len(json.dumps({"doc_id": "decision:100000", "chunk": 1, "chunk_hash": "0" * 40}))
+    return {
+        "inline_payload_bytes_per_million": round(inline_bytes / samples * MILLION),
+        "side_store_payload_bytes_per_million": slim_payload * MILLION,
+        "side_store_compressed_bytes_per_million": round(stored_bytes / samples * MILLION),
+        "side_store_file_bytes_per_million": round(file_bytes / samples * MILLION)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=6)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--payload-samples", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = clustered_vectors(rng, args.size, args.dim)
+    queries = vectors[rng.integers(0, args.size, args.queries)] + 0.3 * rng.standard_normal(
+        (args.queries, args.dim), dtype=np.float32)
+
+    exact_index = build_index(vectors, "none")
+    exact, exact_latencies = search_ids(exact_index, queries, args.k)
+    print(json.dumps({
+        "option": "float32",
+        "size": args.size,
+        "k": args.k,
+        "recall_at_k": 1.0,
+        "query_p50_ms": round(float(np.percentile(exact_latencies, 50)) * 1000, 3),
+        **vector_memory(exact_index.collections[COLLECTION], quantized=False)
+    }), flush=True)
+    del exact_index
+
+    quantized_index = build_index(vectors, "int8")
+    for oversampling in args.oversampling:
+        vector_backends.RESCORE_OVERSAMPLING = oversampling
+        found, latencies = search_ids(quantized_index, queries, args.k)
+        recall = np.mean([len(a & b) / len(a) for a, b in zip(exact, found)])
+        print(json.dumps({
+            "option": "int8",
+            "oversampling": oversampling,
+            "k": args.k,
+            "size": args.size,
+            "recall_at_k": round(float(recall), 4),
+            "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            **vector_memory(quantized_index.collections[COLLECTION], quantized=True)
+        }), flush=True)
+
+    print(json.dumps({"option": "payloads", "samples": args.payload_samples,
+                      **payload_sizes(args.payload_samples, args.seed)}), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+    End-to-end benchmark of the query handlers without any external service.
+    Gemini is replaced by FakeGenerativeModel and the hash embeddings, the decision search and
+    document endpoints by a local stub HTTP server, and Qdrant by its in-memory mode.
+    The real code paths of handle_general_query, handle_pdf_query and handle_internet_query
+    run against synthetic PDFs and decision corpora of increasing size.
+
+    Usage: python benchmarks/e2e_benchmark.py [--scenarios general pdf internet]
+                                              [--pdf-pages 10 50 200] [--corpus-sizes 20 100 500]
+                                              [--queries 20] [--generation-latency 0.2] [--network-latency 0.01]
+    Prints one JSON object per scenario and size, with latency percentiles of every stage.
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+WORK_DIR = tempfile.mkdtemp(prefix="e2e_benchmark_")
+
+# The stand-ins are selected before the application modules read their settings
+os.environ.update({
+    "GENERATION_BACKEND": "fake",
+    "EMBEDDING_BACKEND": "local",
+    "VECTOR_BACKEND": "qdrant",
+    "QDRANT_URL": ":memory:",
+    "CACHE_DIR": WORK_DIR,
+    "KEYWORD_EXTRACTOR": "local",
+})
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import fitz  # noqa: E402
+from utils import query_handler, web_searcher, ingestion_jobs, decision_pipeline  # noqa: E402
+from utils.fake_gemini import FakeGenerativeModel  # noqa: E402
+from utils.gemini_handler import set_model_factory  # noqa: E402
+from utils.response_cache import response_cache  # noqa: E402
+
+# Stages of the handlers, timed by wrapping the functions where the calling module looks them up
+# (the PDF is parsed, embedded and saved by the ingestion job, the decisions by the decision pipeline)
+STAGES = {
+    query_handler: ["_question_vector", "extract_keywords", "search_decision_ids", "index_decisions",
+                    "update_vocabulary", "query_vector_store", "generate_answer", "generate_answer_from_docs"],
+    ingestion_jobs: ["iter_pdf_chunks", "add_stream_to_vector_store"],
+    decision_pipeline: ["iter_decision_texts", "process_decisions_text", "add_to_vector_store"],
+}
+
+VOCABULARY = (
+    "kira sözleşmesi kiracı kiraya veren tahliye dava bedel ödeme temerrüt ihtar süre işçi işveren kıdem "
+    "ihbar tazminat fesih iş sözleşmesi boşanma velayet nafaka mal rejimi miras tenkis vasiyetname tapu "
+    "iptal tescil trafik kaza sigorta hasar kusur ceza hakaret dolandırıcılık zamanaşımı icra itiraz borç "
+    "alacak senet faiz mahkeme karar temyiz istinaf bozma onama hüküm gerekçe delil tanık bilirkişi"
+).split()
+
+QUESTIONS = [
+    "Kiracı kira bedelini ödemezse tahliye davası nasıl açılır?",
+    "İşçinin kıdem tazminatı alabilmesi için kaç yıl çalışması gerekir?",
+    "Boşanma davasında müşterek çocuğun velayeti kime verilir?",
+    "Trafik kazasında kusur oranı nasıl belirlenir ve sigorta hasarı öder mi?",
+    "İcra takibine itiraz süresi nedir?",
+    "Tapu iptal ve tescil davasında zamanaşımı var mıdır?",
+    "Mirasta tenkis davası hangi durumlarda açılır?",
+    "Haksız fesih halinde ihbar tazminatı nasıl hesaplanır?",
+]
+
+def synthetic_text(rng: random.Random, words: int, heading: str = "") -> str:
+    """
+        Legal-looking text with article headings every ~120 words.
+    """
+    parts = [heading] if heading else []
+    for start in range(0, words, 120):
+        parts.append(f"Madde {start // 120 + 1}.")
+        parts.append(" ".join(rng.choice(VOCABULARY) for _ in range(min(120, words - start))) + ".")
+    return "\n".join(parts)
+
+def make_pdf(path: str, pages: int, seed: int):
+    rng = random.Random(seed)
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        text = synthetic_text(rng, 350, f"Sayfa {number + 1}")
+        page.insert_textbox(fitz.Rect(36, 36, 559, 806), text, fontsize=8)
+    document.save(path)
+    document.close()
+
+class StubDecisionServer:
+    """
+        Serves the decision search (POST) and document (GET ?id=) endpoints from a synthetic corpus.
+        Search results depend on the query, so different questions get different decisions.
+    """
+
+    def __init__(self, corpus_size: int, seed: int, latency: float = 0.0):
+        rng = random.Random(seed)
+        self.decisions = {
+            str(100000 + i): synthetic_text(rng, rng.randint(600, 2400), f"Yargıtay Karar No {100000 + i}")
+            for i in range(corpus_size)
+        }
+        self.ids = list(self.decisions)
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, body: dict):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                query = request.get("data", {})
+                page, page_size = query.get("pageNumber", 1), query.get("pageSize", 10)
+                ranked = random.Random(query.get("arananKelime", "")).sample(stub.ids, len(stub.ids))
+                results = ranked[(page - 1) * page_size:page * page_size]
+                self._reply({"data": {"data": [{"id": decision_id} for decision_id in results]}})
+
+            def do_GET(self):
+                decision_id = parse_qs(urlparse(self.path).query).get("id", [""])[0]
+                paragraphs = "".join(f"<p>{line}</p>" for line in stub.decisions.get(decision_id, "").split("\n"))
+                self._reply({"data": f"<html><body>{paragraphs}</body></html>"})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        host, port = self.server.server_address
+        web_searcher.SEARCH_URL = f"http://{host}:{port}/search"
+        web_searcher.DOCUMENT_URL = f"http://{host}:{port}/getDokuman"
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+class StageTimer:
+    """
+        Replaces the stage functions with wrappers that record their durations.
+        Generators are timed while they are iterated, not when they are created.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.originals = []
+        for module, names in STAGES.items():
+            for name in names:
+                if not hasattr(module, name):
+                    raise AttributeError(f"Stage {name} is not called through {module.__name__} anymore; "
+                                         "update STAGES.")
+                self.originals.append((module, name, getattr(module, name)))
+
+    def _record(self, name, seconds):
+        self.durations.setdefault(name, []).append(seconds)
+
+    def _wrap(self, name, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+            if inspect.isgenerator(result):
+                return self._timed_generator(name, result, elapsed)
+            self._record(name, elapsed)
+            return result
+        return timed
+
+    def _timed_generator(self, name, generator, elapsed):
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield item
+        finally:
+            self._record(name, elapsed)
+
+    def __enter__(self):
+        for module, name, function in self.originals:
+            setattr(module, name, self._wrap(name, function))
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, function in self.originals:
+            setattr(module, name, function)
+
+def percentiles(seconds) -> dict:
+    milliseconds = np.array(seconds) * 1000
+    return {
+        "count": len(seconds),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 2),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 2),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 2),
+        "max_ms": round(float(milliseconds.max()), 2)
+    }
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+def run_queries(scenario: str, size, queries: int, ask) -> dict:
+    totals = []
+    # Progress messages of the handlers go to stderr, stdout only gets the JSON results
+    with StageTimer() as timer, redirect_stdout(sys.stderr):
+        for i in range(queries):
+            question = QUESTIONS[i % len(QUESTIONS)]
+            # Every query goes through the whole pipeline instead of the answer cache
+            response_cache.clear()
+            started = time.perf_counter()
+            answer = ask(question)
+            totals.append(time.perf_counter() - started)
+            if not answer:
+                raise RuntimeError(f"{scenario} query returned no answer: {question}")
+
+    return {
+        "scenario": scenario,
+        "size": size,
+        "queries": queries,
+        "total": percentiles(totals),
+        "first_query_ms": round(totals[0] * 1000, 2),
+        "queries_per_second": round(len(totals) / sum(totals), 2),
+        "stages": {name: percentiles(durations) for name, durations in timer.durations.items()},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_general(queries: int) -> dict:
+    return run_queries("general", None, queries, query_handler.handle_general_query)
+
+def run_pdf(pages: int, queries: int, seed: int) -> dict:
+    path = os.path.join(WORK_DIR, f"synthetic_{pages}_pages.pdf")
+    make_pdf(path, pages, seed)
+    result = run_queries("pdf", pages, queries, lambda question: query_handler.handle_pdf_query(question, path))
+    result["pdf_bytes"] = os.path.getsize(path)
+    return result
+
+def run_internet(corpus_size: int, queries: int, seed: int, network_latency: float) -> dict:
+    # Search results and decisions cached from the previous corpus must not be reused
+    web_searcher.search_cache().clear()
+    web_searcher.decision_cache().clear()
+    with StubDecisionServer(corpus_size, seed, network_latency) as stub:
+        result = run_queries("internet", corpus_size, queries, query_handler.handle_internet_query)
+        result["http_requests"] = stub.requests
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["general", "pdf", "internet"],
+                        choices=["general", "pdf", "internet"])
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--generation-latency", type=float, default=0.2,
+                        help="seconds until the fake model answers")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="seconds per generated piece of the fake model")
+    parser.add_argument("--network-latency", type=float, default=0.01,
+                        help="seconds the stub server waits before every response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    set_model_factory(lambda model_name: FakeGenerativeModel(
+        model_name, first_token_latency=args.generation_latency, token_latency=args.token_latency
+    ))
+
+    if "general" in args.scenarios:
+        print(json.dumps(run_general(args.queries)), flush=True)
+    if "pdf" in args.scenarios:
+        for pages in args.pdf_pages:
+            print(json.dumps(run_pdf(pages, args.queries, args.seed)), flush=True)
+    if "internet" in args.scenarios:
+        for corpus_size in args.corpus_sizes:
+            print(json.dumps(run_internet(corpus_size, args.queries, args.seed, args.network_latency)), flush=True)
+
+if __name__ == "__main__":
+    main()
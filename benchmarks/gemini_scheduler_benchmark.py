@@ -0,0 +1,125 @@
+"""
+    Mixed load against a local fake of the Gemini quota (utils/fake_gemini.FakeQuota): a few
+    lawyers asking questions (interactive answers) while bulk ingestion embeds documents as fast
+    as it can, all on the same quota. Compares uncoordinated calls, each retrying on its own
+    (as the embedding engine did), with calls through the shared scheduler (utils/gemini_scheduler.py).
+
+    Usage: python benchmarks/gemini_scheduler_benchmark.py [--seconds 10] [--users 4] [--bulk-workers 8]
+                                                           [--quota-rpm 600] [--quota-concurrency 6]
+    Prints one JSON object per mode: answer latency percentiles, throughput and rejected requests.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.fake_gemini import FakeAPIError, FakeQuota  # noqa: E402
+from utils.gemini_scheduler import GeminiScheduler, SchedulerError  # noqa: E402
+
+MODEL = "fake-model"
+
+def direct_call(function, request_type, deadline, backoff=0.2, max_retries=6):
+    """
+        An uncoordinated call: retried with exponential backoff on 429, nothing else.
+    """
+    attempt = 0
+    while True:
+        try:
+            return function()
+        except FakeAPIError:
+            if attempt >= max_retries or time.monotonic() >= deadline:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+            attempt += 1
+
+def run(mode: str, args) -> dict:
+    # The quota is enforced per second, so a short run cannot spend a minute's requests at once
+    quota = FakeQuota(rpm=args.quota_rpm, max_concurrency=args.quota_concurrency, window=1.0)
+    scheduler = GeminiScheduler(model_rpm={MODEL: args.quota_rpm * 0.95}, type_rpm={},
+                                initial_concurrency=args.quota_concurrency * 2, backoff=0.2, burst_seconds=1.0)
+
+    def call(function, request_type, timeout):
+        if mode == "scheduled":
+            return scheduler.call(function, MODEL, request_type, timeout=timeout)
+        return direct_call(function, request_type, time.monotonic() + timeout)
+
+    stop_at = time.monotonic() + args.seconds
+    answer_latencies, failures = [], {"answer": 0, "document_embedding": 0}
+    embedded_batches = [0]
+    lock = threading.Lock()
+
+    def user(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            try:
+                call(lambda: quota.call(time.sleep, args.answer_latency), "answer", 30)
+                with lock:
+                    answer_latencies.append(time.monotonic() - started)
+            except (FakeAPIError, SchedulerError):
+                with lock:
+                    failures["answer"] += 1
+            time.sleep(rng.uniform(0.5, 1.5) * args.think_time)
+
+    def bulk_worker():
+        while time.monotonic() < stop_at:
+            try:
+                call(lambda: quota.call(time.sleep, args.embedding_latency), "document_embedding", 60)
+                with lock:
+                    embedded_batches[0] += 1
+            except (FakeAPIError, SchedulerError):
+                with lock:
+                    failures["document_embedding"] += 1
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    threads += [threading.Thread(target=bulk_worker) for _ in range(args.bulk_workers)]
+    started = time.monotonic()
+    # The scheduler logs every retry, the rejections are counted below
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.monotonic() - started
+
+    latencies = np.array(answer_latencies) if answer_latencies else np.zeros(1)
+    return {
+        "mode": mode,
+        "seconds": round(seconds, 2),
+        "answers": len(answer_latencies),
+        "answer_p50_seconds": round(float(np.percentile(latencies, 50)), 3),
+        "answer_p95_seconds": round(float(np.percentile(latencies, 95)), 3),
+        "answer_max_seconds": round(float(latencies.max()), 3),
+        "embedding_batches_per_second": round(embedded_batches[0] / seconds, 2),
+        "accepted_requests": quota.accepted,
+        "rejected_requests": quota.rejected,
+        "failed": failures,
+        "scheduler": scheduler.stats() if mode == "scheduled" else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--bulk-workers", type=int, default=8)
+    parser.add_argument("--quota-rpm", type=float, default=600)
+    parser.add_argument("--quota-concurrency", type=int, default=6)
+    parser.add_argument("--answer-latency", type=float, default=0.3)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between a user's questions")
+    parser.add_argument("--modes", nargs="+", default=["direct", "scheduled"], choices=["direct", "scheduled"])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        print(json.dumps(run(mode, args)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+    Decision HTML to text: the regex extractor (utils/html_text.py) against the BeautifulSoup
+    html.parser tree it replaced. First checks that both give exactly the same text for synthetic
+    decisions and a list of edge cases (entities, comments, scripts, malformed markup...), then
+    measures single-document throughput and a batch of decisions extracted by a process pool.
+    Exits with code 1 when an output differs, since the decision texts (and so the chunk hashes
+    of indexed decisions) must not change.
+
+    Usage: python benchmarks/html_extract_benchmark.py [--sizes 5000 50000 500000] [--batch 200] [--workers 4]
+    Prints one JSON object per check and measurement.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.html_text import _fast_text, _Unsupported, extract_texts, html_to_text, soup_text  # noqa: E402
+
+WORDS = (
+    "kira sözleşmesi kiracı kiraya veren tahliye dava bedel ödeme temerrüt ihtar süre işçi işveren kıdem "
+    "ihbar tazminat fesih boşanma velayet nafaka miras tapu iptal tescil mahkeme karar temyiz istinaf bozma "
+    "onama hüküm gerekçe delil tanık bilirkişi davacı davalı vekili &amp; &nbsp; &quot;madde&quot; &#39;a&#39;"
+).split()
+
+INLINE = ("b", "i", "u", "span", "strong", "em", "a href=\"#\"", "font face='Arial'")
+
+EDGE_CASES = [
+    "<html><body><p>a <b>b</b> c&amp;d&nbsp;</p><script>var x = '<p>';</script><style>p{}</style>tail</body>after</html>",
+    "<body>a<!-- c -->b <br/>x &lt;y&gt; 1 < 2 and 3<4</body>",
+    "<BODY class='x>y'>A</BODY>",
+    "<p>no body</p>",
+    "",
+    "<body><template>t</template><ruby>k<rt>r</rt></ruby>end",
+    "<body>a &copy b &#39;c&#x27; &unknown; &#0; &#x110000;</body>",
+    "<body>x</p></div>y<p>z",
+    "<body><![CDATA[x]]>y</body>",
+    "<body>a<b",
+    "<body><p>1</p><body><p>2</p></body><p>3</p>",
+    "<body>a</>b</body>",
+    "<body><textarea> a </textarea><pre>\n b\n</pre>",
+    "<!DOCTYPE html><html><head><title>t</title><meta charset=utf-8></head><body>x</body></html>",
+    "<html><head><title>t</title></head><div><body>x</div>y</body>",
+    "<body>a<!-->b<!---->c<!-- x -- y -->d</body>",
+    "<body>a<!-- unterminated",
+    "<body><p title=\"a > b\" data-x='1'>q</p><img src=x.png alt=\"<b>\">r</body>",
+    "<body><p a\"b>q</p></body>",
+    "<body>a<?php echo 1 ?>b</body>",
+    "<body>\xa0  x \r\n</body>",
+    "<body><SCRIPT type=\"text/javascript\">if (a < b) {}</SCRIPT>x</body>",
+    "<body><script>never closed",
+    "<body>x</html>y</body>",
+    "<html><body>x</html>y",
+    "<html></html><body>a</html>b",
+    "<html><body>a<html>b</html>c",
+    "<body>a</body>b<body>c</body>",
+    "<body>AT&amp;T &ampx &amp</body>",
+    "<body>a</br>b</hr>c</img>d</body>",
+    "<body><br>a</br>b</br>c<img src=x>d</img>e<br/>f</br>g</body>",
+    "<head><meta charset=utf-8></head><body>a</meta>b<hr>c</HR>d</body>",
+]
+
+def sentence(rng) -> str:
+    words = []
+    for _ in range(rng.randint(8, 25)):
+        word = rng.choice(WORDS)
+        if rng.random() < 0.05:
+            tag = rng.choice(INLINE)
+            word = f"<{tag}>{word}</{tag.split()[0]}>"
+        words.append(word)
+    return " ".join(words) + "."
+
+def decision_html(rng, characters: int) -> str:
+    """
+        A decision page as the document API returns it: paragraphs, line breaks and inline formatting.
+    """
+    parts, size = [], 0
+    while size < characters:
+        paragraph = "<br>\n".join(sentence(rng) for _ in range(rng.randint(1, 4)))
+        part = f"<p style=\"text-align: justify\">{paragraph}</p>"
+        if rng.random() < 0.02:
+            part += "<!-- sayfa sonu -->"
+        parts.append(part)
+        size += len(part)
+    return ("<html><head><meta charset=\"utf-8\"><title>Karar</title><style>p { margin: 0 }</style></head>"
+            f"<body><div class=\"karar\"><b>T.C.</b><br>YARGITAY<br>{''.join(parts)}</div></body></html>")
+
+def check(html: str) -> dict:
+    expected = soup_text(html)
+    actual = html_to_text(html)
+    try:
+        _fast_text(html)
+        path = "fast"
+    except _Unsupported:
+        path = "fallback"
+    return {"matches": actual == expected, "path": path}
+
+def measure(extract, html: str, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        extract(html)
+        times.append(time.perf_counter() - started)
+    seconds = statistics.median(times)
+    return {"median_ms": round(seconds * 1000, 3),
+            "mb_per_second": round(len(html.encode("utf-8")) / seconds / 1e6, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 50_000, 500_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=200, help="decisions in the batch measurement")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failed = False
+
+    for i, html in enumerate(EDGE_CASES):
+        result = check(html)
+        failed |= not result["matches"]
+        print(json.dumps({"check": "edge_case", "case": i, **result}), flush=True)
+
+    generated = [decision_html(rng, rng.randint(1_000, 60_000)) for _ in range(50)]
+    results = [check(html) for html in generated]
+    mismatches = sum(not result["matches"] for result in results)
+    failed |= mismatches > 0
+    print(json.dumps({"check": "generated_decisions", "documents": len(results), "mismatches": mismatches,
+                      "fallbacks": sum(result["path"] == "fallback" for result in results)}), flush=True)
+
+    for size in args.sizes:
+        html = decision_html(rng, size)
+        for name, extract in (("regex", html_to_text), ("beautifulsoup", soup_text)):
+            print(json.dumps({"measure": "single", "bytes": len(html.encode("utf-8")), "extractor": name,
+                              **measure(extract, html, args.repeats)}), flush=True)
+
+    batch = [decision_html(rng, 30_000) for _ in range(args.batch)]
+    total = sum(len(html.encode("utf-8")) for html in batch)
+    for name, run in (("beautifulsoup", lambda: [soup_text(html) for html in batch]),
+                      ("regex", lambda: extract_texts(batch, workers=1)),
+                      (f"regex_{args.workers}_processes", lambda: extract_texts(batch, workers=args.workers))):
+        started = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - started
+        print(json.dumps({"measure": "batch", "documents": len(batch), "bytes": total, "extractor": name,
+                          "seconds": round(seconds, 3), "mb_per_second": round(total / seconds / 1e6, 2)}),
+              flush=True)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+    Cold-start import time of the Streamlit entry point and the pages.
+    Every measurement imports the module in a fresh interpreter, so nothing is cached in
+    sys.modules. Fails (exit code 1) when the median time of a module is over its budget or
+    when a page loads a heavy library it should only load on the code path that uses it.
+
+    Usage: python benchmarks/import_time_benchmark.py [--runs 7] [--budget main=0.6 research_page=0.8]
+    Prints one JSON object per module, with the slowest imports from python -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Median seconds allowed for `import <module>` (streamlit alone takes about 0.2s)
+BUDGETS = {
+    "main": 0.6,
+    "petition_page": 0.6,
+    "research_page": 0.8,
+}
+
+# Libraries only the code paths that call them may import
+HEAVY_MODULES = ("google.generativeai", "qdrant_client", "langchain", "fitz", "bs4")
+
+MEASURE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def run_python(args, env):
+    return subprocess.run([sys.executable, *args], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+
+def measure(module: str, runs: int, env) -> dict:
+    """
+        Median import time of the module over fresh interpreters and the heavy modules it loads.
+    """
+    times, heavy = [], set()
+    for _ in range(runs):
+        result = json.loads(run_python(["-c", MEASURE.format(module=module, heavy=HEAVY_MODULES)], env)
+                            .stdout.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return {"median_seconds": statistics.median(times), "min_seconds": min(times), "heavy_modules": sorted(heavy)}
+
+def slowest_imports(module: str, env, top: int = 8) -> list:
+    """
+        Direct imports of the module with the largest cumulative import time (python -X importtime).
+    """
+    stderr = run_python(["-X", "importtime", "-c", f"import {module}"], env).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level below the module
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            entries.append((int(cumulative), name.strip()))
+    return [{"module": name, "seconds": round(us / 1e6, 3)} for us, name in sorted(entries, reverse=True)[:top]]
+
+def parse_budgets(values) -> dict:
+    budgets = dict(BUDGETS)
+    for value in values or []:
+        module, seconds = value.split("=")
+        budgets[module] = float(seconds)
+    return budgets
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget", nargs="*", metavar="MODULE=SECONDS", help="override or add module budgets")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    budgets = parse_budgets(args.budget)
+    # Compiles the bytecode once, so the runs measure imports and not compilation
+    run_python(["-c", "import compileall; compileall.compile_dir('.', quiet=1)"], env)
+
+    failed = False
+    for module, budget in budgets.items():
+        result = measure(module, args.runs, env)
+        over_budget = result["median_seconds"] > budget
+        failed |= over_budget or bool(result["heavy_modules"])
+        print(json.dumps({
+            "module": module,
+            "budget_seconds": budget,
+            "median_seconds": round(result["median_seconds"], 3),
+            "min_seconds": round(result["min_seconds"], 3),
+            "over_budget": over_budget,
+            "heavy_modules": result["heavy_modules"],
+            "slowest_imports": slowest_imports(module, env)
+        }), flush=True)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+    Compares the local keyword extractor with the Gemini based one on a set of legal questions.
+
+    Usage: python benchmarks/keyword_eval.py [--llm] [--queries queries.jsonl]
+    Without --llm only the local extractor is evaluated (no API key needed).
+    A queries file has one {"question": ..., "keywords": [...]} object per line.
+    Prints per-question results and a JSON summary per extractor.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.keyword_extractor import extract_keywords_local, extract_keywords_llm, tokenize  # noqa: E402
+
+DEFAULT_QUERIES = [
+    {"question": "Ehliyetsiz motosiklet sürücüsünün karıştığı trafik kazasında sigorta şirketi tazminat öder mi?",
+     "keywords": ["ehliyetsiz", "motosiklet", "trafik", "kaza", "sigorta", "tazminat"]},
+    {"question": "İşçinin kıdem tazminatı alabilmesi için kaç yıl çalışması gerekir?",
+     "keywords": ["işçi", "kıdem", "tazminat", "çalışma"]},
+    {"question": "Kiracı kira bedelini ödemezse tahliye davası nasıl açılır?",
+     "keywords": ["kiracı", "kira", "bedel", "tahliye", "dava"]},
+    {"question": "Boşanma davasında müşterek çocuğun velayeti kime verilir?",
+     "keywords": ["boşanma", "velayet", "çocuk", "müşterek"]},
+    {"question": "Anlaşmalı boşanmada yoksulluk nafakası talep edilebilir mi?",
+     "keywords": ["anlaşmalı", "boşanma", "yoksulluk", "nafaka"]},
+    {"question": "Sosyal medyada hakaret suçunun cezası nedir?",
+     "keywords": ["sosyal", "medya", "hakaret", "suç", "ceza"]},
+    {"question": "Ayıplı araç satışında tüketici hangi haklara sahiptir?",
+     "keywords": ["ayıplı", "araç", "tüketici", "hak"]},
+    {"question": "İcra takibine itiraz süresi kaç gündür?",
+     "keywords": ["icra", "takip", "itiraz", "süre"]},
+    {"question": "Miras paylaşımında ortaklığın giderilmesi davası nasıl işler?",
+     "keywords": ["miras", "ortaklığın", "giderilmesi", "dava"]},
+    {"question": "Fazla mesai ücreti alacağında zamanaşımı süresi nedir?",
+     "keywords": ["fazla", "mesai", "ücret", "alacak", "zamanaşımı"]},
+    {"question": "İşverenin haklı nedenle fesih hakkı hangi durumlarda doğar?",
+     "keywords": ["işveren", "haklı", "fesih"]},
+    {"question": "Tapu iptali ve tescil davasında muris muvazaası nasıl ispatlanır?",
+     "keywords": ["tapu", "iptal", "tescil", "muris", "muvazaa"]},
+    # Questions citing a law and an article: the numbers must survive as keywords
+    {"question": "4857 sayılı İş Kanunu 17. madde ihbar süresi",
+     "keywords": ["4857", "17", "ihbar", "süre"]},
+    {"question": "6098 sayılı Türk Borçlar Kanunu 344. maddeye göre kira artış oranı ne kadar olabilir?",
+     "keywords": ["6098", "borçlar", "344", "kira", "artış"]},
+]
+
+def load_queries(path):
+    if not path:
+        return DEFAULT_QUERIES
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def matches(keyword: str, reference: str) -> bool:
+    """
+        Turkish words take suffixes, so a keyword matches a reference word with the same stem prefix.
+    """
+    stem = min(len(reference), 5)
+    return keyword[:stem] == reference[:stem]
+
+def score(keywords: list, reference: list) -> dict:
+    hits = sum(1 for keyword in keywords if any(matches(keyword, ref) for ref in reference))
+    found = sum(1 for ref in reference if any(matches(keyword, ref) for keyword in keywords))
+    precision = hits / len(keywords) if keywords else 0.0
+    recall = found / len(reference) if reference else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+def evaluate(name, extractor, queries, max_keywords):
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        keywords = tokenize(extractor(query["question"], max_keywords))
+        elapsed = time.perf_counter() - started
+        result = {"extractor": name, "question": query["question"], "keywords": keywords,
+                  "latency_ms": round(elapsed * 1000, 3)}
+        result.update(score(keywords, query["keywords"]))
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+    return results
+
+def summarize(results) -> dict:
+    latencies = sorted(result["latency_ms"] for result in results)
+    count = len(results)
+    return {
+        "extractor": results[0]["extractor"],
+        "queries": count,
+        "mean_latency_ms": round(sum(latencies) / count, 3),
+        "p95_latency_ms": latencies[min(count - 1, int(count * 0.95))],
+        "precision": round(sum(r["precision"] for r in results) / count, 3),
+        "recall": round(sum(r["recall"] for r in results) / count, 3),
+        "f1": round(sum(r["f1"] for r in results) / count, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="JSON lines file with question/keywords pairs")
+    parser.add_argument("--llm", action="store_true", help="also evaluate the Gemini extractor")
+    parser.add_argument("--max-keywords", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    runs = [evaluate("local", extract_keywords_local, queries, args.max_keywords)]
+    if args.llm:
+        runs.append(evaluate("llm", extract_keywords_llm, queries, args.max_keywords))
+
+    summaries = [summarize(results) for results in runs]
+    if len(runs) == 2:
+        agreement = [
+            score(local["keywords"], llm["keywords"])["f1"] for local, llm in zip(runs[0], runs[1])
+        ]
+        summaries.append({"local_vs_llm_f1": round(sum(agreement) / len(agreement), 3)})
+    for summary in summaries:
+        print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+    Compares query latency and memory of LocalVectorIndex with Qdrant's in-memory local mode.
+
+    Usage: python benchmarks/vector_index_benchmark.py [--sizes 10000 100000 1000000] [--queries 200]
+    Prints one JSON object per backend and size.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from utils.vector_backends import LocalVectorIndex, QdrantVectorStore  # noqa: E402
+
+COLLECTION = "benchmark"
+UPSERT_BATCH = 1000
+
+def make_store(backend: str):
+    if backend == "local":
+        return LocalVectorIndex(directory=None)
+    return QdrantVectorStore(location=":memory:")
+
+def run(backend: str, size: int, dim: int, queries: int, k: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    store = make_store(backend)
+    store.ensure_collection(COLLECTION, dim)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for start in range(0, size, UPSERT_BATCH):
+        count = min(UPSERT_BATCH, size - start)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(start, start + count)]
+        payloads = [{"doc_id": f"doc{i % 100}", "chunk": i, "text": ""} for i in range(start, start + count)]
+        store.upsert(COLLECTION, ids, vectors.tolist() if backend == "qdrant" else vectors, payloads)
+    build_seconds = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+    latencies = []
+    for vector in query_vectors:
+        started = time.perf_counter()
+        store.search(COLLECTION, vector.tolist(), k)
+        latencies.append(time.perf_counter() - started)
+
+    filtered = []
+    for vector in query_vectors[:max(1, queries // 4)]:
+        started = time.perf_counter()
+        store.search(COLLECTION, vector.tolist(), k, doc_ids=["doc1", "doc2"])
+        filtered.append(time.perf_counter() - started)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "size": size,
+        "dim": dim,
+        "build_seconds": round(build_seconds, 3),
+        "peak_memory_mb": round(peak_bytes / 2 ** 20, 1),
+        "query_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "filtered_query_p50_ms": round(float(np.percentile(np.array(filtered) * 1000, 50)), 3),
+        "queries_per_second": round(len(latencies) / sum(latencies), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["local", "qdrant"], choices=["local", "qdrant"])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for backend in args.backends:
+            print(json.dumps(run(backend, size, args.dim, args.queries, args.k, args.seed)), flush=True)
+
+if __name__ == "__main__":
+    main()